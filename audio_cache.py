@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Постоянный кэш аудиофайлов для TTS Overlay
+Файлы адресуются по содержимому запроса (движок, язык, голос, скорость, текст),
+поэтому кэш переживает перезапуск приложения
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+from audio_pcm import DecodedAudio, decode_audio, write_wav
+
+INDEX_FILE_NAME = "index.sqlite3"
+
+# Суффикс файлов второго уровня кэша (декодированный PCM рядом с MP3)
+PCM_SUFFIX = ".pcm.wav"
+
+# Имя файла кэша: ключ sha256 и расширение (для PCM - .pcm.wav); остальное - файлы прежних версий
+CACHE_FILE_RE = re.compile(r"^[0-9a-f]{64}\.(pcm\.wav|[a-z0-9]+)$")
+
+# Порядок вытеснения при превышении лимита
+EVICT_LRU = "lru"  # сначала давно не использованные
+EVICT_LFU = "lfu"  # сначала редко используемые (при равенстве - давно не использованные)
+EVICTION_POLICIES = (EVICT_LRU, EVICT_LFU)
+
+# Сколько записей с новыми отметками обращений копится в памяти до записи в индекс
+ACCESS_FLUSH_EVERY = 64
+
+
+def make_cache_key(engine: str, text: str, language: Optional[str] = "", voice: Optional[str] = "", speed: Any = 0) -> str:
+    """Стабильный ключ кэша (sha256) для набора параметров синтеза"""
+    payload = json.dumps([engine, language or "", voice or "", str(speed), text], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CacheStats:
+    """Счетчики кэша по движкам: обновляются при каждой операции, поэтому отвечают мгновенно"""
+
+    FIELDS = ("entries", "size", "hits", "misses")
+
+    def __init__(self):
+        self._engines: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, engine: str, entries: int = 0, size: int = 0, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            counters = self._engines.setdefault(engine, dict.fromkeys(self.FIELDS, 0))
+            counters["entries"] += entries
+            counters["size"] += size
+            counters["hits"] += hits
+            counters["misses"] += misses
+
+    def reset_usage(self) -> None:
+        """Обнуление числа записей и размера (после очистки кэша); попадания и промахи сохраняются"""
+        with self._lock:
+            for counters in self._engines.values():
+                counters["entries"] = counters["size"] = 0
+
+    def total(self, field: str) -> int:
+        with self._lock:
+            return sum(counters[field] for counters in self._engines.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Итоги и разбивка по движкам (доля попаданий - за текущую сессию)"""
+        with self._lock:
+            engines = {engine: dict(counters) for engine, counters in self._engines.items()}
+        totals = {field: sum(counters[field] for counters in engines.values()) for field in self.FIELDS}
+        for counters in list(engines.values()) + [totals]:
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+        totals["engines"] = engines
+        return totals
+
+
+class AudioCache:
+    """Контентно-адресуемый кэш с индексом в SQLite, общий для всех движков TTS"""
+
+    def __init__(self, cache_folder: str, max_size: int = 0, policy: str = EVICT_LRU):
+        """
+        Args:
+            cache_folder (str): Папка кэша
+            max_size (int): Лимит размера в байтах (0 - без ограничения); проверяется при каждой записи
+            policy (str): Порядок вытеснения: EVICT_LRU или EVICT_LFU
+        """
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self.policy = policy if policy in EVICTION_POLICIES else EVICT_LRU
+        if not os.path.exists(self.cache_folder):
+            os.makedirs(self.cache_folder)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.cache_folder, INDEX_FILE_NAME), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, engine TEXT NOT NULL, path TEXT NOT NULL, "
+            "size INTEGER NOT NULL, created REAL NOT NULL, "
+            "last_access REAL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Индекс, созданный прежней версией, дополняем полями учета обращений
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if "last_access" not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN last_access REAL")
+        if "hits" not in columns:
+            self._db.execute("ALTER TABLE entries ADD COLUMN hits INTEGER NOT NULL DEFAULT 0")
+        self._db.commit()
+
+        # Число записей и размер по движкам считаются один раз по индексу и дальше обновляются
+        # при записи и удалении; попадания и промахи - за текущую сессию
+        self.counters = CacheStats()
+        for engine, count, size in self._db.execute(
+                "SELECT engine, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY engine"):
+            self.counters.add(engine, int(count), int(size))
+
+        # Отметки обращений, еще не записанные в индекс: ключ -> [число попаданий, время последнего]
+        self._pending_access: Dict[str, List[float]] = {}
+
+        # Ключи, которые сейчас записываются: второй вызов ждет первый, а не синтезирует заново
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._in_flight_lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self.counters.total("hits")
+
+    @property
+    def misses(self) -> int:
+        return self.counters.total("misses")
+
+    def partition(self, engine: str) -> str:
+        """Папка кэша для конкретного движка"""
+        folder = os.path.join(self.cache_folder, engine)
+        if not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def path_for(self, key: str, engine: str, ext: str = "mp3") -> str:
+        """Путь к файлу кэша для ключа"""
+        return os.path.join(self.partition(engine), f"{key}.{ext}")
+
+    def lookup(self, key: str, engine: str = "") -> Optional[str]:
+        """Поиск файла в кэше по ключу. Возвращает путь или None"""
+        with self._lock:
+            row = self._db.execute("SELECT path, engine, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and os.path.exists(row[0]):
+                self.counters.add(row[1], hits=1)
+                self._record_access_locked(key)
+                return row[0]
+            if row:
+                # Файл удален вручную - убираем запись из индекса
+                self._delete_locked(key, row[1], row[2])
+                self._db.commit()
+            self.counters.add(engine, misses=1)
+            return None
+
+    def store(self, key: str, engine: str, path: str) -> None:
+        """Регистрация готового файла в индексе (при превышении лимита вытесняются другие записи)"""
+        size = os.path.getsize(path)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT engine, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._adjust_usage_locked(old[0], -1, -old[1])
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, engine, path, size, created, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0)",
+                (key, engine, path, size, now, now)
+            )
+            self._adjust_usage_locked(engine, 1, size)
+            self._db.commit()
+            over_budget = self.max_size and self.total_size() > self.max_size
+        if over_budget:
+            self.evict_to(self.max_size, keep=(key,))
+
+    def _record_access_locked(self, key: str) -> None:
+        # Обращение к фразе засчитывается и ее декодированному PCM
+        now = time.time()
+        for entry_key in (key, key + PCM_SUFFIX):
+            pending = self._pending_access.setdefault(entry_key, [0, now])
+            pending[0] += 1
+            pending[1] = now
+        if len(self._pending_access) >= ACCESS_FLUSH_EVERY:
+            self._flush_access_locked()
+            self._db.commit()
+
+    def _flush_access_locked(self) -> None:
+        if self._pending_access:
+            self._db.executemany(
+                "UPDATE entries SET hits = hits + ?, last_access = ? WHERE key = ?",
+                [(int(hits), last, key) for key, (hits, last) in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+
+    def _adjust_usage_locked(self, engine: str, count: int, size: int) -> None:
+        self.counters.add(engine, count, size)
+
+    def _delete_locked(self, key: str, engine: str, size: int) -> bool:
+        """Удаление записи; счетчики уменьшаются, только если запись еще была в индексе"""
+        cursor = self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+        self._pending_access.pop(key, None)
+        if cursor.rowcount != 1:
+            return False
+        self._adjust_usage_locked(engine, -1, -size)
+        return True
+
+    def get_or_create(self, engine: str, text: str, generate: Callable[[str], Any],
+                      language: Optional[str] = "", voice: Optional[str] = "", speed: Any = 0,
+                      ext: str = "mp3") -> Optional[str]:
+        """
+        Единая точка доступа к кэшу для всех движков
+
+        Args:
+            engine (str): Имя движка ("google", "local", "voicerss")
+            text (str): Текст для озвучивания
+            generate (callable): Функция, записывающая аудио в переданный путь.
+                Должна вернуть ложное значение в случае ошибки
+            language, voice, speed: Параметры синтеза, входящие в ключ
+            ext (str): Расширение файла
+
+        Returns:
+            str: Путь к аудиофайлу в кэше или None в случае ошибки
+        """
+        key = make_cache_key(engine, text, language, voice, speed)
+        cached = self.lookup(key, engine)
+        if cached:
+            logging.debug(f"Кэш: попадание {engine} {key[:12]} ({self.hit_rate():.0%})")
+            return cached
+        return self._create(key, engine, ext, generate)
+
+    def find(self, engine: str, text: str, language: Optional[str] = "", voice: Optional[str] = "",
+             speed: Any = 0) -> Optional[str]:
+        """Поиск готового файла по параметрам синтеза без генерации"""
+        return self.lookup(make_cache_key(engine, text, language, voice, speed), engine)
+
+    def contains(self, engine: str, text: str, language: Optional[str] = "", voice: Optional[str] = "",
+                 speed: Any = 0) -> bool:
+        """Есть ли готовый файл в индексе (без учета в статистике и порядке вытеснения)"""
+        return self._indexed_path(make_cache_key(engine, text, language, voice, speed)) is not None
+
+    def _indexed_path(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT path FROM entries WHERE key = ?", (key,)).fetchone()
+        return row[0] if row and os.path.exists(row[0]) else None
+
+    def put_bytes(self, engine: str, text: str, data: bytes, language: Optional[str] = "",
+                  voice: Optional[str] = "", speed: Any = 0, ext: str = "mp3") -> Optional[str]:
+        """Сохранение уже полученного аудио (например, после потокового синтеза) в кэш"""
+        def write(path):
+            with open(path, "wb") as f:
+                f.write(data)
+            return True
+        return self._create(make_cache_key(engine, text, language, voice, speed), engine, ext, write)
+
+    def _create(self, key: str, engine: str, ext: str, generate: Callable[[str], Any]) -> Optional[str]:
+        """Атомарная запись нового файла кэша через временный .part (один писатель на ключ)"""
+        while True:
+            with self._in_flight_lock:
+                writing = self._in_flight.get(key)
+                if writing is None:
+                    done = self._in_flight[key] = threading.Event()
+                    break
+            # Тот же ключ уже записывается (повтор предложения, prefetch, поток Google) - ждем его файл
+            writing.wait()
+            path = self._indexed_path(key)
+            if path:
+                return path
+
+        path = self.path_for(key, engine, ext)
+        temp_path = f"{path}.{threading.get_ident()}.part"
+        try:
+            result = generate(temp_path)
+            if result is False or result is None or not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                return None
+            os.replace(temp_path, path)
+            self.store(key, engine, path)
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            done.set()
+        logging.debug(f"Кэш: сохранен файл {engine} {key[:12]}: {path}")
+        return path
+
+    @staticmethod
+    def pcm_path_for(audio_path: str) -> str:
+        """Путь к декодированному WAV для аудиофайла кэша (WAV уже содержит PCM)"""
+        if audio_path.lower().endswith(".wav"):
+            return audio_path
+        return os.path.splitext(audio_path)[0] + PCM_SUFFIX
+
+    def get_pcm(self, audio_path: str) -> Optional[str]:
+        """
+        Второй уровень кэша: декодированный WAV рядом с исходным файлом
+
+        Декодирование выполняется один раз на фразу, дальше микрофон и динамики
+        читают один и тот же WAV без запуска ffmpeg.
+
+        Returns:
+            str: Путь к WAV с несжатым PCM или None в случае ошибки
+        """
+        pcm_path = self.pcm_path_for(audio_path)
+        if os.path.exists(pcm_path):
+            return pcm_path
+        try:
+            audio = decode_audio(audio_path)
+        except Exception as e:
+            logging.error(f"Ошибка при декодировании {audio_path} в PCM: {e}")
+            return None
+        return self.store_pcm(audio_path, audio)
+
+    def store_pcm(self, audio_path: str, audio: DecodedAudio) -> Optional[str]:
+        """Запись уже декодированной в память фразы во второй уровень кэша"""
+        pcm_path = self.pcm_path_for(audio_path)
+        if os.path.exists(pcm_path):
+            return pcm_path
+
+        temp_path = f"{pcm_path}.{threading.get_ident()}.part"
+        try:
+            write_wav(audio, temp_path)
+            os.replace(temp_path, pcm_path)
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении PCM {pcm_path}: {e}")
+            return None
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        # Регистрируем PCM в индексе, чтобы он учитывался в размере кэша
+        if os.path.dirname(os.path.dirname(pcm_path)) == self.cache_folder:
+            engine = os.path.basename(os.path.dirname(pcm_path))
+            self.store(os.path.basename(pcm_path), engine, pcm_path)
+        logging.debug(f"PCM сохранен в кэш: {pcm_path}")
+        return pcm_path
+
+    def hit_rate(self) -> float:
+        """Доля попаданий в кэш за текущую сессию"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def total_size(self) -> int:
+        """Суммарный размер файлов кэша (в байтах, без обхода папки)"""
+        return self.counters.total("size")
+
+    def evict_to(self, max_size: int, keep: Iterable[str] = ()) -> int:
+        """
+        Вытеснение записей по политике кэша, пока размер превышает max_size
+
+        Args:
+            max_size (int): Допустимый размер в байтах
+            keep: Ключи, которые нельзя удалять (например, только что записанная фраза)
+
+        Returns:
+            int: Число удаленных файлов
+        """
+        if self.total_size() <= max_size:
+            return 0
+        keep = set(keep)
+        order = ("hits, COALESCE(last_access, created)" if self.policy == EVICT_LFU
+                 else "COALESCE(last_access, created)")
+        with self._lock:
+            self._flush_access_locked()
+            self._db.commit()
+            rows = self._db.execute(f"SELECT key, path FROM entries ORDER BY {order}").fetchall()
+
+        removed = 0
+        for key, path in rows:
+            if self.total_size() <= max_size:
+                break
+            if key in keep:
+                continue
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                # Например, файл сейчас воспроизводится
+                logging.warning(f"Не удалось удалить файл кэша {path}: {e}")
+                continue
+            # Запись могла уже удалить другая очистка или перезаписать новый синтез: берем ее текущее состояние
+            with self._lock:
+                row = self._db.execute("SELECT engine, size FROM entries WHERE key = ?", (key,)).fetchone()
+                deleted = row is not None and self._delete_locked(key, row[0], row[1])
+            if deleted:
+                removed += 1
+        with self._lock:
+            self._db.commit()
+        if removed:
+            logging.debug(f"Кэш: вытеснено файлов {removed} ({self.policy}), размер {self.total_size() / (1024 * 1024):.1f} МБ")
+        return removed
+
+    def clear(self, progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Удаление всех записей индекса и всех файлов в папке кэша, в том числе
+        не попавших в индекс
+
+        Args:
+            progress (callable): Вызывается как progress(удалено, всего) по ходу удаления файлов
+
+        Returns:
+            int: Число удаленных файлов
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT path FROM entries").fetchall()
+            self._db.execute("DELETE FROM entries")
+            self._db.commit()
+            self.counters.reset_usage()
+            self._pending_access.clear()
+        paths = [path for (path,) in rows]
+        indexed = set(paths)
+        # Файлы вне индекса: старые имена, недописанные .part, PCM без записи
+        paths.extend(path for path in self._unindexed_files() if path not in indexed)
+        removed = 0
+        total = len(paths)
+        for i, path in enumerate(paths, 1):
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logging.warning(f"Не удалось удалить файл кэша {path}: {e}")
+            if progress and (i % 50 == 0 or i == total):
+                progress(i, total)
+        return removed
+
+    def _unindexed_files(self) -> List[str]:
+        """Все файлы в папке кэша и папках движков, кроме файлов индекса"""
+        files = []
+        for entry in os.scandir(self.cache_folder):
+            if entry.is_file() and not entry.name.startswith(INDEX_FILE_NAME):
+                files.append(entry.path)
+            elif entry.is_dir():
+                files.extend(file_entry.path for file_entry in os.scandir(entry.path) if file_entry.is_file())
+        return files
+
+    def purge_legacy_files(self) -> int:
+        """
+        Удаление файлов старого формата: hash(text).mp3 в корне папки кэша и файлов
+        с именами не по ключу sha256 в папках движков (например, md5-имена VoiceRSS)
+        """
+        removed = 0
+        for entry in os.scandir(self.cache_folder):
+            if entry.is_file():
+                if entry.name.endswith(".mp3"):
+                    removed += self._remove_file(entry.path)
+            elif entry.is_dir():
+                for file_entry in os.scandir(entry.path):
+                    # .part - файлы, которые сейчас записываются
+                    if (file_entry.is_file() and not file_entry.name.endswith(".part")
+                            and not CACHE_FILE_RE.match(file_entry.name)):
+                        removed += self._remove_file(file_entry.path)
+        if removed:
+            logging.debug(f"Кэш: удалено файлов старого формата: {removed}")
+        return removed
+
+    @staticmethod
+    def _remove_file(path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError as e:
+            logging.warning(f"Не удалось удалить файл кэша {path}: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша: число записей, размер, попадания и промахи - всего и по движкам (без обращения к диску)"""
+        return self.counters.snapshot()
+
+    def close(self) -> None:
+        """Запись накопленных отметок обращений и закрытие индекса"""
+        with self._lock:
+            self._flush_access_locked()
+            self._db.commit()
+            self._db.close()
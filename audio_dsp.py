@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Обработка PCM для TTS Overlay: усиление громкости с ограничителем
+Буферы выделяются один раз, блоки обрабатываются на месте без временных массивов
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+LIMITER_HARD = "hard"  # жесткое ограничение (обрезка пиков)
+LIMITER_SOFT = "soft"  # мягкое ограничение: выше порога пики плавно сжимаются (tanh)
+LIMITERS = (LIMITER_HARD, LIMITER_SOFT)
+
+
+class GainStage:
+    """Усиление блоков PCM с ограничителем на предвыделенных буферах"""
+
+    def __init__(self, block_frames: int = 1024, channels: int = 2, limiter: str = LIMITER_SOFT,
+                 threshold: float = 0.9):
+        self.block_frames = block_frames
+        self.channels = channels
+        self.limiter = limiter if limiter in LIMITERS else LIMITER_SOFT
+        self.threshold = min(max(threshold, 0.0), 0.999)
+        self._work = np.empty((block_frames, channels), dtype=np.float32)
+        self._magnitude = np.empty_like(self._work)
+        self._excess = np.empty_like(self._work)
+        self._out = {}
+
+    def process(self, samples: np.ndarray, gain: float, dtype=None) -> np.ndarray:
+        """
+        Усиление блока
+
+        Args:
+            samples (np.ndarray): Блок PCM (кадры × каналы), не больше block_frames кадров;
+                uint8, int16, int32 или float32 в диапазоне [-1, 1]
+            gain (float): Коэффициент усиления
+            dtype: Тип отсчетов результата (по умолчанию - как у samples)
+
+        Returns:
+            np.ndarray: Внутренний буфер с результатом; действителен до следующего вызова
+        """
+        frames = len(samples)
+        if frames > self.block_frames or samples.shape[1] != self.channels:
+            self._resize(max(frames, self.block_frames), samples.shape[1])
+        dtype = np.dtype(dtype or samples.dtype)
+        work = self._work[:frames]
+        src_offset, src_scale = _scale_of(samples.dtype)
+        dst_offset, dst_scale = _scale_of(dtype)
+
+        # Расчет ведется в единицах типа результата: одно копирование и одно умножение
+        np.copyto(work, samples, casting="unsafe")
+        if src_offset:
+            np.subtract(work, np.float32(src_offset), out=work)
+        np.multiply(work, np.float32(gain * dst_scale / src_scale), out=work)
+
+        # При усилении до 100% пики за пределы диапазона не выходят - ограничитель не нужен
+        if self.limiter == LIMITER_SOFT and gain > 1.0:
+            self._soft_limit(work, frames, dst_scale)
+        return self._to_dtype(work, frames, dtype, dst_offset, dst_scale)
+
+    def _soft_limit(self, work: np.ndarray, frames: int, scale: float) -> None:
+        # |y| = min(|x|, t) + (1 - t) * tanh(max(|x| - t, 0) / (1 - t)): ниже порога сигнал не меняется
+        t = np.float32(self.threshold * scale)
+        knee = np.float32((1.0 - self.threshold) * scale)
+        magnitude = self._magnitude[:frames]
+        excess = self._excess[:frames]
+        np.abs(work, out=magnitude)
+        np.subtract(magnitude, t, out=excess)
+        np.maximum(excess, np.float32(0), out=excess)
+        np.divide(excess, knee, out=excess)
+        np.tanh(excess, out=excess)
+        np.multiply(excess, knee, out=excess)
+        np.minimum(magnitude, t, out=magnitude)
+        np.add(magnitude, excess, out=magnitude)
+        np.copysign(magnitude, work, out=work)
+
+    def _to_dtype(self, work: np.ndarray, frames: int, dtype: np.dtype, offset: float, scale: float) -> np.ndarray:
+        out = self._out.get(dtype)
+        if out is None or len(out) < frames or out.shape[1] != work.shape[1]:
+            out = self._out[dtype] = np.empty((max(frames, self.block_frames), work.shape[1]), dtype=dtype)
+        out = out[:frames]
+        low, high = _limits_of(dtype)
+        np.minimum(work, high - offset, out=work)
+        np.maximum(work, low - offset, out=work)
+        if offset:
+            np.add(work, np.float32(offset), out=work)
+        np.copyto(out, work, casting="unsafe")
+        return out
+
+    def _resize(self, block_frames: int, channels: int) -> None:
+        self.block_frames = block_frames
+        self.channels = channels
+        self._work = np.empty((block_frames, channels), dtype=np.float32)
+        self._magnitude = np.empty_like(self._work)
+        self._excess = np.empty_like(self._work)
+        self._out = {}
+
+
+@lru_cache(maxsize=None)
+def _scale_of(dtype: np.dtype):
+    """Смещение нуля и полная шкала типа отсчетов"""
+    if dtype == np.uint8:
+        return 128.0, 128.0
+    if dtype.kind == "f":
+        return 0.0, 1.0
+    return 0.0, float(-np.iinfo(dtype).min)
+
+
+@lru_cache(maxsize=None)
+def _limits_of(dtype: np.dtype):
+    """Границы значений типа отсчетов в виде float32 (без выхода за диапазон при обратном приведении)"""
+    if dtype.kind == "f":
+        return np.float32(-1.0), np.float32(1.0)
+    info = np.iinfo(dtype)
+    high = np.float32(info.max)
+    if int(high) > info.max:
+        # int32: ближайшее к максимуму значение float32, не выходящее за диапазон
+        high = np.nextafter(high, np.float32(0))
+    return np.float32(info.min), high
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Работа с декодированным PCM для TTS Overlay
+Декодирование MP3 в память (один раз на фразу), запись и чтение WAV через mmap без копирования
+и LRU декодированных буферов в памяти для часто повторяемых фраз
+"""
+
+import io
+import os
+import mmap
+import wave
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+# Форматы данных в заголовке WAV
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass
+class PcmClip:
+    """Несжатый PCM-буфер (interleaved) с параметрами формата"""
+    data: memoryview
+    channels: int
+    sample_width: int
+    frame_rate: int
+    _mmap: Optional[mmap.mmap] = field(default=None, repr=False)
+
+    @property
+    def frame_size(self) -> int:
+        """Размер одного кадра (все каналы) в байтах"""
+        return self.channels * self.sample_width
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.data) // self.frame_size
+
+    @property
+    def duration(self) -> float:
+        """Длительность в секундах"""
+        return self.frame_count / self.frame_rate if self.frame_rate else 0.0
+
+    def close(self) -> None:
+        """Освобождение отображенного в память файла"""
+        if self._mmap is not None:
+            self.data.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Остались срезы буфера - файл закроется сборщиком мусора вместе с ними
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def ensure_ffmpeg_in_path() -> None:
+    """Добавление локальной копии ffmpeg (папка приложения) в PATH"""
+    ffmpeg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg", "bin")
+    if os.path.exists(os.path.join(ffmpeg_path, "ffmpeg.exe")) and ffmpeg_path not in os.environ["PATH"]:
+        os.environ["PATH"] += os.pathsep + ffmpeg_path
+        logging.debug(f"Путь к ffmpeg добавлен в PATH: {ffmpeg_path}")
+
+
+def decode_audio(source: Union[str, bytes], fmt: Optional[str] = None) -> "DecodedAudio":
+    """
+    Декодирование аудио (MP3 и др.) в память через pydub/ffmpeg
+
+    Args:
+        source: Путь к файлу или содержимое файла в памяти
+        fmt (str): Формат данных (для bytes; по умолчанию ffmpeg определяет сам)
+    """
+    from pydub import AudioSegment
+
+    ensure_ffmpeg_in_path()
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    segment = AudioSegment.from_file(source, format=fmt)
+    samples = np.frombuffer(segment.raw_data, dtype=SAMPLE_DTYPES[segment.sample_width])
+    return DecodedAudio(samples.reshape(-1, segment.channels), segment.frame_rate)
+
+
+def write_wav(audio: "DecodedAudio", dst_path: str) -> None:
+    """Запись декодированной фразы из памяти в WAV (без повторного декодирования)"""
+    with wave.open(dst_path, "wb") as f:
+        f.setnchannels(audio.channels)
+        f.setsampwidth(audio.sample_width)
+        f.setframerate(audio.frame_rate)
+        f.writeframes(np.ascontiguousarray(audio.samples).tobytes())
+
+
+def open_pcm(wav_path: str) -> PcmClip:
+    """
+    Открытие WAV-файла через mmap
+
+    Args:
+        wav_path (str): Путь к WAV-файлу с несжатым PCM
+
+    Returns:
+        PcmClip: Буфер, ссылающийся на данные файла без копирования
+    """
+    with open(wav_path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        if mm[0:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError(f"Файл не является WAV: {wav_path}")
+
+        fmt = None
+        pos = 12
+        while pos + 8 <= len(mm):
+            chunk_id = mm[pos:pos + 4]
+            chunk_size = struct.unpack("<I", mm[pos + 4:pos + 8])[0]
+            body = pos + 8
+            if chunk_id == b"fmt ":
+                audio_format, channels, rate, _, _, bits = struct.unpack("<HHIIHH", mm[body:body + 16])
+                if audio_format not in (WAVE_FORMAT_PCM, WAVE_FORMAT_EXTENSIBLE):
+                    raise ValueError(f"Неподдерживаемый формат WAV ({audio_format}): {wav_path}")
+                fmt = (channels, (bits + 7) // 8, rate)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"Блок data перед fmt в WAV: {wav_path}")
+                # Некоторые движки оставляют размер блока незаполненным
+                end = min(body + chunk_size, len(mm))
+                channels, width, rate = fmt
+                end -= (end - body) % (channels * width)
+                return PcmClip(memoryview(mm)[body:end], channels, width, rate, mm)
+            pos = body + chunk_size + (chunk_size & 1)
+        raise ValueError(f"В WAV нет блока данных: {wav_path}")
+    except Exception:
+        mm.close()
+        raise
+
+
+# Тип отсчетов numpy для каждой ширины сэмпла (24 бита расширяются до int32)
+SAMPLE_DTYPES = {1: np.uint8, 2: np.int16, 3: np.int32, 4: np.int32}
+
+
+def pcm_to_array(data, channels: int, sample_width: int) -> np.ndarray:
+    """Преобразование interleaved PCM в массив формы (кадры, каналы) с копированием в память"""
+    if sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = np.zeros((len(raw), 4), dtype=np.uint8)
+        samples[:, 1:] = raw
+        samples = samples.view("<i4").reshape(-1)
+    else:
+        samples = np.frombuffer(data, dtype=SAMPLE_DTYPES[sample_width]).copy()
+    return samples.reshape(-1, channels)
+
+
+def to_float32(samples: np.ndarray) -> np.ndarray:
+    """Перевод отсчетов в float32 в диапазоне [-1, 1]"""
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    return samples.astype(np.float32) / float(-np.iinfo(samples.dtype).min)
+
+
+def from_float32(samples: np.ndarray, dtype) -> np.ndarray:
+    """Перевод float32 [-1, 1] в целочисленные отсчеты заданного типа"""
+    if np.dtype(dtype) == np.uint8:
+        return np.clip(samples * 128.0 + 128.0, 0, 255).astype(np.uint8)
+    info = np.iinfo(dtype)
+    return np.clip(samples * float(-info.min), info.min, info.max).astype(dtype)
+
+
+def convert_format(samples: np.ndarray, src_rate: int, dst_rate: int, dst_channels: int, dst_dtype) -> np.ndarray:
+    """Передискретизация (линейная интерполяция) и приведение числа каналов и типа отсчетов"""
+    if src_rate == dst_rate and samples.shape[1] == dst_channels and samples.dtype == np.dtype(dst_dtype):
+        return samples
+
+    x = to_float32(samples)
+    if src_rate != dst_rate and len(x):
+        n_out = int(round(len(x) * dst_rate / src_rate))
+        positions = np.arange(n_out, dtype=np.float64) * (src_rate / dst_rate)
+        source = np.arange(len(x), dtype=np.float64)
+        x = np.stack([np.interp(positions, source, x[:, c]) for c in range(x.shape[1])], axis=1).astype(np.float32)
+
+    if x.shape[1] != dst_channels:
+        if x.shape[1] == 1:
+            x = np.repeat(x, dst_channels, axis=1)
+        elif dst_channels == 1:
+            x = x.mean(axis=1, keepdims=True)
+        else:
+            x = x[:, :dst_channels]
+
+    return np.ascontiguousarray(from_float32(x, dst_dtype))
+
+
+class DecodedAudio:
+    """Декодированная фраза в памяти и производные от нее объекты (например, pygame.Sound)"""
+
+    def __init__(self, samples: np.ndarray, frame_rate: int):
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self._derived: Dict[Any, Tuple[Any, int]] = {}
+        self._derived_bytes = 0
+        # Производные объекты создаются из потоков динамиков и микрофона одновременно
+        self._derived_lock = threading.Lock()
+        # Вызывается после роста nbytes (PcmLRU проверяет по нему лимит памяти)
+        self.on_grow: Optional[Callable[[], None]] = None
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def sample_width(self) -> int:
+        return self.samples.dtype.itemsize
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.frame_rate if self.frame_rate else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Занимаемая память, включая производные объекты"""
+        return self.samples.nbytes + self._derived_bytes
+
+    def derived(self, key: Any, factory: Callable[[], Any], nbytes: int = 0) -> Any:
+        """Производный объект, создаваемый один раз для этой фразы"""
+        with self._derived_lock:
+            item = self._derived.get(key)
+            if item is None:
+                item = self._derived[key] = (factory(), nbytes)
+                self._derived_bytes += nbytes
+                grown = nbytes > 0
+            else:
+                grown = False
+        on_grow = self.on_grow
+        if grown and on_grow is not None:
+            on_grow()
+        return item[0]
+
+    def forget_derived(self, predicate: Callable[[Any], bool]) -> int:
+        """Удаление производных объектов, ключ которых подходит под predicate. Возвращает их число"""
+        with self._derived_lock:
+            keys = [key for key in self._derived if predicate(key)]
+            for key in keys:
+                _, nbytes = self._derived.pop(key)
+                self._derived_bytes -= nbytes
+        return len(keys)
+
+    @classmethod
+    def from_wav(cls, wav_path: str) -> "DecodedAudio":
+        """Загрузка WAV в память"""
+        with open_pcm(wav_path) as clip:
+            samples = pcm_to_array(clip.data, clip.channels, clip.sample_width)
+            return cls(samples, clip.frame_rate)
+
+
+class PcmLRU:
+    """Ограниченный по объему (в байтах) LRU декодированных фраз в памяти"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, DecodedAudio]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def current_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def get(self, wav_path: str, loader: Optional[Callable[[], DecodedAudio]] = None) -> DecodedAudio:
+        """Фраза из памяти; при промахе загружается loader (по умолчанию WAV с диска) и помещается в LRU"""
+        with self._lock:
+            entry = self._entries.get(wav_path)
+            if entry is not None:
+                self._entries.move_to_end(wav_path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = loader() if loader is not None else DecodedAudio.from_wav(wav_path)
+        with self._lock:
+            self._entries[wav_path] = entry
+            self._entries.move_to_end(wav_path)
+            entry.on_grow = self._on_entry_grow
+            self._evict()
+        return entry
+
+    def set_budget(self, max_bytes: int) -> None:
+        """Изменение лимита памяти"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                entry.on_grow = None
+            self._entries.clear()
+
+    def forget_derived(self, predicate: Callable[[Any], bool]) -> int:
+        """Удаление устаревших производных объектов у всех фраз (например, Sound со старой громкостью)"""
+        with self._lock:
+            return sum(entry.forget_derived(predicate) for entry in self._entries.values())
+
+    def _on_entry_grow(self) -> None:
+        # У фразы в памяти появился производный объект (например, Sound) - лимит проверяется сразу
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        # Последняя добавленная фраза остается, даже если она больше лимита
+        total = self.current_bytes
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            entry.on_grow = None
+            total -= entry.nbytes
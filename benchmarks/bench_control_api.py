@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Нагрузка на локальный API управления (control_api) через loopback
+Сервер работает поверх настоящего SpeechEngine с поддельными движками и пустыми
+приемниками (см. bench_pipeline.py). Несколько клиентов по keep-alive соединениям
+отправляют серию /speak; измеряется время ответа API, число принятых фраз и ответов
+429 (частота или очередь), затем - итоговые статусы заданий через /jobs/<id>.
+
+Запуск: python benchmarks/bench_control_api.py [--requests 300] [--clients 8] [--rate 10] [--retry]
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import http.client
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import speech_engine  # noqa: E402
+from audio_pcm import DecodedAudio  # noqa: E402
+from bench_pipeline import FakeBackends, make_engine  # noqa: E402
+from control_api import ControlServer  # noqa: E402
+from latency_trace import percentile  # noqa: E402
+
+
+def request(conn: http.client.HTTPConnection, method: str, path: str, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = json.loads(response.read() or b"{}")
+    return response.status, data, response.getheader("Retry-After")
+
+
+def client(address, texts, retry: bool, results, lock) -> None:
+    """Последовательные /speak по одному соединению"""
+    conn = http.client.HTTPConnection(*address, timeout=30)
+    for text in texts:
+        while True:
+            started = time.perf_counter()
+            status, data, retry_after = request(conn, "POST", "/speak", {"text": text})
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                results["latency"].append(elapsed)
+                results["status"][status] += 1
+                if status in (200, 202):
+                    results["jobs"].append(data["id"])
+            if status == 429 and retry:
+                time.sleep(float(retry_after or 1))
+                continue
+            break
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="Всего запросов /speak")
+    parser.add_argument("--clients", type=int, default=8, help="Одновременных клиентов")
+    parser.add_argument("--rate", type=float, default=10.0, help="Ограничение API (запросов в секунду)")
+    parser.add_argument("--burst", type=float, default=50.0, help="Запас ограничения")
+    parser.add_argument("--max-queue", type=int, default=8, help="Длина очереди озвучивания")
+    parser.add_argument("--delay", type=float, default=0.05, help="Задержка синтеза поддельного движка (с)")
+    parser.add_argument("--distinct", type=int, default=20, help="Число разных фраз (остальные - повторы из кэша)")
+    parser.add_argument("--retry", action="store_true", help="Повторять после 429 через Retry-After")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)  # отклоненные фразы ожидаемы и не выводятся
+
+    backends = FakeBackends({"google": args.delay, "local": args.delay, "voicerss": args.delay}, 0.3)
+    sys.modules["gtts"] = backends.gtts_module()
+    speech_engine.decode_audio = lambda source, fmt=None: DecodedAudio.from_wav(source)
+    workdir = tempfile.mkdtemp(prefix="tts_api_bench_")
+    tts = make_engine(backends, "local", workdir, argparse.Namespace(mic=True, realtime=False))
+    tts.scheduler.max_queue = args.max_queue
+    server = ControlServer(tts, rate=args.rate, burst=args.burst).start()
+
+    texts = [f"Сообщение чата номер {i % args.distinct}." for i in range(args.requests)]
+    per_client = [texts[i::args.clients] for i in range(args.clients)]
+    results = {"latency": [], "status": Counter(), "jobs": []}
+    lock = threading.Lock()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(server.address, chunk, args.retry, results, lock))
+               for chunk in per_client]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sent = time.perf_counter() - started
+
+    # Ждем завершения принятых заданий и собираем итоговые статусы
+    conn = http.client.HTTPConnection(*server.address, timeout=30)
+    final = Counter()
+    for job_id in results["jobs"]:
+        while True:
+            status, data, _ = request(conn, "GET", f"/jobs/{job_id}")
+            if status != 200 or data["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.05)
+        final[data.get("status", status)] += 1
+    _, stats, _ = request(conn, "GET", "/stats")
+    conn.close()
+    server.stop()
+    tts.close()
+
+    latency = sorted(results["latency"])
+    print(f"Запросов: {args.requests} от {args.clients} клиентов за {sent:.2f} с "
+          f"({args.requests / sent * 60:.0f} в минуту); ограничение {args.rate:.0f}/с, запас {args.burst:.0f}")
+    print(f"Ответ API: p50 {percentile(latency, 50):.2f}  p99 {percentile(latency, 99):.2f}  "
+          f"max {latency[-1]:.2f} мс")
+    print(f"HTTP-коды: {dict(sorted(results['status'].items()))}")
+    print(f"Итог принятых заданий: {dict(final)}")
+    print(f"Счетчики API: {stats['api']}")
+    print(f"Очередь: {stats['engine']['queue']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сравнение усиления громкости микрофона: прежний цикл записи и GainStage
+Пропускная способность (во сколько раз быстрее реального времени) и пик выделенной памяти
+
+Запуск: python benchmarks/bench_gain_stage.py [--seconds 30] [--gain 1.5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_dsp import GainStage, LIMITER_HARD, LIMITER_SOFT  # noqa: E402
+
+CHUNK = 1024
+
+
+def legacy_loop(data: bytes, gain: float) -> int:
+    """Прежний цикл: frombuffer, умножение во float64, clip, astype и tobytes на каждый блок"""
+    written = 0
+    step = CHUNK * 2 * 2
+    for offset in range(0, len(data), step):
+        chunk = data[offset:offset + step]
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        audio_data = np.clip(samples * gain, -32768, 32767).astype(np.int16)
+        written += len(audio_data.tobytes())
+    return written
+
+
+def gain_stage_loop(samples: np.ndarray, gain: float, stage: GainStage) -> int:
+    """GainStage: блоки обрабатываются в предвыделенных буферах"""
+    written = 0
+    for offset in range(0, len(samples), CHUNK):
+        written += stage.process(samples[offset:offset + CHUNK], gain).nbytes
+    return written
+
+
+def measure(name, func, duration, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+
+    # Пиковый объем памяти, выделенной за проход (буферы GainStage выделены заранее и не учитываются)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<20} {best * 1000:8.1f} мс  x{duration / best:8.0f} реального времени  "
+          f"пик выделенной памяти {peak / 1024:8.1f} КБ")
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Длительность тестового сигнала")
+    parser.add_argument("--rate", type=int, default=48000)
+    parser.add_argument("--gain", type=float, default=1.5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = int(args.seconds * args.rate)
+    samples = (rng.standard_normal((frames, 2)) * 8000).clip(-32768, 32767).astype(np.int16)
+    data = samples.tobytes()
+    blocks = (frames + CHUNK - 1) // CHUNK
+    print(f"Сигнал: {args.seconds:.0f} с, {args.rate} Гц, 2 кан., int16; блоков по {CHUNK} кадров: {blocks}; "
+          f"усиление {args.gain}")
+
+    hard = GainStage(CHUNK, 2, limiter=LIMITER_HARD)
+    soft = GainStage(CHUNK, 2, limiter=LIMITER_SOFT)
+    legacy_time, legacy_peak = measure("прежний цикл", lambda: legacy_loop(data, args.gain), args.seconds)
+    hard_time, hard_peak = measure("GainStage (hard)", lambda: gain_stage_loop(samples, args.gain, hard), args.seconds)
+    soft_time, _ = measure("GainStage (soft)", lambda: gain_stage_loop(samples, args.gain, soft), args.seconds)
+
+    print(f"\nУскорение (hard): x{legacy_time / hard_time:.2f}, пик памяти: "
+          f"{legacy_peak / 1024:.1f} КБ -> {hard_peak / 1024:.1f} КБ")
+    print(f"Мягкий ограничитель относительно прежнего цикла: x{legacy_time / soft_time:.2f}")
+    print("Выделения на блок в прежнем цикле: срез bytes, float64 после умножения, результат clip, "
+          "int16 после astype, bytes из tobytes; в GainStage - только представления (view) буферов")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Автоповтор горячих клавиш истории: прямая регистрация против HotkeyDispatcher
+Через FakeKeyboardBackend воспроизводятся удержание Ctrl+3 (автоповтор с заданной
+частотой) и серия отдельных нажатий, пока фраза еще звучит. Фраза - задание
+настоящего SpeechScheduler, которое "звучит" заданное время. Сравнивается число
+поставленных в очередь фраз и счетчики диспетчера.
+
+Запуск: python benchmarks/bench_hotkeys.py [--hold 1.5] [--repeat-hz 30] [--taps 4] [--phrase 1.0]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hotkey_dispatcher import FakeKeyboardBackend, HotkeyDispatcher  # noqa: E402
+from speech_scheduler import SpeechScheduler  # noqa: E402
+
+COMBO = "ctrl+3"
+PHRASE = "Иду на точку B"
+
+
+def press_pattern(backend: FakeKeyboardBackend, hold: float, repeat_hz: float, taps: int) -> int:
+    """Удержание с автоповтором, затем отдельные нажатия через 0.4 с. Returns: число событий"""
+    events = 0
+    ended = time.perf_counter() + hold
+    while time.perf_counter() < ended:
+        backend.trigger(COMBO)
+        events += 1
+        time.sleep(1.0 / repeat_hz)
+    for _ in range(taps):
+        time.sleep(0.4)
+        backend.trigger(COMBO)
+        events += 1
+    return events
+
+
+def run(use_dispatcher: bool, args) -> None:
+    scheduler = SpeechScheduler(workers=1, max_queue=1000)
+    speak = lambda: scheduler.submit(lambda token: token.wait(args.phrase), key=PHRASE)  # noqa: E731
+    backend = FakeKeyboardBackend()
+    dispatcher = None
+    if use_dispatcher:
+        dispatcher = HotkeyDispatcher(backend, debounce=args.debounce)
+        dispatcher.register(COMBO, "history_3", speak, key=lambda: PHRASE)
+    else:
+        backend.add_hotkey(COMBO, speak, suppress=True)
+
+    events = press_pattern(backend, args.hold, args.repeat_hz, args.taps)
+    metrics = scheduler.metrics()
+    scheduler.shutdown()
+    name = "HotkeyDispatcher" if use_dispatcher else "прямая регистрация"
+    print(f"{name:<20} событий {events:4d} -> фраз в очереди {metrics['submitted']:4d}")
+    if dispatcher is not None:
+        stats = dispatcher.stats()
+        print(f"{'':<20} выполнено {stats['dispatched']}, отсеяно debounce {stats['debounced']}, "
+              f"схлопнуто {stats['coalesced']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hold", type=float, default=1.5, help="Время удержания клавиши (с)")
+    parser.add_argument("--repeat-hz", type=float, default=30.0, help="Частота автоповтора")
+    parser.add_argument("--taps", type=int, default=4, help="Отдельных нажатий после удержания")
+    parser.add_argument("--phrase", type=float, default=1.0, help="Длительность фразы (с)")
+    parser.add_argument("--debounce", type=float, default=0.25, help="Пауза debounce (с)")
+    args = parser.parse_args()
+
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Дрожание (jitter) цикла записи в микрофон при синхронном и асинхронном логировании
+Цикл повторяет темп потока микрофона (256 кадров при 48 кГц = 5.3 мс) и пишет
+запись журнала на каждой итерации; параллельно другой поток логирует как интерфейс
+и горячие клавиши. Измеряется время итерации (работа + логирование) и опоздание
+относительно расписания для трех вариантов: без журнала, FileHandler в том же
+потоке (прежний basicConfig) и очередь с QueueListener (log_setup)
+
+Запуск: python benchmarks/bench_log_jitter.py [--seconds 5] [--fsync] [--noise 200]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from latency_trace import percentile  # noqa: E402
+from log_setup import setup_logging, shutdown_logging, LOG_FORMAT  # noqa: E402
+
+FRAMES = 256
+RATE = 48000
+
+
+class FsyncFileHandler(logging.FileHandler):
+    """FileHandler, дожидающийся записи на диск (медленный диск или антивирус)"""
+
+    def flush(self):
+        super().flush()
+        if self.stream is not None:
+            os.fsync(self.stream.fileno())
+
+
+def configure(mode: str, path: str, fsync: bool) -> None:
+    root = logging.getLogger()
+    shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.DEBUG)
+    if mode == "sync":
+        handler = FsyncFileHandler(path, "w", "utf-8") if fsync else logging.FileHandler(path, "w", "utf-8")
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+    elif mode == "queue":
+        listener = setup_logging(path, console=False)
+        if fsync:
+            handler = FsyncFileHandler(path, "w", "utf-8")
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            listener.handlers = (handler,)
+    else:
+        root.setLevel(logging.CRITICAL)
+
+
+def mic_loop(seconds: float):
+    """Цикл в темпе потока микрофона: итерации по расписанию, запись журнала на каждой"""
+    period = FRAMES / RATE
+    iterations = int(seconds / period)
+    work, late = [], []
+    block = bytearray(FRAMES * 4)
+    start = time.perf_counter()
+    for i in range(iterations):
+        target = start + i * period
+        while True:
+            remaining = target - time.perf_counter()
+            if remaining <= 0:
+                break
+            if remaining > 0.002:
+                time.sleep(remaining - 0.001)
+        began = time.perf_counter()
+        late.append((began - target) * 1000)
+        block[i % len(block)] = i & 0xFF  # имитация записи блока
+        logging.debug(f"Микрофон: записан блок {i}, {len(block)} байт")
+        work.append((time.perf_counter() - began) * 1000)
+    return work, late
+
+
+def noise(stop: threading.Event, rate: float) -> None:
+    """Параллельное логирование (интерфейс, горячие клавиши, воспроизведение)"""
+    i = 0
+    while not stop.wait(1.0 / rate):
+        logging.info(f"[HOTKEY] событие {i}")
+        i += 1
+
+
+def report(name: str, work, late) -> None:
+    work, late = sorted(work), sorted(late)
+    print(f"{name:<22} итерация p50 {percentile(work, 50):6.3f}  p99 {percentile(work, 99):7.3f}  "
+          f"max {work[-1]:7.2f} мс | опоздание p99 {percentile(late, 99):6.2f}  max {late[-1]:6.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="Длительность каждого прогона")
+    parser.add_argument("--fsync", action="store_true", help="Ждать записи на диск после каждой записи журнала")
+    parser.add_argument("--noise", type=float, default=200.0, help="Записей журнала в секунду из другого потока")
+    args = parser.parse_args()
+
+    folder = tempfile.mkdtemp(prefix="tts_log_bench_")
+    print(f"Цикл: {FRAMES} кадров при {RATE} Гц ({FRAMES / RATE * 1000:.2f} мс), {args.seconds:.0f} с; "
+          f"фоновое логирование {args.noise:.0f}/с; fsync: {'да' if args.fsync else 'нет'}\n")
+    for mode, name in (("off", "без журнала"), ("sync", "синхронный FileHandler"), ("queue", "очередь (log_setup)")):
+        configure(mode, os.path.join(folder, f"{mode}.log"), args.fsync)
+        stop = threading.Event()
+        thread = threading.Thread(target=noise, args=(stop, args.noise), daemon=True)
+        if args.noise > 0:
+            thread.start()
+        work, late = mic_loop(args.seconds)
+        stop.set()
+        if thread.is_alive():
+            thread.join()
+        shutdown_logging()
+        report(name, work, late)
+    print(f"\nЖурналы: {folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Сквозной замер задержки озвучивания без интерфейса и без аудиоустройств
+Настоящее ядро SpeechEngine (text_to_speech -> синтез через кэш -> декодирование ->
+DualPlayback) с поддельными движками (gTTS, pyttsx3, VoiceRSS) с заданными задержками
+и пустыми приемниками, которые отмечают момент первого сэмпла.
+
+Для каждого движка три прохода по одному набору фраз:
+    cold         - пустой кэш на диске и в памяти (синтез + декодирование)
+    warm_disk    - файлы в кэше, память очищена (чтение PCM с диска)
+    warm_memory  - повтор из памяти
+Отчет: время до первого звука (p50/p95/max), фраз в секунду и процессорное время на фразу.
+Результат сохраняется в JSON вместе с хэшем коммита для сравнения между версиями.
+Окно и горячие клавиши не нужны, pygame и PyAudio не загружаются.
+
+Запуск:
+    python benchmarks/bench_pipeline.py [--phrases 20] [--output results.json]
+    python benchmarks/bench_pipeline.py --compare old.json
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import types
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio_pcm import DecodedAudio, write_wav  # noqa: E402
+from dual_playback import _sleep_until  # noqa: E402
+from latency_trace import UtteranceTrace, percentile  # noqa: E402
+from speech_scheduler import CancelToken  # noqa: E402
+from tts_settings import TTSSettings  # noqa: E402
+import speech_engine  # noqa: E402
+ENGINES = ("google", "local", "voicerss")
+PASSES = ("cold", "warm_disk", "warm_memory")
+
+
+def make_wav_bytes(seconds: float, rate: int = 22050) -> bytes:
+    """WAV с тоном заданной длительности (моно, int16) - ответ поддельных движков"""
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16).reshape(-1, 1)
+    buffer = io.BytesIO()
+    write_wav(DecodedAudio(samples, rate), buffer)
+    return buffer.getvalue()
+
+
+class FakeBackends:
+    """Поддельные движки: ждут заданное время и отдают WAV"""
+
+    def __init__(self, delays, audio_seconds: float):
+        self.delays = delays
+        self.audio = make_wav_bytes(audio_seconds)
+
+    def gtts_module(self):
+        """Модуль gtts с классом gTTS (synthesize_google импортирует его при вызове)"""
+        backends = self
+
+        class gTTS:
+            def __init__(self, text, lang="ru", slow=False):
+                self.text = text
+
+            def save(self, path):
+                time.sleep(backends.delays["google"])
+                with open(path, "wb") as f:
+                    f.write(backends.audio)
+
+        module = types.ModuleType("gtts")
+        module.gTTS = gTTS
+        return module
+
+    def pyttsx3_engine(self):
+        """Движок с интерфейсом pyttsx3 для LocalTTSWorker(engine_factory=...)"""
+        backends = self
+
+        class Engine:
+            def __init__(self):
+                self._pending = []
+
+            def getProperty(self, name):
+                return []
+
+            def setProperty(self, name, value):
+                pass
+
+            def save_to_file(self, text, path):
+                self._pending.append(path)
+
+            def runAndWait(self):
+                for path in self._pending:
+                    time.sleep(backends.delays["local"])
+                    with open(path, "wb") as f:
+                        f.write(backends.audio)
+                self._pending = []
+
+            def stop(self):
+                self._pending = []
+
+        return Engine()
+
+    def voicerss_session(self):
+        """Сессия requests для VoiceRSSAPI: ответ после задержки сети"""
+        backends = self
+
+        class Response:
+            status_code = 200
+            headers = {}
+            content = backends.audio
+
+        class Session:
+            def get(self, url, params=None, timeout=None):
+                time.sleep(backends.delays["voicerss"])
+                return Response()
+
+            def close(self):
+                pass
+
+        return Session()
+
+
+class NullSink:
+    """Приемник без устройства: стартует в назначенный момент и запоминает время первого сэмпла"""
+
+    def __init__(self, name: str, latency: float = 0.0, realtime: bool = False):
+        self.name = name
+        self.latency = latency
+        self.realtime = realtime
+        self.started_at = None
+        self._duration = 0.0
+
+    def prepare(self, audio):
+        self._duration = audio.duration
+
+    def start(self, audio, target_time, should_stop):
+        _sleep_until(target_time)
+        self.started_at = time.perf_counter()
+
+    def wait(self, should_stop):
+        if self.realtime:
+            _sleep_until(self.started_at + self._duration)
+
+
+class BenchEngine(speech_engine.SpeechEngine):
+    """SpeechEngine с пустыми приемниками вместо pygame и PyAudio; задержка вывода как у настоящих устройств"""
+
+    def __init__(self, settings, realtime: bool, **kwargs):
+        super().__init__(settings, **kwargs)
+        self.realtime = realtime
+
+    def speaker_sink(self):
+        return NullSink("speaker", self.settings.mixer_buffer / self.settings.mixer_frequency, self.realtime)
+
+    def mic_sink(self, mic_index, trace=None):
+        return NullSink("mic", 256 / self.settings.mic_sample_rate, self.realtime)
+
+
+def make_engine(backends: FakeBackends, engine: str, workdir: str, args) -> BenchEngine:
+    """Ядро озвучивания с поддельными движками и кэшем во временной папке"""
+    settings = TTSSettings(settings_path=os.path.join(workdir, "settings.json"))
+    settings.tts_engine = engine
+    settings.google_streaming = False
+    settings.mic_device_index = 0 if args.mic else -1
+    settings.voicerss_api_key = "benchmark"
+    tts = BenchEngine(settings, args.realtime, cache_folder=os.path.join(workdir, "cache"),
+                      local_engine_factory=backends.pyttsx3_engine)
+    from voice_api import VoiceRSSAPI
+    tts._voicerss = VoiceRSSAPI("benchmark", cache=tts.audio_cache, session=backends.voicerss_session())
+    tts._voicerss_loaded = True
+    return tts
+
+
+def run_pass(tts, phrases):
+    """Последовательное озвучивание фраз; метки берутся из трассировки фразы"""
+    traces = []
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for text in phrases:
+        trace = UtteranceTrace(text, tts.settings.tts_engine)
+        tts.text_to_speech(text, CancelToken(), trace)
+        traces.append(trace)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    ttfa = sorted(t.durations()["first_speaker"] for t in traces if "first_speaker" in t.durations())
+    hits = sum(1 for t in traces if t.cache == "hit")
+    return {
+        "phrases": len(phrases),
+        "played": len(ttfa),
+        "cache_hits": hits,
+        "ttfa_p50_ms": round(percentile(ttfa, 50), 2),
+        "ttfa_p95_ms": round(percentile(ttfa, 95), 2),
+        "ttfa_max_ms": round(ttfa[-1], 2) if ttfa else None,
+        "phrases_per_s": round(len(phrases) / elapsed, 2) if elapsed > 0 else None,
+        "cpu_ms_per_phrase": round(cpu * 1000 / len(phrases), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(old_path: str, results) -> None:
+    """Разница с сохраненным прогоном"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    print(f"\nСравнение с {old_path} (коммит {old.get('commit')}):")
+    for engine, passes in results["engines"].items():
+        for name, current in passes.items():
+            before = old.get("engines", {}).get(engine, {}).get(name)
+            if not before:
+                continue
+            print(f"  {engine:<9} {name:<12} ttfa p50 {before['ttfa_p50_ms']:8.1f} -> {current['ttfa_p50_ms']:8.1f} мс, "
+                  f"фраз/с {before['phrases_per_s']:7.2f} -> {current['phrases_per_s']:7.2f}, "
+                  f"CPU {before['cpu_ms_per_phrase']:7.2f} -> {current['cpu_ms_per_phrase']:7.2f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phrases", type=int, default=20, help="Число разных фраз в проходе")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--google-delay", type=float, default=0.35, help="Задержка синтеза gTTS (с)")
+    parser.add_argument("--local-delay", type=float, default=0.15, help="Задержка синтеза pyttsx3 (с)")
+    parser.add_argument("--voicerss-delay", type=float, default=0.5, help="Задержка ответа VoiceRSS (с)")
+    parser.add_argument("--audio-seconds", type=float, default=1.5, help="Длительность синтезируемой фразы")
+    parser.add_argument("--no-mic", dest="mic", action="store_false", help="Без приемника микрофона")
+    parser.add_argument("--realtime", action="store_true", help="Приемники ждут длительность фразы")
+    parser.add_argument("--output", default="bench_pipeline.json", help="Файл результатов (JSON)")
+    parser.add_argument("--compare", help="Сравнить с ранее сохраненным JSON")
+    args = parser.parse_args()
+
+    delays = {"google": args.google_delay, "local": args.local_delay, "voicerss": args.voicerss_delay}
+    backends = FakeBackends(delays, args.audio_seconds)
+    sys.modules["gtts"] = backends.gtts_module()
+    phrases = [f"Проверочная фраза номер {i}." for i in range(args.phrases)]
+
+    workdir = tempfile.mkdtemp(prefix="tts_pipeline_bench_")
+    # WAV от поддельных движков декодируется без ffmpeg (длительность декодирования MP3 не учитывается)
+    speech_engine.decode_audio = lambda source, fmt=None: DecodedAudio.from_wav(source)
+
+    results = {
+        "commit": git_commit(),
+        "generated": time.time(),
+        "python": platform.python_version(),
+        "config": {"phrases": args.phrases, "delays_s": delays, "audio_seconds": args.audio_seconds,
+                   "mic": args.mic, "realtime": args.realtime},
+        "engines": {},
+    }
+    print(f"Коммит {results['commit']}, фраз: {args.phrases}, задержки движков: {delays}\n")
+    try:
+        for engine in args.engines:
+            engine_dir = os.path.join(workdir, engine)
+            os.makedirs(engine_dir)
+            tts = make_engine(backends, engine, engine_dir, args)
+            passes = {}
+            try:
+                for name in PASSES:
+                    if name == "warm_disk":
+                        tts.pcm_lru.clear()
+                        time.sleep(0.2)  # PCM пишется в кэш в фоне после первого воспроизведения
+                    passes[name] = run_pass(tts, phrases)
+                    p = passes[name]
+                    print(f"{engine:<9} {name:<12} до первого звука p50 {p['ttfa_p50_ms']:8.1f}  "
+                          f"p95 {p['ttfa_p95_ms']:8.1f} мс | {p['phrases_per_s']:7.2f} фраз/с | "
+                          f"CPU {p['cpu_ms_per_phrase']:7.2f} мс/фразу | из кэша {p['cache_hits']}/{p['phrases']}")
+            finally:
+                tts.close()
+            results["engines"][engine] = passes
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены: {args.output}")
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Стоимость запуска TTS Overlay по компонентам
+Каждый замер - в отдельном свежем процессе, чтобы модули не были уже загружены:
+время импорта зависимостей, импорт основного модуля приложения и инициализация
+аудио (микшер pygame, PyAudio, pyttsx3)
+
+Запуск: python benchmarks/bench_startup.py [--repeat 3]
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULE = os.path.join(ROOT, "tts_overlay copy speed w bug.py")
+
+# Название -> код, время выполнения которого измеряется
+IMPORTS = [
+    ("numpy", "import numpy"),
+    ("TKinterModernThemes", "import TKinterModernThemes"),
+    ("keyboard", "import keyboard"),
+    ("pygame", "import pygame"),
+    ("pyaudio", "import pyaudio"),
+    ("requests", "import requests"),
+    ("gtts", "import gtts"),
+    ("pydub", "import pydub"),
+    ("pyttsx3", "import pyttsx3"),
+    ("модуль приложения",
+     "import importlib.util\n"
+     "spec = importlib.util.spec_from_file_location('tts_overlay_app', APP_MODULE)\n"
+     "spec.loader.exec_module(importlib.util.module_from_spec(spec))"),
+]
+
+# Подготовка (не измеряется) и измеряемая инициализация
+INITS = [
+    ("pygame.mixer.init", "import pygame", "pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)"),
+    ("pyaudio.PyAudio()", "import pyaudio", "pyaudio.PyAudio().terminate()"),
+    ("pyttsx3.init()", "import pyttsx3", "pyttsx3.init()"),
+]
+
+CHILD = """
+import os, sys, json, time
+sys.path.insert(0, {root!r})
+APP_MODULE = {app!r}
+sys.stdout = open(os.devnull, "w")
+try:
+    exec({setup!r})
+    started = time.perf_counter()
+    exec({code!r})
+    result = {{"ms": (time.perf_counter() - started) * 1000}}
+except Exception as e:
+    result = {{"error": f"{{type(e).__name__}}: {{e}}"}}
+sys.__stdout__.write(json.dumps(result))
+"""
+
+
+def measure(setup: str, code: str):
+    """Время выполнения code в свежем процессе (мс) или текст ошибки"""
+    child = CHILD.format(root=ROOT, app=APP_MODULE, setup=setup, code=code)
+    proc = subprocess.run([sys.executable, "-c", child], capture_output=True, text=True, timeout=120)
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {"error": (proc.stderr.strip().splitlines() or ["нет вывода"])[-1]}
+
+
+def report(name: str, setup: str, code: str, repeat: int) -> None:
+    results = [measure(setup, code) for _ in range(repeat)]
+    times = [r["ms"] for r in results if "ms" in r]
+    if not times:
+        error = results[0]["error"]
+        status = "недоступен" if "ModuleNotFoundError" in error else f"ошибка: {error}"
+        print(f"{name:<22} {status}")
+        return
+    print(f"{name:<22} {min(times):8.1f} мс (лучшее из {len(times)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Число свежих процессов на замер")
+    args = parser.parse_args()
+
+    print(f"Python {sys.version.split()[0]}, {args.repeat} процесс(а) на замер\n")
+    print("Импорт:")
+    for name, code in IMPORTS:
+        report(name, "", code, args.repeat)
+    print("\nИнициализация:")
+    for name, setup, code in INITS:
+        report(name, setup, code, args.repeat)
+    print("\nПри запуске приложения загружаются numpy, TKinterModernThemes, keyboard и модуль приложения;"
+          "\nмикшер pygame - в фоновом прогреве после показа окна; PyAudio, pyttsx3 и requests - там же,"
+          "\nно только для выбранных в настройках движка и устройства микрофона")
+
+
+if __name__ == "__main__":
+    main()
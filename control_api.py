@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Локальный HTTP API управления озвучиванием
+Другие процессы (бот трансляции, чат) отправляют текст на 127.0.0.1 в JSON вместо
+эмуляции нажатий клавиш в окне. Фразы идут в ту же очередь, что и из окна; при
+перегрузке сервер отвечает 429 с Retry-After, а не накапливает задания.
+
+    POST /speak     {"text": "...", "policy": "fifo", "wait": 0}  -> задание (202, 200 если дождались)
+    POST /stop      {}                                           -> отмена очереди и остановка звука
+    POST /prefetch  {"texts": ["...", "..."]}                    -> синтез заранее без воспроизведения
+    GET  /jobs/<id>                                              -> статус и задержки задания
+    GET  /stats                                                  -> статистика ядра и API
+    GET  /health
+
+Все POST-запросы - только с Content-Type: application/json (даже без тела), а Host должен
+быть 127.0.0.1 или localhost: страница в браузере не может отправить такой запрос без preflight
+"""
+
+import json
+import math
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rate_limit import TokenBucket
+from speech_scheduler import POLICIES, SpeechJob
+
+MAX_WAIT = 30.0  # Максимальное ожидание завершения фразы в /speak (секунды)
+
+# Допустимые значения заголовка Host (без порта): чужое имя означает DNS rebinding из браузера
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "[::1]")
+
+
+def job_to_dict(job: SpeechJob) -> Dict[str, Any]:
+    """Статус задания и задержки (мс): ожидание в очереди, выполнение, всего, этапы трассировки"""
+    def ms(start: Optional[float], end: Optional[float]) -> Optional[float]:
+        return round((end - start) * 1000, 2) if start is not None and end is not None else None
+
+    result = {
+        "id": job.id,
+        "status": job.status,
+        "timing_ms": {
+            "queue_wait": ms(job.enqueued_at, job.started_at),
+            "run": ms(job.started_at, job.finished_at),
+            "total": ms(job.enqueued_at, job.finished_at),
+        },
+    }
+    if job.error is not None:
+        result["error"] = str(job.error)
+    if job.trace is not None:
+        result["cache"] = job.trace.cache
+        result["latency_ms"] = {stage: round(value, 2) for stage, value in job.trace.durations().items()}
+    return result
+
+
+def host_name(host: str) -> str:
+    """Имя из заголовка Host без порта (IPv6-адрес остается в скобках)"""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[:host.find("]") + 1]
+    return host.rsplit(":", 1)[0] if ":" in host else host
+
+
+class JobRegistry:
+    """Последние задания по номеру (старые вытесняются, чтобы память не росла)"""
+
+    def __init__(self, keep: int = 1000):
+        self.keep = keep
+        self._jobs: "OrderedDict[int, SpeechJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, job: SpeechJob) -> None:
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.keep:
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: int) -> Optional[SpeechJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class ApiError(Exception):
+    """Ошибка запроса: HTTP-код, сообщение и необязательный Retry-After (секунды)"""
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Server(ThreadingHTTPServer):
+    """HTTP-сервер с ограничением числа одновременных соединений"""
+
+    daemon_threads = True
+
+    def __init__(self, address, handler, api: "ControlServer", max_connections: int):
+        self.api = api
+        self._slots = threading.BoundedSemaphore(max_connections)
+        super().__init__(address, handler)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            # Сверх лимита соединение закрывается сразу, без отдельного потока
+            self.api._count("busy")
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: серия запросов идет по одному соединению
+    server_version = "TTSOverlay"
+    # Заголовки и тело ответа уходят отдельными записями; без TCP_NODELAY вторая ждет
+    # отложенного ACK клиента (~40 мс на каждый запрос)
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        # Простаивающее keep-alive соединение закрывается по таймауту и освобождает слот сервера
+        self.timeout = self.server.api.idle_timeout
+        super().setup()
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def log_message(self, format, *args):
+        logging.debug(f"[API] {self.address_string()} {format % args}")
+
+    def _dispatch(self, method: str) -> None:
+        api: ControlServer = self.server.api
+        try:
+            status, payload = api.handle(method, self.path, self.headers, self._read_body(api))
+            self._reply(status, payload)
+        except ApiError as e:
+            self._reply(e.status, {"error": str(e)}, e.retry_after)
+        except Exception as e:
+            logging.error(f"[API] Ошибка обработки {method} {self.path}: {e}")
+            self._reply(500, {"error": "internal error"})
+
+    def _read_body(self, api: "ControlServer") -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > api.max_body:
+            self.close_connection = True
+            raise ApiError(413, f"Тело запроса больше {api.max_body} байт")
+        return self.rfile.read(length) if length > 0 else b""
+
+    def _reply(self, status: int, payload: Dict[str, Any], retry_after: Optional[float] = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if retry_after is not None:
+            self.send_header("Retry-After", str(max(1, math.ceil(retry_after))))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ControlServer:
+    """
+    HTTP API поверх SpeechEngine, только на loopback
+
+    Args:
+        engine (SpeechEngine): Ядро озвучивания (stop, prefetch, stats)
+        host (str): Адрес (по умолчанию 127.0.0.1)
+        port (int): Порт (0 - свободный порт, см. address)
+        speak (callable): Постановка фразы в очередь: speak(text, policy) -> SpeechJob
+            (по умолчанию engine.say; окно передает свой обработчик с историей фраз)
+        token (str): Если задан, запросы должны содержать заголовок Authorization: Bearer <token>
+        rate, burst: Ограничение частоты /speak и /prefetch (запросов в секунду и запас)
+        max_prefetch (int): Сколько фраз может ждать подготовки в /prefetch
+        max_connections (int): Одновременных соединений (сверх лимита - 503)
+        max_body (int): Максимальный размер тела запроса (байт)
+        idle_timeout (float): Сколько секунд соединение может простаивать между запросами
+    """
+
+    def __init__(self, engine, host: str = "127.0.0.1", port: int = 0,
+                 speak: Optional[Callable[[str, Optional[str]], SpeechJob]] = None, token: Optional[str] = None,
+                 rate: float = 10.0, burst: float = 50.0, max_prefetch: int = 64, max_connections: int = 32,
+                 max_body: int = 64 * 1024, keep_jobs: int = 1000, idle_timeout: float = 5.0):
+        self.engine = engine
+        self.speak = speak or (lambda text, policy: engine.say(text, policy))
+        self.token = token or None
+        self.bucket = TokenBucket(rate, burst) if rate and rate > 0 else None
+        self.max_prefetch = max_prefetch
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.jobs = JobRegistry(keep_jobs)
+        self._prefetch_pending = 0
+        self._lock = threading.Lock()
+        self._counters = {"requests": 0, "accepted": 0, "rate_limited": 0, "queue_full": 0, "busy": 0,
+                          "bad_request": 0, "unauthorized": 0}
+        self._httpd = _Server((host, port), _Handler, self, max_connections)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._httpd.server_address[:2]
+
+    @property
+    def url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ControlServer":
+        """Запуск сервера в фоновом потоке"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="control-api", daemon=True)
+        self._thread.start()
+        logging.info(f"API управления слушает {self.url}")
+        return self
+
+    def stop(self) -> None:
+        """Остановка сервера и закрытие сокета"""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            result = dict(self._counters)
+            result["prefetch_pending"] = self._prefetch_pending
+        return result
+
+    def handle(self, method: str, path: str, headers, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Обработка запроса. Returns: (HTTP-код, ответ); ошибки - ApiError"""
+        self._count("requests")
+        host = headers.get("Host")
+        if host is not None and host_name(host) not in LOOPBACK_HOSTS:
+            self._count("bad_request")
+            raise ApiError(403, "Запросы принимаются только на 127.0.0.1 или localhost")
+        if self.token and headers.get("Authorization") != f"Bearer {self.token}":
+            self._count("unauthorized")
+            raise ApiError(401, "Неверный или отсутствующий токен")
+        path = path.split("?", 1)[0].rstrip("/") or "/"
+
+        if method == "GET":
+            if path == "/health":
+                return 200, {"ok": True}
+            if path == "/stats":
+                return 200, {"engine": self.engine.stats(), "api": self.stats()}
+            if path.startswith("/jobs/"):
+                try:
+                    job = self.jobs.get(int(path[len("/jobs/"):]))
+                except ValueError:
+                    job = None
+                if job is None:
+                    raise ApiError(404, "Задание не найдено")
+                return 200, job_to_dict(job)
+            raise ApiError(404, "Неизвестный путь")
+
+        if path not in ("/speak", "/stop", "/prefetch"):
+            raise ApiError(404, "Неизвестный путь")
+        data = self._parse_json(headers, body)
+        if path == "/stop":
+            self.engine.stop()
+            return 200, {"stopped": True}
+        if path == "/speak":
+            return self._speak(data)
+        return self._prefetch(data)
+
+    def _speak(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        text = data.get("text")
+        if not isinstance(text, str) or not text.strip():
+            self._count("bad_request")
+            raise ApiError(400, "Поле text должно быть непустой строкой")
+        policy = data.get("policy")
+        if policy is not None and policy not in POLICIES:
+            self._count("bad_request")
+            raise ApiError(400, f"Неизвестная политика очереди: {policy}")
+        try:
+            wait = min(max(float(data.get("wait") or 0), 0.0), MAX_WAIT)
+        except (TypeError, ValueError):
+            self._count("bad_request")
+            raise ApiError(400, "Поле wait должно быть числом секунд")
+        self._take_token()
+
+        job = self.speak(text.strip(), policy)
+        if job.status == "rejected":
+            self._count("queue_full")
+            raise ApiError(429, "Очередь озвучивания переполнена", retry_after=1)
+        self._count("accepted")
+        self.jobs.add(job)
+        if wait and job.wait(wait):
+            return 200, job_to_dict(job)
+        return 202, job_to_dict(job)
+
+    def _prefetch(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        texts = data.get("texts", data.get("text"))
+        texts = [texts] if isinstance(texts, str) else texts
+        if not isinstance(texts, list) or not texts or not all(isinstance(t, str) and t.strip() for t in texts):
+            self._count("bad_request")
+            raise ApiError(400, "Поле texts должно быть списком непустых строк")
+        self._take_token()
+        with self._lock:
+            if self._prefetch_pending + len(texts) > self.max_prefetch:
+                self._counters["queue_full"] += 1
+                raise ApiError(429, f"Очередь подготовки заполнена ({self._prefetch_pending} фраз)", retry_after=1)
+            self._prefetch_pending += len(texts)
+
+        future = self.engine.prefetch([t.strip() for t in texts])
+        future.add_done_callback(lambda _: self._prefetch_done(len(texts)))
+        self._count("accepted")
+        return 202, {"accepted": len(texts)}
+
+    def _prefetch_done(self, count: int) -> None:
+        with self._lock:
+            self._prefetch_pending -= count
+
+    def _parse_json(self, headers, body: bytes) -> Dict[str, Any]:
+        # Только application/json, в том числе без тела: браузер не отправит такой запрос
+        # с чужой страницы без preflight
+        content_type = (headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+        if content_type != "application/json":
+            self._count("bad_request")
+            raise ApiError(415, "Ожидается Content-Type: application/json")
+        if not body:
+            return {}
+        try:
+            data = json.loads(body.decode("utf-8"))
+        except (UnicodeDecodeError, ValueError):
+            self._count("bad_request")
+            raise ApiError(400, "Некорректный JSON")
+        if not isinstance(data, dict):
+            self._count("bad_request")
+            raise ApiError(400, "Ожидается JSON-объект")
+        return data
+
+    def _take_token(self) -> None:
+        if self.bucket is None:
+            return
+        wait = self.bucket.try_acquire()
+        if wait > 0:
+            self._count("rate_limited")
+            raise ApiError(429, "Слишком много запросов", retry_after=wait)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Одновременное воспроизведение одной декодированной фразы на динамики и в виртуальный микрофон
+Старт приемников выравнивается с учетом их задержки вывода, расхождение (skew) считается
+по фактическому началу звучания (для микрофона - по callback выходного потока)
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from audio_pcm import DecodedAudio
+
+
+def _sleep_until(target_time: float) -> None:
+    """Ожидание момента time.perf_counter() == target_time (последние миллисекунды - активно)"""
+    while True:
+        remaining = target_time - time.perf_counter()
+        if remaining <= 0:
+            return
+        if remaining > 0.002:
+            time.sleep(remaining - 0.001)
+
+
+class SpeakerSink:
+    """Приемник pygame: Sound запускается точно в назначенный момент"""
+
+    name = "speaker"
+
+    def __init__(self, sound_factory: Callable[[DecodedAudio], Any], latency: float = 0.0):
+        self.sound_factory = sound_factory
+        self.latency = latency
+        self.sound = None
+        self.channel = None
+        self.started_at: Optional[float] = None
+
+    def prepare(self, audio: DecodedAudio) -> None:
+        self.sound = self.sound_factory(audio)
+
+    def start(self, audio: DecodedAudio, target_time: float, should_stop: Callable[[], bool]) -> None:
+        _sleep_until(target_time)
+        self.channel = self.sound.play()
+        self.started_at = time.perf_counter()
+
+    def wait(self, should_stop: Callable[[], bool]) -> None:
+        channel = self.channel
+        while channel is not None and channel.get_busy() and not should_stop():
+            if channel.get_sound() is not self.sound and channel.get_queue() is not self.sound:
+                break
+            time.sleep(0.01)
+
+
+class MicSink:
+    """Приемник виртуального микрофона: фраза дописывается в постоянный поток с точностью до сэмпла"""
+
+    name = "mic"
+
+    def __init__(self, output, device_index: int, gain: float = 1.0,
+                 on_start: Optional[Callable[[], None]] = None, on_finish: Optional[Callable[[], None]] = None):
+        self.output = output
+        self.device_index = device_index
+        self.gain = gain
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.latency = 0.0
+        self.started_at: Optional[float] = None  # Момент передачи первого кадра фразы в устройство
+        self._thread: Optional[threading.Thread] = None
+
+    def prepare(self, audio: DecodedAudio) -> None:
+        # Поток уже открыт; заранее нажимаем клавишу микрофона, чтобы не задерживать начало фразы
+        self.output.ensure_open(self.device_index)
+        self.latency = self.output.latency
+        if self.on_start:
+            self.on_start()
+
+    def start(self, audio: DecodedAudio, target_time: float, should_stop: Callable[[], bool]) -> None:
+        self._thread = threading.Thread(target=self._play, args=(audio, target_time, should_stop),
+                                        name="mic-playback", daemon=True)
+        self._thread.start()
+
+    def wait(self, should_stop: Callable[[], bool]) -> None:
+        if self._thread is not None:
+            self._thread.join()
+
+    def _play(self, audio: DecodedAudio, target_time: float, should_stop: Callable[[], bool]) -> None:
+        try:
+            # Вместо ожидания дописываем перед фразой нужное число кадров тишины
+            pad_frames = max(0, int(round((target_time - time.perf_counter()) * self.output.rate)))
+            self.started_at = None
+            self.output.push_silence(pad_frames)
+            self.output.mark_next()
+            self.output.push(audio.samples, audio.frame_rate, self.gain, should_stop)
+            self.output.wait_drained(should_stop)
+            if should_stop():
+                self.output.clear()
+            # Фактическое начало по callback потока; если фраза не дошла до устройства - None
+            if self.output.mark_time is not None:
+                self.started_at = self.output.mark_time
+                self.latency = self.output.mark_latency
+        except Exception as e:
+            logging.error(f"Ошибка при воспроизведении через микрофон: {e}")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.on_finish:
+            self.on_finish()
+            self.on_finish = None
+
+
+class DualPlayback:
+    """Запуск нескольких приемников с выровненным звучанием и статистика расхождения"""
+
+    def __init__(self, lead_time: float = 0.005):
+        # Запас времени между подготовкой и стартом, чтобы все приемники успели к назначенному моменту
+        self.lead_time = lead_time
+        self.last_skew: Optional[float] = None
+        self._skew_count = 0
+        self._skew_abs_total = 0.0
+        self._skew_abs_max = 0.0
+
+    def play(self, audio: DecodedAudio, sinks: List[Any], should_stop: Optional[Callable[[], bool]] = None,
+             offsets: Optional[Dict[str, float]] = None) -> Optional[float]:
+        """
+        Воспроизведение фразы во всех приемниках и ожидание окончания
+
+        Args:
+            audio (DecodedAudio): Декодированная фраза (общая для всех приемников)
+            sinks (list): Приемники; первый считается опорным для расчета расхождения
+            should_stop (callable): Проверка отмены
+            offsets (dict): Сдвиг звучания приемника в секундах (по имени приемника)
+
+        Returns:
+            float: Расхождение фактического звучания второго приемника относительно первого
+                (без учета заданного сдвига) в секундах или None, если начало не измерено
+        """
+        should_stop = should_stop or (lambda: False)
+        offsets = offsets or {}
+
+        ready = []
+        for sink in sinks:
+            try:
+                sink.prepare(audio)
+                ready.append(sink)
+            except Exception as e:
+                logging.error(f"Не удалось подготовить приемник {sink.name}: {e}")
+                if hasattr(sink, "close"):
+                    sink.close()
+        if not ready or should_stop():
+            for sink in ready:
+                if hasattr(sink, "close"):
+                    sink.close()
+            return None
+
+        # Приемник с меньшей задержкой стартует позже, чтобы звук появился одновременно
+        max_latency = max(sink.latency for sink in ready)
+        delays = {sink: max_latency - sink.latency + offsets.get(sink.name, 0.0) for sink in ready}
+        min_delay = min(delays.values())
+        start_time = time.perf_counter() + self.lead_time
+        for sink in sorted(ready, key=lambda s: delays[s]):
+            sink.start(audio, start_time + delays[sink] - min_delay, should_stop)
+        for sink in ready:
+            sink.wait(should_stop)
+
+        if len(ready) < 2 or any(sink.started_at is None for sink in ready[:2]):
+            return None
+        reference, other = ready[0], ready[1]
+        skew = ((other.started_at + other.latency) - (reference.started_at + reference.latency)
+                - (offsets.get(other.name, 0.0) - offsets.get(reference.name, 0.0)))
+        self._record_skew(skew)
+        return skew
+
+    def _record_skew(self, skew: float) -> None:
+        self.last_skew = skew
+        self._skew_count += 1
+        self._skew_abs_total += abs(skew)
+        self._skew_abs_max = max(self._skew_abs_max, abs(skew))
+
+    def stats(self) -> Dict[str, Any]:
+        """Расхождение между приемниками по фактическому началу звучания (мс)"""
+        return {
+            "count": self._skew_count,
+            "last_skew_ms": self.last_skew * 1000 if self.last_skew is not None else None,
+            "avg_abs_skew_ms": self._skew_abs_total / self._skew_count * 1000 if self._skew_count else 0.0,
+            "max_abs_skew_ms": self._skew_abs_max * 1000,
+        }
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Диспетчер горячих клавиш для TTS Overlay
+Все сочетания регистрируются через одну таблицу действий. Повторы при удержании
+клавиши отсеиваются (debounce по каждой клавише), а повторный вызов той же фразы,
+пока она еще в очереди или звучит, схлопывается в уже поставленное задание.
+Бэкенд клавиатуры заменяемый: KeyboardModuleBackend (библиотека keyboard) или
+FakeKeyboardBackend для проверок без реальной клавиатуры
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+# Статусы задания (SpeechJob.status), при которых повтор схлопывается
+ACTIVE_STATUSES = ("queued", "running")
+
+
+@dataclass
+class HotkeyAction:
+    """Действие горячей клавиши"""
+    combo: str
+    name: str
+    callback: Callable[[], Any]  # Выполняется через post; может вернуть задание со свойством status
+    debounce: float = 0.25  # Минимальная пауза между нажатиями одной клавиши (секунды)
+    suppress: bool = True  # Не передавать нажатие другим программам
+    key: Optional[Callable[[], Optional[Hashable]]] = None  # Ключ схлопывания (по умолчанию - само сочетание)
+
+
+class KeyboardModuleBackend:
+    """Регистрация сочетаний через библиотеку keyboard"""
+
+    def __init__(self, module=None):
+        if module is None:
+            import keyboard as module
+        self.keyboard = module
+
+    def add_hotkey(self, combo: str, callback: Callable[[], None], suppress: bool = False):
+        return self.keyboard.add_hotkey(combo, callback, suppress=suppress)
+
+    def remove_hotkey(self, handle) -> None:
+        self.keyboard.remove_hotkey(handle)
+
+    def unhook_all(self) -> None:
+        self.keyboard.unhook_all()
+
+
+class FakeKeyboardBackend:
+    """Клавиатура для проверок: сочетания хранятся в словаре, нажатия вызываются через trigger()"""
+
+    def __init__(self, invalid: Iterable[str] = ()):
+        self.invalid = set(invalid)
+        self.hotkeys: Dict[str, Callable[[], None]] = {}
+        self.suppressed: Dict[str, bool] = {}
+
+    def add_hotkey(self, combo: str, callback: Callable[[], None], suppress: bool = False):
+        if combo in self.invalid:
+            raise ValueError(f"Неизвестное сочетание: {combo}")
+        self.hotkeys[combo] = callback
+        self.suppressed[combo] = suppress
+        return combo
+
+    def remove_hotkey(self, handle) -> None:
+        self.hotkeys.pop(handle, None)
+        self.suppressed.pop(handle, None)
+
+    def unhook_all(self) -> None:
+        self.hotkeys.clear()
+        self.suppressed.clear()
+
+    def trigger(self, combo: str, times: int = 1) -> None:
+        """Нажатие сочетания (times > 1 - как автоповтор при удержании)"""
+        for _ in range(times):
+            self.hotkeys[combo]()
+
+
+class HotkeyDispatcher:
+    """
+    Таблица действий горячих клавиш с debounce и схлопыванием повторов
+
+    Args:
+        backend: Бэкенд клавиатуры (add_hotkey, remove_hotkey, unhook_all)
+        post (callable): Передача действия в поток интерфейса, например lambda fn: root.after(0, fn)
+            (по умолчанию действие выполняется сразу в потоке клавиатуры)
+        debounce (float): Пауза debounce по умолчанию (секунды)
+        clock (callable): Источник времени
+    """
+
+    def __init__(self, backend, post: Optional[Callable[[Callable[[], None]], Any]] = None,
+                 debounce: float = 0.25, clock: Callable[[], float] = time.monotonic):
+        self.backend = backend
+        self.post = post or (lambda fn: fn())
+        self.debounce = debounce
+        self.clock = clock
+        self.actions: Dict[str, HotkeyAction] = {}
+        self._handles: Dict[str, Any] = {}
+        self._last_event: Dict[str, float] = {}
+        self._pending: Dict[Hashable, bool] = {}  # Ключи, переданные в post, но еще не выполненные
+        self._active: Dict[Hashable, Any] = {}  # Последнее задание по ключу схлопывания
+        self._lock = threading.Lock()
+        self._counters = {"events": 0, "dispatched": 0, "debounced": 0, "coalesced": 0, "errors": 0}
+        self._per_action: Dict[str, Dict[str, int]] = {}
+
+    def register(self, combo: str, name: str, callback: Callable[[], Any], debounce: Optional[float] = None,
+                 suppress: bool = True, key: Optional[Callable[[], Optional[Hashable]]] = None) -> bool:
+        """
+        Регистрация действия (сочетание заменяет ранее зарегистрированное)
+
+        Returns:
+            bool: True, если бэкенд принял сочетание
+        """
+        action = HotkeyAction(combo, name, callback, self.debounce if debounce is None else debounce, suppress, key)
+        self.unregister(combo)
+        try:
+            handle = self.backend.add_hotkey(combo, lambda: self._on_event(action), suppress=suppress)
+        except Exception as e:
+            logging.warning(f"Не удалось зарегистрировать хоткей {name} ({combo}): {e}")
+            return False
+        with self._lock:
+            self.actions[combo] = action
+            self._handles[combo] = handle
+            self._per_action.setdefault(name, {"dispatched": 0, "debounced": 0, "coalesced": 0})
+        logging.debug(f"Зарегистрирован хоткей {name}: {combo}")
+        return True
+
+    def unregister(self, combo: str) -> None:
+        with self._lock:
+            handle = self._handles.pop(combo, None)
+            self.actions.pop(combo, None)
+            self._last_event.pop(combo, None)
+        if handle is not None:
+            try:
+                self.backend.remove_hotkey(handle)
+            except Exception as e:
+                logging.debug(f"Ошибка при снятии хоткея {combo}: {e}")
+
+    def clear(self) -> None:
+        """Снятие всех сочетаний"""
+        with self._lock:
+            self.actions.clear()
+            self._handles.clear()
+            self._last_event.clear()
+            self._pending.clear()
+        try:
+            self.backend.unhook_all()
+        except Exception as e:
+            logging.error(f"Ошибка при отмене хоткеев: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики: события, выполненные, отсеянные debounce и схлопнутые, а также по действиям"""
+        with self._lock:
+            result: Dict[str, Any] = dict(self._counters)
+            result["actions"] = {name: dict(counters) for name, counters in self._per_action.items()}
+        return result
+
+    def _on_event(self, action: HotkeyAction) -> None:
+        """Нажатие (в потоке клавиатуры): решение принимается здесь, действие уходит в post"""
+        now = self.clock()
+        key = self._coalesce_key(action)
+        with self._lock:
+            self._counters["events"] += 1
+            counters = self._per_action[action.name]
+            # Debounce считается от предыдущего события, поэтому удержание дает одно срабатывание
+            last = self._last_event.get(action.combo)
+            self._last_event[action.combo] = now
+            if last is not None and now - last < action.debounce:
+                self._counters["debounced"] += 1
+                counters["debounced"] += 1
+                return
+            job = self._active.get(key)
+            if job is not None and getattr(job, "status", None) not in ACTIVE_STATUSES:
+                del self._active[key]
+                job = None
+            if self._pending.get(key) or job is not None:
+                self._counters["coalesced"] += 1
+                counters["coalesced"] += 1
+                logging.debug(f"[HOTKEY] {action.name}: повтор схлопнут, фраза уже в очереди или звучит")
+                return
+            self._pending[key] = True
+            self._counters["dispatched"] += 1
+            counters["dispatched"] += 1
+        try:
+            self.post(lambda: self._run(action, key))
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(key, None)
+                self._counters["errors"] += 1
+            logging.error(f"[HOTKEY] Не удалось передать действие {action.name}: {e}")
+
+    def _run(self, action: HotkeyAction, key: Hashable) -> None:
+        job = None
+        try:
+            job = action.callback()
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            logging.error(f"[HOTKEY] Ошибка в действии {action.name}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+                if getattr(job, "status", None) in ACTIVE_STATUSES:
+                    self._active[key] = job
+                else:
+                    self._active.pop(key, None)
+
+    def _coalesce_key(self, action: HotkeyAction) -> Hashable:
+        if action.key is not None:
+            try:
+                key = action.key()
+                if key is not None:
+                    return key
+            except Exception as e:
+                logging.debug(f"[HOTKEY] Ошибка ключа схлопывания {action.name}: {e}")
+        return action.combo
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Трассировка задержек озвучивания для TTS Overlay
+Каждая фраза получает запись с временными метками этапов (очередь, синтез, кэш,
+декодирование, первый звук в динамиках и микрофоне, клавиша микрофона), из которых
+собираются скользящие перцентили p50/p95/p99 по каждому движку
+"""
+
+import json
+import time
+import itertools
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Этапы: название -> (начальная метка, конечная метка)
+STAGES = {
+    "queue_wait": ("enqueue", "start"),           # ожидание в очереди (за другой фразой)
+    "synthesis": ("synthesis_start", "synthesis_end"),
+    "decode": ("decode_start", "decode_end"),
+    "first_speaker": ("enqueue", "first_speaker"),  # от нажатия до первого звука в динамиках
+    "first_mic": ("enqueue", "first_mic"),          # от нажатия до первого звука в микрофоне
+    "ptt_hold": ("ptt_down", "ptt_up"),
+    "total": ("enqueue", "done"),
+}
+
+# Метки, которые перезаписываются (остальные фиксируются по первому фрагменту фразы)
+LAST_MARKS = ("ptt_up", "done")
+
+PERCENTILES = (50, 95, 99)
+
+_ids = itertools.count(1)
+
+
+class UtteranceTrace:
+    """Временные метки одной фразы (time.perf_counter)"""
+
+    def __init__(self, text: str, engine: str, clock: Callable[[], float] = time.perf_counter):
+        self.id = next(_ids)
+        self.text = text
+        self.engine = engine
+        self.clock = clock
+        self.cache: Optional[str] = None  # "hit" или "miss" для первого фрагмента
+        self.status: Optional[str] = None
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.mark("enqueue")
+
+    def mark(self, name: str, at: Optional[float] = None) -> None:
+        """Метка этапа (по умолчанию - текущее время)"""
+        at = self.clock() if at is None else at
+        with self._lock:
+            if name in LAST_MARKS or name not in self.marks:
+                self.marks[name] = at
+
+    def set_cache(self, hit: bool) -> None:
+        """Попадание в кэш (учитывается первый фрагмент фразы)"""
+        with self._lock:
+            if self.cache is None:
+                self.cache = "hit" if hit else "miss"
+
+    def finish(self, status: str = "done") -> None:
+        self.status = status
+        self.mark("done")
+
+    def durations(self) -> Dict[str, float]:
+        """Длительности этапов (мс) для тех этапов, у которых есть обе метки"""
+        with self._lock:
+            marks = dict(self.marks)
+        return {stage: (marks[end] - marks[start]) * 1000
+                for stage, (start, end) in STAGES.items() if start in marks and end in marks}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Запись для JSON: метки в мс от постановки в очередь"""
+        with self._lock:
+            marks = dict(self.marks)
+        origin = marks.get("enqueue", 0.0)
+        return {
+            "id": self.id,
+            "engine": self.engine,
+            "text": self.text[:80],
+            "cache": self.cache,
+            "status": self.status,
+            "marks_ms": {name: round((at - origin) * 1000, 2)
+                         for name, at in sorted(marks.items(), key=lambda item: item[1])},
+            "durations_ms": {stage: round(value, 2) for stage, value in self.durations().items()},
+        }
+
+    def summary(self) -> str:
+        """Краткая строка для лога"""
+        parts = [f"{stage} {value:.0f} мс" for stage, value in self.durations().items()]
+        return f"[{self.engine}, кэш: {self.cache or '-'}, {self.status}] " + ", ".join(parts)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль отсортированного списка (линейная интерполяция)"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (pos - low)
+
+
+class LatencyStats:
+    """Скользящая статистика задержек по движкам: последние window значений каждого этапа"""
+
+    def __init__(self, window: int = 200, keep_traces: int = 50):
+        self.window = window
+        self._values: Dict[str, Dict[str, Deque[float]]] = {}
+        self._cache: Dict[str, Dict[str, int]] = {}
+        self._recent: Deque[UtteranceTrace] = deque(maxlen=keep_traces)
+        self._lock = threading.Lock()
+
+    def record(self, trace: UtteranceTrace) -> None:
+        """Учет завершенной фразы"""
+        durations = trace.durations()
+        with self._lock:
+            stages = self._values.setdefault(trace.engine, {})
+            for stage, value in durations.items():
+                stages.setdefault(stage, deque(maxlen=self.window)).append(value)
+            if trace.cache:
+                counts = self._cache.setdefault(trace.engine, {"hit": 0, "miss": 0})
+                counts[trace.cache] += 1
+            self._recent.append(trace)
+
+    def percentiles(self, engine: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Перцентили этапов
+
+        Returns:
+            dict: {движок: {этап: {"count", "p50", "p95", "p99", "max"}, "cache": {"hit", "miss"}}}
+                (только указанный движок, если он задан)
+        """
+        with self._lock:
+            engines = {name: {stage: sorted(values) for stage, values in stages.items()}
+                       for name, stages in self._values.items() if engine is None or name == engine}
+            cache = {name: dict(counts) for name, counts in self._cache.items()}
+
+        result = {}
+        for name, stages in engines.items():
+            summary: Dict[str, Any] = {}
+            for stage, values in stages.items():
+                summary[stage] = {"count": len(values)}
+                for q in PERCENTILES:
+                    summary[stage][f"p{q}"] = round(percentile(values, q), 2)
+                summary[stage]["max"] = round(values[-1], 2)
+            summary["cache"] = cache.get(name, {"hit": 0, "miss": 0})
+            result[name] = summary
+        return result
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Последние фразы с метками"""
+        with self._lock:
+            traces = list(self._recent)
+        return [trace.to_dict() for trace in traces]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"generated": time.time(), "window": self.window,
+                "engines": self.percentiles(), "recent": self.recent()}
+
+    def dump_json(self, path: str) -> None:
+        """Сохранение статистики и последних фраз в JSON"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+            self._cache.clear()
+            self._recent.clear()
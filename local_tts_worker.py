@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Фоновый поток локального синтеза речи (pyttsx3) для TTS Overlay
+Один долгоживущий движок вместо pyttsx3.init() на каждую фразу
+"""
+
+import queue
+import logging
+import threading
+from concurrent.futures import CancelledError, Future
+from typing import Any, Callable, List, Optional
+
+
+class LocalTTSWorker:
+    """Поток, владеющий единственным движком pyttsx3 и выполняющий задания из очереди"""
+
+    def __init__(self, engine_factory: Optional[Callable[[], Any]] = None):
+        self.engine_factory = engine_factory
+        self.engine = None
+        self._jobs: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._busy = threading.Event()
+        # Кэш голосов и выбранного голоса, чтобы не перебирать их на каждую фразу
+        self._voices: Optional[List[Any]] = None
+        self._current_voice_id: Optional[str] = None
+
+    def call(self, func: Callable[[Any], Any], cancel_event: Optional[threading.Event] = None) -> Future:
+        """Выполнение func(engine) в потоке движка. Результат возвращается через Future"""
+        self._ensure_started()
+        future: Future = Future()
+        self._jobs.put((future, func, cancel_event))
+        return future
+
+    def warm_up(self) -> Future:
+        """Фоновая инициализация движка до первой фразы"""
+        return self.call(lambda engine: None)
+
+    def get_voices(self) -> List[Any]:
+        """Список голосов pyttsx3 (запрашивается у движка один раз)"""
+        return self.load_voices().result()
+
+    def load_voices(self) -> Future:
+        """Список голосов без ожидания (например, для окна настроек): результат через Future"""
+        return self.call(self._load_voices)
+
+    def save_to_file(self, text: str, path: str, voice_id: Optional[str] = None,
+                     cancel_event: Optional[threading.Event] = None) -> bool:
+        """
+        Синтез фразы в WAV-файл
+
+        Returns:
+            bool: True, если файл записан полностью, False при отмене или ошибке
+        """
+        def job(engine):
+            self._select_voice(engine, voice_id)
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+            return not (cancel_event is not None and cancel_event.is_set())
+
+        try:
+            return self.call(job, cancel_event).result()
+        except CancelledError:
+            return False
+
+    def stop(self) -> None:
+        """Отмена заданий в очереди и прерывание текущего синтеза"""
+        while True:
+            try:
+                future, _, _ = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if future is None:
+                # Сигнал завершения возвращаем в очередь
+                self._jobs.put((None, None, None))
+                break
+            future.cancel()
+        if self._busy.is_set() and self.engine is not None:
+            try:
+                self.engine.stop()
+            except Exception as e:
+                logging.warning(f"Не удалось остановить движок pyttsx3: {e}")
+
+    def shutdown(self) -> None:
+        """Остановка потока движка"""
+        self.stop()
+        if self._thread is not None:
+            self._jobs.put((None, None, None))
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="local-tts", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            future, func, cancel_event = self._jobs.get()
+            if future is None:
+                break
+            if not future.set_running_or_notify_cancel():
+                continue
+            if cancel_event is not None and cancel_event.is_set():
+                future.set_result(False)
+                continue
+            self._busy.set()
+            try:
+                if self.engine is None:
+                    self.engine = self._create_engine()
+                future.set_result(func(self.engine))
+            except Exception as e:
+                logging.error(f"Ошибка локального синтеза: {e}")
+                future.set_exception(e)
+            finally:
+                self._busy.clear()
+
+    def _create_engine(self):
+        if self.engine_factory is not None:
+            return self.engine_factory()
+        import pyttsx3
+        logging.debug("Инициализация движка pyttsx3")
+        return pyttsx3.init()
+
+    def _load_voices(self, engine) -> List[Any]:
+        if self._voices is None:
+            self._voices = list(engine.getProperty('voices'))
+        return self._voices
+
+    def _select_voice(self, engine, voice_id: Optional[str]) -> None:
+        if not voice_id or voice_id == self._current_voice_id:
+            return
+        for voice in self._load_voices(engine):
+            if voice.id == voice_id:
+                engine.setProperty('voice', voice.id)
+                self._current_voice_id = voice_id
+                break
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Асинхронное логирование для TTS Overlay
+Потоки приложения только кладут записи в очередь (QueueHandler), а запись в файл
+с ротацией и вывод в консоль выполняет отдельный поток QueueListener,
+поэтому потоки воспроизведения и интерфейса не ждут дискового ввода-вывода
+"""
+
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+from typing import Optional, Union
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+CONSOLE_FORMAT = "%(message)s"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_level(level: Union[str, int, None], default: int = logging.DEBUG) -> int:
+    """Уровень логирования из настроек (имя или число)"""
+    if isinstance(level, int):
+        return level
+    if isinstance(level, str) and level.upper() in LOG_LEVELS:
+        return getattr(logging, level.upper())
+    return default
+
+
+def setup_logging(path: str, level: Union[str, int] = "DEBUG", max_bytes: int = 2 * 1024 * 1024,
+                  backup_count: int = 3, console: bool = True) -> logging.handlers.QueueListener:
+    """
+    Настройка корневого логгера: очередь в вызывающих потоках, файл и консоль - в фоновом потоке
+
+    Args:
+        path (str): Файл журнала (при запуске прошлый журнал сдвигается в .1)
+        level: Уровень логирования
+        max_bytes (int): Размер файла, после которого он ротируется
+        backup_count (int): Число хранимых старых файлов
+        console (bool): Дублировать сообщения уровня INFO и выше в консоль
+
+    Returns:
+        QueueListener: Запущенный поток записи (останавливается при выходе)
+    """
+    global _listener
+    shutdown_logging()
+
+    file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                        encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        # Каждый запуск начинается с нового файла, как раньше с filemode="w"
+        file_handler.doRollover()
+    handlers = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    # SimpleQueue не ограничена и не блокирует put
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(parse_level(level))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def set_log_level(level: Union[str, int]) -> None:
+    """Изменение уровня логирования во время работы"""
+    logging.getLogger().setLevel(parse_level(level))
+
+
+def shutdown_logging() -> None:
+    """Запись оставшихся сообщений и остановка фонового потока"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
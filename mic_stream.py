@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Постоянный выходной поток PyAudio для виртуального микрофона
+Поток открывается один раз в фиксированном формате и работает через callback;
+фразы дописываются в кольцевой буфер, между фразами в микрофон идет тишина
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from audio_pcm import convert_format
+from audio_dsp import GainStage, LIMITER_SOFT
+
+
+class RingBuffer:
+    """Кольцевой буфер кадров PCM фиксированного формата"""
+
+    def __init__(self, capacity: int, channels: int, dtype=np.int16):
+        self._buf = np.zeros((max(1, int(capacity)), channels), dtype=dtype)
+        self._read = 0
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    @property
+    def available(self) -> int:
+        """Число кадров, ожидающих воспроизведения"""
+        return self._size
+
+    @property
+    def free(self) -> int:
+        return len(self._buf) - self._size
+
+    def write(self, frames: np.ndarray) -> int:
+        """Запись кадров (сколько поместится). Возвращает число записанных кадров"""
+        count = min(len(frames), self.free)
+        start = (self._read + self._size) % len(self._buf)
+        first = min(count, len(self._buf) - start)
+        self._buf[start:start + first] = frames[:first]
+        self._buf[:count - first] = frames[first:count]
+        self._size += count
+        return count
+
+    def read_into(self, out: np.ndarray) -> int:
+        """Чтение кадров в out. Возвращает число прочитанных кадров, остаток out не изменяется"""
+        count = min(len(out), self._size)
+        first = min(count, len(self._buf) - self._read)
+        out[:first] = self._buf[self._read:self._read + first]
+        out[first:count] = self._buf[:count - first]
+        self._read = (self._read + count) % len(self._buf)
+        self._size -= count
+        return count
+
+    def clear(self) -> None:
+        self._read = 0
+        self._size = 0
+
+
+class MicOutputStream:
+    """Долгоживущий callback-поток PyAudio с кольцевым буфером"""
+
+    def __init__(self, pa, rate: int = 48000, channels: int = 2, frames_per_buffer: int = 256,
+                 buffer_seconds: float = 2.0, limiter: str = LIMITER_SOFT):
+        self.pa = pa
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.buffer_seconds = buffer_seconds
+        self.device_index: Optional[int] = None
+        self.stream = None
+        self._ring: Optional[RingBuffer] = None
+        self._out = np.zeros((frames_per_buffer, channels), dtype=np.int16)
+        self._cond = threading.Condition()
+        self._open_lock = threading.Lock()
+        # Усиление блоками на предвыделенных буферах (общих для всех фраз, поэтому push под блокировкой)
+        self.gain_stage = GainStage(channels=channels, limiter=limiter)
+        self._push_lock = threading.Lock()
+        # Число кадров, переданных из буфера в устройство (без тишины между фразами)
+        self.frames_played = 0
+        # Отметка начала фразы: номер кадра и измеренный в callback момент его передачи в устройство
+        self._mark_frame: Optional[int] = None
+        self.mark_time: Optional[float] = None
+        self.mark_latency: Optional[float] = None
+
+    def ensure_open(self, device_index: int) -> None:
+        """Открытие потока на устройстве (повторно - только при смене устройства или после ошибки)"""
+        with self._open_lock:
+            if self.stream is not None and self.device_index == device_index and self.stream.is_active():
+                return
+            self._close_stream()
+            try:
+                self._open(device_index, self.rate, self.channels)
+            except Exception as e:
+                # Устройство не поддерживает заданный формат - берем его собственный
+                info = self.pa.get_device_info_by_index(device_index)
+                rate = int(info.get("defaultSampleRate") or self.rate)
+                channels = max(1, min(self.channels, int(info.get("maxOutputChannels") or 1)))
+                logging.warning(f"Микрофон: формат {self.rate} Гц/{self.channels} кан. не поддерживается ({e}), "
+                                f"используем {rate} Гц/{channels} кан.")
+                self._open(device_index, rate, channels)
+
+    def _open(self, device_index: int, rate: int, channels: int) -> None:
+        import pyaudio
+
+        with self._cond:
+            self._ring = RingBuffer(int(rate * self.buffer_seconds), channels)
+            self._out = np.zeros((self.frames_per_buffer, channels), dtype=np.int16)
+            self._mark_frame = None
+        self.rate = rate
+        self.channels = channels
+        self._continue = pyaudio.paContinue
+        self.stream = self.pa.open(format=pyaudio.paInt16,
+                                   channels=channels,
+                                   rate=rate,
+                                   output=True,
+                                   output_device_index=device_index,
+                                   frames_per_buffer=self.frames_per_buffer,
+                                   stream_callback=self._callback)
+        self.device_index = device_index
+        logging.info(f"Поток микрофона открыт: устройство {device_index}, {rate} Гц, {channels} кан.")
+
+    @property
+    def latency(self) -> float:
+        """Время до звучания следующего записанного кадра (секунды)"""
+        stream_latency = self.stream.get_output_latency() if self.stream is not None else 0.0
+        buffered = self._ring.available / self.rate if self._ring is not None else 0.0
+        return stream_latency + buffered
+
+    def push(self, samples: np.ndarray, frame_rate: int, gain: float = 1.0,
+             should_stop: Optional[Callable[[], bool]] = None) -> bool:
+        """
+        Добавление фразы в буфер с приведением к формату потока
+
+        Args:
+            samples (np.ndarray): Кадры PCM (кадры × каналы)
+            frame_rate (int): Частота дискретизации samples
+            gain (float): Громкость
+            should_stop (callable): Проверка отмены (ожидание места в буфере прерывается)
+
+        Returns:
+            bool: True, если все кадры записаны
+        """
+        frames = convert_format(samples, frame_rate, self.rate, self.channels, np.int16)
+        with self._push_lock:
+            if gain == 1.0:
+                return self._write(frames, should_stop)
+            block = self.gain_stage.block_frames
+            for offset in range(0, len(frames), block):
+                if not self._write(self.gain_stage.process(frames[offset:offset + block], gain), should_stop):
+                    return False
+            return True
+
+    def push_silence(self, frames: int) -> None:
+        """Тишина заданной длины (для выравнивания начала фразы)"""
+        if frames > 0:
+            self._write(np.zeros((frames, self.channels), dtype=np.int16), None)
+
+    def mark_next(self) -> None:
+        """Отметка следующего записанного кадра: callback запомнит, когда он был передан в устройство"""
+        with self._cond:
+            self._mark_frame = self.frames_played + (self._ring.available if self._ring is not None else 0)
+            self.mark_time = None
+            self.mark_latency = None
+
+    def _write(self, frames: np.ndarray, should_stop: Optional[Callable[[], bool]]) -> bool:
+        offset = 0
+        with self._cond:
+            while offset < len(frames):
+                if should_stop and should_stop():
+                    return False
+                if self._ring is None:
+                    return False
+                offset += self._ring.write(frames[offset:])
+                if offset < len(frames):
+                    self._cond.wait(0.05)
+        return True
+
+    def wait_drained(self, should_stop: Optional[Callable[[], bool]] = None) -> None:
+        """Ожидание, пока записанное будет проиграно (включая задержку устройства)"""
+        with self._cond:
+            while self._ring is not None and self._ring.available and not (should_stop and should_stop()):
+                self._cond.wait(0.05)
+        end = time.perf_counter() + (self.stream.get_output_latency() if self.stream is not None else 0.0)
+        while time.perf_counter() < end and not (should_stop and should_stop()):
+            time.sleep(0.005)
+
+    def clear(self) -> None:
+        """Сброс буфера: текущая фраза обрывается, поток продолжает выдавать тишину"""
+        with self._cond:
+            if self._ring is not None:
+                self._ring.clear()
+            self._mark_frame = None
+            self._cond.notify_all()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        with self._cond:
+            if frame_count > len(self._out):
+                self._out = np.zeros((frame_count, self.channels), dtype=np.int16)
+            out = self._out[:frame_count]
+            count = self._ring.read_into(out) if self._ring is not None else 0
+            out[count:] = 0
+            mark = self._mark_frame
+            if mark is not None and self.frames_played <= mark < self.frames_played + count:
+                self._record_mark(time_info, mark - self.frames_played)
+            self.frames_played += count
+            self._cond.notify_all()
+        return out.tobytes(), self._continue
+
+    def _record_mark(self, time_info, offset: int) -> None:
+        # Задержка до ЦАП по часам PortAudio; если хост-API ее не сообщает - заявленная задержка потока
+        latency = 0.0
+        if time_info:
+            latency = time_info.get("output_buffer_dac_time", 0.0) - time_info.get("current_time", 0.0)
+        if latency <= 0:
+            latency = self.stream.get_output_latency() if self.stream is not None else 0.0
+        self.mark_time = time.perf_counter() + offset / self.rate
+        self.mark_latency = latency
+        self._mark_frame = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Формат потока, заполненность буфера и счетчики"""
+        return {
+            "device_index": self.device_index,
+            "rate": self.rate,
+            "channels": self.channels,
+            "buffered_ms": (self._ring.available / self.rate * 1000) if self._ring is not None else 0.0,
+            "frames_played": self.frames_played,
+        }
+
+    def _close_stream(self) -> None:
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception as e:
+                logging.warning(f"Ошибка при закрытии потока микрофона: {e}")
+            self.stream = None
+            self.device_index = None
+
+    def close(self) -> None:
+        """Закрытие потока"""
+        self.clear()
+        with self._open_lock:
+            self._close_stream()
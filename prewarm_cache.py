@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Предварительное заполнение кэша TTS Overlay списком фраз (без запуска интерфейса)
+
+Фразы берутся из текстового файла (по одной на строку, строки с # пропускаются)
+или из JSON: список строк, список объектов {"text": ...} или {"phrases": [...]}.
+Текст делится на фрагменты так же, как при озвучивании, поэтому первое живое
+использование любой фразы из списка - попадание в кэш. Повторный запуск
+синтезирует только то, чего в кэше еще нет. Лимит и политика вытеснения кэша
+берутся из настроек приложения; если набор не помещается в лимит, синтез
+останавливается.
+
+Запуск:
+    python prewarm_cache.py phrases.txt
+    python prewarm_cache.py pack.json --engine voicerss --language en-us --voice Linda --workers 4 --rate 2
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from audio_cache import AudioCache
+from rate_limit import TokenBucket
+from tts_backends import segment_text, find_google, find_local, synthesize_google, synthesize_local
+from tts_settings import TTSSettings
+
+BASE_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+
+# Настройки приложения, влияющие на ключи кэша и его лимит
+SETTINGS_KEYS = ("tts_engine", "voice_id", "voicerss_language", "voicerss_voice", "voicerss_api_key",
+                 "sentence_chunking", "max_segment_chars", "cache_max_mb", "cache_eviction")
+
+
+def load_settings(path: str) -> Dict[str, Any]:
+    """Настройки из settings.json приложения (пустые строки считаются незаданными значениями)"""
+    app_settings = TTSSettings(settings_path=path)
+    app_settings.load_settings()
+    defaults = TTSSettings(settings_path=path)
+    settings = {}
+    for key in SETTINGS_KEYS:
+        value = getattr(app_settings, key)
+        settings[key] = value if value != "" else getattr(defaults, key)
+    return settings
+
+
+def load_phrases(path: str) -> List[str]:
+    """Фразы из текстового файла или JSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if path.lower().endswith(".json"):
+        data = json.loads(content)
+        if isinstance(data, dict):
+            data = data.get("phrases", [])
+        phrases = [item.get("text", "") if isinstance(item, dict) else str(item) for item in data]
+    else:
+        phrases = [line for line in content.splitlines() if not line.lstrip().startswith("#")]
+    return [phrase.strip() for phrase in phrases if phrase and phrase.strip()]
+
+
+class Prewarmer:
+    """Синтез списка фрагментов в кэш выбранным движком со статистикой"""
+
+    def __init__(self, cache: AudioCache, settings: Dict[str, Any], workers: int = 4, rate: float = 2.0,
+                 decode_pcm: bool = True):
+        self.cache = cache
+        self.settings = settings
+        self.workers = max(1, workers)
+        self.rate = rate
+        self.decode_pcm = decode_pcm
+        self.counts = {"cached": 0, "created": 0, "failed": 0, "skipped": 0}
+        self.failures: List[str] = []
+        # Размер набора в кэше; при превышении лимита кэша синтез останавливается
+        self.size = 0
+        self.stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def run(self, segments: List[str]) -> None:
+        engine = self.settings["tts_engine"]
+        if engine == "voicerss":
+            self._run_voicerss(segments)
+        elif engine == "local":
+            self._run_local(segments)
+        else:
+            self._run_google(segments)
+
+    def _run_google(self, segments: List[str]) -> None:
+        pending = [text for text in segments if not self._skip_cached(find_google(self.cache, text))]
+        limiter = TokenBucket(self.rate, burst=1)
+
+        def job(text):
+            if not limiter.acquire(cancel_event=self.stopped):
+                return None
+            return synthesize_google(self.cache, text)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(job, text): text for text in pending}
+            for future in as_completed(futures):
+                self._done(futures[future], future.result(), created=True)
+
+    def _run_local(self, segments: List[str]) -> None:
+        from local_tts_worker import LocalTTSWorker
+
+        # pyttsx3 работает в одном потоке - фразы синтезируются последовательно
+        voice_id = self.settings["voice_id"]
+        worker = LocalTTSWorker()
+        try:
+            for text in segments:
+                if self.stopped.is_set():
+                    self._done(text, None, created=True)
+                    continue
+                if self._skip_cached(find_local(self.cache, text, voice_id)):
+                    continue
+                self._done(text, synthesize_local(self.cache, worker, text, voice_id), created=True)
+        finally:
+            worker.shutdown()
+
+    def _run_voicerss(self, segments: List[str]) -> None:
+        from voice_api import VoiceRSSAPI
+
+        api = VoiceRSSAPI(self.settings["voicerss_api_key"] or None, cache=self.cache, pool_size=self.workers)
+        language = self.settings["voicerss_language"] or "ru-ru"
+        voice = self.settings["voicerss_voice"]
+        cached = {text for text in segments
+                  if self.cache.find("voicerss", text, language=language, voice=voice, speed=0)}
+        try:
+            for text, path in api.synthesize_many(segments, language, voice, max_workers=self.workers,
+                                                  rate=self.rate, burst=1, cancel_event=self.stopped):
+                if text in cached:
+                    self._skip_cached(path)
+                else:
+                    self._done(text, path, created=True)
+        finally:
+            api.close()
+
+    def _skip_cached(self, path: Optional[str]) -> bool:
+        if not path:
+            return False
+        self._done(None, path, created=False)
+        return True
+
+    def _done(self, text: Optional[str], path: Optional[str], created: bool) -> None:
+        files = [path] if path else []
+        if path and self.decode_pcm:
+            pcm_path = self.cache.get_pcm(path)
+            files = [path, pcm_path] if pcm_path else []
+        size = sum(os.path.getsize(file) for file in files if os.path.exists(file))
+        with self._lock:
+            if not files:
+                if self.stopped.is_set():
+                    self.counts["skipped"] += 1
+                else:
+                    self.counts["failed"] += 1
+                    self.failures.append(text or "")
+            else:
+                self.counts["created" if created else "cached"] += 1
+                self.size += size
+                if self.cache.max_size and self.size > self.cache.max_size:
+                    self.stopped.set()
+            done = sum(self.counts.values())
+        print(f"\r{done} готово (в кэше {self.counts['cached']}, синтезировано {self.counts['created']}, "
+              f"ошибок {self.counts['failed']})", end="", flush=True)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("phrases", help="Файл с фразами (.txt или .json)")
+    parser.add_argument("--settings", default=os.path.join(BASE_DIR, "settings.json"),
+                        help="settings.json приложения (движок, голос, разбиение на фрагменты, лимит кэша)")
+    parser.add_argument("--cache", default=os.path.join(BASE_DIR, "cache"), help="Папка кэша")
+    parser.add_argument("--engine", choices=("google", "local", "voicerss"), help="Движок (по умолчанию из настроек)")
+    parser.add_argument("--voice", help="Голос: id голоса pyttsx3 или имя голоса VoiceRSS")
+    parser.add_argument("--language", help="Язык VoiceRSS (например, ru-ru)")
+    parser.add_argument("--api-key", help="Ключ VoiceRSS")
+    parser.add_argument("--workers", type=int, default=4, help="Число одновременных запросов")
+    parser.add_argument("--rate", type=float, default=2.0, help="Запросов в секунду к онлайн-движкам")
+    parser.add_argument("--no-pcm", action="store_true", help="Не декодировать фразы в PCM заранее")
+    args = parser.parse_args(argv)
+
+    settings = load_settings(args.settings)
+    if args.engine:
+        settings["tts_engine"] = args.engine
+    if args.voice:
+        settings["voice_id" if settings["tts_engine"] == "local" else "voicerss_voice"] = args.voice
+    if args.language:
+        settings["voicerss_language"] = args.language
+    if args.api_key:
+        settings["voicerss_api_key"] = args.api_key
+
+    phrases = load_phrases(args.phrases)
+    segments = list(dict.fromkeys(
+        segment for phrase in phrases
+        for segment in segment_text(phrase, settings["sentence_chunking"], settings["max_segment_chars"])
+    ))
+    print(f"Фраз: {len(phrases)}, фрагментов для синтеза: {len(segments)}, движок: {settings['tts_engine']}")
+
+    cache = AudioCache(args.cache, int(settings["cache_max_mb"]) * 1024 * 1024, settings["cache_eviction"])
+    prewarmer = Prewarmer(cache, settings, args.workers, args.rate, not args.no_pcm)
+    started = time.perf_counter()
+    prewarmer.run(segments)
+    elapsed = time.perf_counter() - started
+
+    counts = prewarmer.counts
+    print()
+    print(f"Готово за {elapsed:.1f} с: в кэше уже было {counts['cached']}, синтезировано {counts['created']} "
+          f"({counts['created'] / elapsed if elapsed > 0 else 0.0:.2f} фраз/с), ошибок {counts['failed']}")
+    for text in prewarmer.failures:
+        print(f"  ошибка: {text}")
+    if prewarmer.stopped.is_set():
+        print(f"Набор не помещается в лимит кэша {settings['cache_max_mb']} МБ (cache_max_mb в настройках): "
+              f"синтез остановлен, пропущено фрагментов: {counts['skipped']}")
+    cache.close()
+    return 1 if counts["failed"] or prewarmer.stopped.is_set() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
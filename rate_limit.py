@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ограничение частоты запросов к внешним сервисам синтеза речи (token bucket)
+"""
+
+import time
+import threading
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """Потокобезопасное ведро токенов: rate запросов в секунду с запасом burst"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.rate = float(rate)
+        # Запас меньше одного токена никогда не накопится до целого запроса
+        self.capacity = max(1.0, float(burst if burst is not None else rate))
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Попытка взять токены без ожидания
+
+        Returns:
+            float: 0, если токены получены, иначе время (секунды) до их появления
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            if self.rate <= 0:
+                return float("inf")
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0, cancel_event: Optional[threading.Event] = None) -> bool:
+        """
+        Ожидание токенов
+
+        Returns:
+            bool: True, если токены получены, False при отмене
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(min(wait, 1.0)):
+                    return False
+            else:
+                time.sleep(min(wait, 1.0))
@@ -3,12 +3,19 @@
 
 """
 Скрипт для запуска TTS Overlay с автоматической установкой зависимостей
+Проверенное окружение запоминается в файле-отметке: пока не изменились
+интерпретатор, список зависимостей и папки site-packages, проверки пропускаются.
+Принудительная проверка: python run_tts_overlay.py --recheck
 """
 
 import os
 import sys
+import json
+import runpy
+import sysconfig
 import subprocess
 import importlib
+import importlib.util
 import platform
 import shutil
 import zipfile
@@ -16,54 +23,104 @@ import urllib.request
 import tempfile
 from pathlib import Path
 
-# Список необходимых библиотек
-REQUIRED_PACKAGES = [
-    "pygame",
-    "pyaudio",
-    "numpy",
-    "gtts",
-    "pyttsx3",
-    "TKinterModernThemes",
-    "keyboard",
-    "pydub"
-]
-
-def install_package(package):
-    """Установка пакета через pip"""
-    print(f"Установка {package}...")
-    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Основной модуль приложения (первый найденный)
+APP_SCRIPTS = ["tts_overlay.py", "tts_overlay copy speed w bug.py"]
+
+# Файл-отметка о проверенном окружении
+STAMP_FILE = os.path.join(APP_DIR, ".launcher_stamp.json")
+
+# Необходимые библиотеки: имя модуля -> имя пакета для pip
+REQUIRED_PACKAGES = {
+    "pygame": "pygame",
+    "pyaudio": "PyAudio",
+    "numpy": "numpy",
+    "gtts": "gTTS",
+    "pyttsx3": "pyttsx3",
+    "TKinterModernThemes": "TKinterModernThemes",
+    "keyboard": "keyboard",
+    "pydub": "pydub",
+    "requests": "requests"
+}
+
+def install_packages(packages):
+    """Установка пакетов одним вызовом pip"""
+    print(f"Установка {', '.join(packages)}...")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", *packages])
+    # Новые пакеты должны находиться без перезапуска интерпретатора
+    importlib.invalidate_caches()
+
+def environment_fingerprint():
+    """Отпечаток окружения: интерпретатор, список зависимостей и время изменения папок site-packages"""
+    site_dirs = sorted({sysconfig.get_paths()[key] for key in ("purelib", "platlib")})
+    return {
+        "python": sys.executable,
+        "version": sys.version,
+        "packages": sorted(REQUIRED_PACKAGES.items()),
+        "site_packages": [[path, os.path.getmtime(path) if os.path.isdir(path) else None] for path in site_dirs],
+    }
+
+def stamp_is_valid(fingerprint):
+    """Совпадает ли отпечаток с сохраненным после последней успешной проверки"""
+    try:
+        with open(STAMP_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f) == json.loads(json.dumps(fingerprint))
+    except (OSError, ValueError):
+        return False
+
+def save_stamp():
+    """Сохранение отметки (отпечаток снимается после установки пакетов)"""
+    try:
+        with open(STAMP_FILE, 'w', encoding='utf-8') as f:
+            json.dump(environment_fingerprint(), f, ensure_ascii=False, indent=2)
+    except OSError as e:
+        print(f"Не удалось сохранить отметку о проверке окружения: {e}")
 
 def check_and_install_dependencies():
-    """Проверка и установка зависимостей"""
-    for package in REQUIRED_PACKAGES:
+    """
+    Проверка и установка зависимостей
+
+    Returns:
+        bool: True, если все зависимости на месте
+    """
+    # find_spec только ищет модуль, не выполняя его
+    missing = []
+    for module, package in REQUIRED_PACKAGES.items():
+        if importlib.util.find_spec(module) is not None:
+            print(f"✓ {module} уже установлен")
+        else:
+            print(f"✗ {module} не установлен")
+            missing.append(package)
+    
+    ok = True
+    if missing:
         try:
-            importlib.import_module(package)
-            print(f"✓ {package} уже установлен")
-        except ImportError:
-            print(f"✗ {package} не установлен")
-            install_package(package)
+            install_packages(missing)
+        except subprocess.CalledProcessError as e:
+            print(f"Ошибка при установке пакетов: {e}")
+            ok = False
     
     # Проверка наличия ffmpeg для pydub
     if not check_ffmpeg():
         print("✗ ffmpeg не установлен")
         install_ffmpeg()
+        ok = ok and check_ffmpeg()
     else:
         print("✓ ffmpeg уже установлен")
+    return ok
 
 def check_ffmpeg():
-    """Проверка наличия ffmpeg в системе"""
-    try:
-        # Проверяем, доступен ли ffmpeg в системе
-        subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    """Проверка наличия ffmpeg в системе (поиск в PATH без запуска процесса)"""
+    if shutil.which("ffmpeg"):
         return True
-    except FileNotFoundError:
-        # Проверяем, есть ли ffmpeg в папке приложения
-        ffmpeg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg", "bin")
-        if os.path.exists(os.path.join(ffmpeg_path, "ffmpeg.exe")):
-            # Добавляем путь к ffmpeg в PATH
-            os.environ["PATH"] += os.pathsep + ffmpeg_path
-            return True
-        return False
+    # Проверяем, есть ли ffmpeg в папке приложения
+    ffmpeg_path = os.path.join(APP_DIR, "ffmpeg", "bin")
+    if os.path.exists(os.path.join(ffmpeg_path, "ffmpeg.exe")):
+        # Добавляем путь к ffmpeg в PATH
+        os.environ["PATH"] += os.pathsep + ffmpeg_path
+        return True
+    return False
 
 def install_ffmpeg():
     """Установка ffmpeg для Windows"""
@@ -84,7 +141,7 @@ def install_ffmpeg():
         print(f"Архив загружен: {temp_zip}")
         
         # Создаем папку для ffmpeg
-        ffmpeg_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg")
+        ffmpeg_dir = os.path.join(APP_DIR, "ffmpeg")
         if not os.path.exists(ffmpeg_dir):
             os.makedirs(ffmpeg_dir)
             print(f"Создана папка: {ffmpeg_dir}")
@@ -133,17 +190,35 @@ def install_ffmpeg():
         print(f"Ошибка при установке ffmpeg: {e}")
         print("Пожалуйста, установите ffmpeg вручную: https://ffmpeg.org/download.html")
 
+def find_app_script():
+    """Путь к основному модулю приложения"""
+    for name in APP_SCRIPTS:
+        path = os.path.join(APP_DIR, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(APP_DIR, APP_SCRIPTS[0])
+
 def main():
     """Основная функция запуска приложения"""
-    print("Проверка зависимостей...")
-    check_and_install_dependencies()
+    recheck = "--recheck" in sys.argv
+    if recheck:
+        sys.argv.remove("--recheck")
+    
+    if not recheck and stamp_is_valid(environment_fingerprint()):
+        print("Окружение уже проверено, проверка зависимостей пропущена")
+    else:
+        print("Проверка зависимостей...")
+        if check_and_install_dependencies():
+            save_stamp()
     
     print("\nЗапуск TTS Overlay...")
-    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_overlay.py")
+    script_path = find_app_script()
     
     try:
-        # Запуск основного приложения
-        subprocess.run([sys.executable, script_path])
+        # Запуск основного приложения в этом же процессе (без второго интерпретатора)
+        if APP_DIR not in sys.path:
+            sys.path.insert(0, APP_DIR)
+        runpy.run_path(script_path, run_name="__main__")
     except Exception as e:
         print(f"Ошибка при запуске приложения: {e}")
         input("Нажмите Enter для выхода...")
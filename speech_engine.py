@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ядро озвучивания TTS Overlay без интерфейса
+Движки синтеза, кэш, очередь фраз и приемники звука (динамики и виртуальный микрофон).
+Окно TTSOverlay только передает в него текст; то же ядро используют пакетная обработка,
+локальный API и замеры производительности
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from audio_cache import AudioCache
+from audio_pcm import DecodedAudio, PcmLRU, convert_format, decode_audio, from_float32
+from tts_streaming import ChunkFeeder, GoogleStreamingSynthesis
+from tts_backends import segment_text, find_google, synthesize_google, synthesize_local, GOOGLE_LANGUAGE
+from local_tts_worker import LocalTTSWorker
+from speech_scheduler import SpeechJob, SpeechScheduler, POLICY_INTERRUPT
+from dual_playback import DualPlayback, SpeakerSink, MicSink
+from mic_stream import MicOutputStream
+from latency_trace import LatencyStats, UtteranceTrace
+
+APP_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+
+
+def load_voicerss_api():
+    """Класс VoiceRSSAPI (модуль и requests импортируются только при выборе VoiceRSS)"""
+    try:
+        from voice_api import VoiceRSSAPI
+        return VoiceRSSAPI
+    except ImportError:
+        logging.warning("Модуль voice_api.py не найден. Функции VoiceRSS будут недоступны.")
+        return None
+
+
+class SpeechEngine:
+    """
+    Озвучивание текста выбранным движком с выводом на динамики и в виртуальный микрофон
+
+    Публичный API: say(), stop(), prefetch(), stats(), warm_up(), close().
+    Приемники звука создаются в speaker_sink() и mic_sink() - их можно переопределить
+    (например, пустыми приемниками для замеров без устройств).
+    """
+
+    def __init__(self, settings, cache_folder: Optional[str] = None,
+                 ptt_press: Optional[Callable[[], bool]] = None, ptt_release: Optional[Callable[[], bool]] = None,
+                 local_engine_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            settings (TTSSettings): Настройки (читаются при каждой фразе, изменения применяются сразу)
+            cache_folder (str): Папка кэша (по умолчанию cache рядом с приложением)
+            ptt_press, ptt_release: Нажатие и отпускание клавиши голосового чата; возвращают успех
+            local_engine_factory: Фабрика движка pyttsx3 (по умолчанию pyttsx3.init)
+        """
+        self.settings = settings
+        self._ptt_press = ptt_press or (lambda: False)
+        self._ptt_release = ptt_release or (lambda: False)
+        
+        # Микшер pygame, PyAudio, поток микрофона и клиент VoiceRSS создаются при первом обращении
+        # (или в фоновом прогреве), чтобы не задерживать запуск
+        self._audio_lock = threading.RLock()
+        self._pyaudio = None
+        self._mic_output = None
+        self._voicerss = None
+        self._voicerss_loaded = False
+        
+        # Локальный движок TTS живет в отдельном потоке и создается один раз (при выборе движка - в прогреве)
+        self.local_tts = LocalTTSWorker(local_engine_factory)
+        
+        # Постоянный кэш аудио с индексом, общий для всех движков
+        self.cache_folder = cache_folder or os.path.join(APP_DIR, "cache")
+        if not os.path.exists(self.cache_folder):
+            os.makedirs(self.cache_folder)
+        self.audio_cache = AudioCache(self.cache_folder, int(settings.cache_max_mb) * 1024 * 1024,
+                                      settings.cache_eviction)
+        threading.Thread(target=self.audio_cache.purge_legacy_files, daemon=True).start()
+        # Если лимит уменьшили в настройках, лишнее удаляется сразу, дальше - при каждой записи
+        if self.audio_cache.max_size:
+            threading.Thread(target=self.audio_cache.evict_to, args=(self.audio_cache.max_size,), daemon=True).start()
+        
+        # Декодированные фразы в памяти, общие для динамиков и микрофона
+        self.pcm_lru = PcmLRU(int(settings.pcm_memory_cache_mb) * 1024 * 1024)
+        
+        # Выровненный запуск динамиков и микрофона из одного буфера
+        self.playback = DualPlayback()
+        
+        # Задержки этапов озвучивания (перцентили по движкам)
+        self.latency = LatencyStats()
+        
+        # Очередь озвучивания с фиксированным числом рабочих потоков
+        self.scheduler = SpeechScheduler(workers=settings.tts_workers,
+                                         max_queue=settings.tts_max_queue,
+                                         policy=settings.queue_policy,
+                                         on_interrupt=self._stop_audio)
+        
+        # Фоновая подготовка фраз (prefetch) не занимает рабочие потоки очереди
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        
+        # Синтез фрагментов идет в отдельном пуле: прерванная фраза не держит рабочий поток очереди
+        # до конца сетевого запроса, а недождавшийся результат все равно попадает в кэш.
+        # На каждый рабочий поток - текущий и следующий фрагмент, плюс запас под брошенные запросы
+        self._synthesis_pool = ThreadPoolExecutor(max_workers=2 * max(1, int(settings.tts_workers)) + 2,
+                                                  thread_name_prefix="synthesis")
+    
+    # --- Публичный API ---
+    
+    def say(self, text: str, policy: Optional[str] = None) -> SpeechJob:
+        """
+        Постановка фразы в очередь озвучивания
+
+        Args:
+            text (str): Текст
+            policy (str): Политика очереди (по умолчанию из настроек; remove_queue включает interrupt)
+
+        Returns:
+            SpeechJob: Задание (status == "rejected", если очередь переполнена)
+        """
+        if policy is None:
+            policy = POLICY_INTERRUPT if getattr(self.settings, 'remove_queue', False) else self.settings.queue_policy
+        trace = UtteranceTrace(text, self.settings.tts_engine)
+        job = self.scheduler.submit(lambda token: self.text_to_speech(text, token, trace), key=text, policy=policy)
+        job.trace = trace
+        return job
+    
+    def stop(self) -> None:
+        """Отмена всех фраз (ожидающие удаляются, текущие прерываются) и остановка звука"""
+        self.scheduler.cancel_all()
+        self._stop_audio()
+    
+    def prefetch(self, texts: Union[str, Iterable[str]]) -> "Future[int]":
+        """
+        Синтез и декодирование фраз заранее (в кэш на диске и в памяти), без воспроизведения
+
+        Returns:
+            Future: Число подготовленных фрагментов
+        """
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        return self._prefetcher.submit(self._prefetch, texts)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Сводная статистика: кэш, память, очередь, расхождение приемников, задержки и сеть"""
+        result = {
+            "cache": self.audio_cache.stats(),
+            "pcm_memory": {"hits": self.pcm_lru.hits, "misses": self.pcm_lru.misses,
+                           "bytes": self.pcm_lru.current_bytes, "max_bytes": self.pcm_lru.max_bytes},
+            "queue": self.scheduler.metrics(),
+            "playback": self.playback.stats(),
+            "latency": self.latency.percentiles(),
+        }
+        if self._mic_output is not None:
+            result["mic"] = self._mic_output.stats()
+        if self._voicerss is not None:
+            result["voicerss"] = self._voicerss.stats()
+        return result
+    
+    def warm_up(self) -> None:
+        """Загрузка и инициализация только нужных для текущих настроек компонентов"""
+        steps = [("микшер pygame", self._ensure_mixer)]
+        mic_index = self.mic_device_index()
+        if mic_index is not None:
+            steps.append(("поток микрофона", lambda: self.mic_output.ensure_open(mic_index)))
+        if self.settings.tts_engine == "local":
+            steps.append(("pyttsx3", lambda: self.local_tts.warm_up().result()))
+        elif self.settings.tts_engine == "voicerss":
+            steps.append(("клиент VoiceRSS", lambda: self.voicerss))
+        for name, step in steps:
+            started = time.perf_counter()
+            try:
+                step()
+                logging.debug(f"Прогрев: {name} за {(time.perf_counter() - started) * 1000:.0f} мс")
+            except Exception as e:
+                logging.warning(f"Прогрев: не удалось подготовить {name}: {e}")
+    
+    def close(self) -> None:
+        """Остановка очереди и потоков, закрытие кэша, сети и аудиоустройств"""
+        pygame = sys.modules.get("pygame")
+        if pygame is not None and pygame.mixer.get_init() and pygame.mixer.music.get_busy():
+            pygame.mixer.music.stop()
+        
+        self.scheduler.shutdown()
+        self._prefetcher.shutdown(wait=False)
+        self._synthesis_pool.shutdown(wait=False)
+        self.local_tts.shutdown()
+        if self._voicerss is not None:
+            self._voicerss.close()
+        self.audio_cache.close()
+        self.dump_latency_stats()
+        
+        # Закрываем поток микрофона и PyAudio, если они создавались
+        if self._mic_output is not None:
+            self._mic_output.close()
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+    
+    def dump_latency_stats(self, path: Optional[str] = None) -> Optional[str]:
+        """Сохранение перцентилей задержек и последних фраз в latency_stats.json рядом с настройками"""
+        if not self.latency.recent():
+            return None
+        path = path or os.path.join(os.path.dirname(self.settings.settings_path), "latency_stats.json")
+        try:
+            self.latency.dump_json(path)
+            logging.debug(f"Статистика задержек сохранена: {path}")
+            return path
+        except OSError as e:
+            logging.error(f"Не удалось сохранить статистику задержек: {e}")
+            return None
+    
+    # --- Ресурсы, создаваемые при первом обращении ---
+    
+    @property
+    def p(self):
+        """PyAudio (инициализируется при первом обращении)"""
+        with self._audio_lock:
+            if self._pyaudio is None:
+                import pyaudio
+                self._pyaudio = pyaudio.PyAudio()
+                logging.debug("PyAudio инициализирован")
+            return self._pyaudio
+    
+    @property
+    def mic_output(self):
+        """Поток виртуального микрофона: открывается при первой фразе и остается открытым (между фразами - тишина)"""
+        with self._audio_lock:
+            if self._mic_output is None:
+                self._mic_output = MicOutputStream(self.p, self.settings.mic_sample_rate, self.settings.mic_channels,
+                                                   limiter=self.settings.mic_limiter)
+            return self._mic_output
+    
+    @property
+    def voicerss(self):
+        """Один клиент VoiceRSS на всё приложение (общая HTTP-сессия с keep-alive) или None"""
+        with self._audio_lock:
+            if not self._voicerss_loaded:
+                self._voicerss_loaded = True
+                api_class = load_voicerss_api()
+                if api_class is not None:
+                    self._voicerss = api_class(self.settings.voicerss_api_key or None, cache=self.audio_cache)
+            return self._voicerss
+    
+    # --- Синтез и воспроизведение ---
+    
+    def generate_audio_google(self, text):
+        """Генерация аудио через Google TTS"""
+        return synthesize_google(self.audio_cache, text)
+    
+    def generate_audio_local(self, text, cancel_event=None):
+        """Генерация аудио через локальный движок pyttsx3 (в потоке LocalTTSWorker)"""
+        return synthesize_local(self.audio_cache, self.local_tts, text, self.settings.voice_id, cancel_event)
+    
+    def generate_audio_voicerss(self, text, cancel_event=None):
+        """Генерация аудио через VoiceRSS API"""
+        if self.voicerss is None:
+            logging.error("Модуль VoiceRSS API не загружен")
+            return None
+        
+        try:
+            # Ключ из настроек или демо-ключ
+            api = self.voicerss
+            api.api_key = self.settings.voicerss_api_key or api.get_demo_key()
+            
+            # Получаем язык и голос из настроек
+            language = self.settings.voicerss_language or "ru-ru"
+            voice = self.settings.voicerss_voice
+            
+            # Генерируем аудио
+            audio_file = api.text_to_speech(text, language, voice, cancel_event=cancel_event)
+            if audio_file and os.path.exists(audio_file):
+                logging.debug(f"VoiceRSS аудио файл: {audio_file}")
+                return audio_file
+            else:
+                logging.error("Ошибка при генерации аудио через VoiceRSS API или файл не создан")
+                return None
+        except Exception as e:
+            logging.error(f"Ошибка при генерации аудио через VoiceRSS: {e}")
+            return None
+    
+    def is_cached(self, text):
+        """Есть ли фраза в кэше для текущего движка и голоса (без учета в статистике кэша)"""
+        tts_engine = self.settings.tts_engine
+        if tts_engine == "google":
+            return self.audio_cache.contains("google", text, language=GOOGLE_LANGUAGE)
+        if tts_engine == "local":
+            return self.audio_cache.contains("local", text, voice=self.settings.voice_id)
+        if tts_engine == "voicerss":
+            return self.audio_cache.contains("voicerss", text, language=self.settings.voicerss_language or "ru-ru",
+                                             voice=self.settings.voicerss_voice)
+        return False
+    
+    def synthesize(self, text, cancel_event=None, trace=None):
+        """Синтез фразы выбранным движком через кэш. Возвращает путь к аудиофайлу или None"""
+        if trace is None:
+            return self._synthesize(text, cancel_event)
+        trace.set_cache(self.is_cached(text))
+        trace.mark("synthesis_start")
+        try:
+            return self._synthesize(text, cancel_event)
+        finally:
+            trace.mark("synthesis_end")
+    
+    def _synthesize(self, text, cancel_event=None):
+        tts_engine = self.settings.tts_engine
+        if tts_engine == "google":
+            return self.generate_audio_google(text)
+        if tts_engine == "voicerss":
+            return self.generate_audio_voicerss(text, cancel_event)
+        if tts_engine == "local":
+            return self.generate_audio_local(text, cancel_event)
+        return None
+    
+    def text_to_speech(self, text, tts_event, trace=None):
+        trace = trace or UtteranceTrace(text, self.settings.tts_engine)
+        trace.mark("start")
+        try:
+            self._text_to_speech(text, tts_event, trace)
+        finally:
+            trace.finish("cancelled" if tts_event.is_set() else "done")
+            self.latency.record(trace)
+            logging.debug(f"Задержки фразы {trace.id}: {trace.summary()}")
+    
+    def _text_to_speech(self, text, tts_event, trace):
+        def should_stop():
+            return tts_event.is_set()
+        
+        if should_stop():
+            return
+        
+        # Длинный текст озвучивается по предложениям: следующее синтезируется, пока играет текущее
+        segments = segment_text(text, self.settings.sentence_chunking, self.settings.max_segment_chars)
+        
+        upcoming = None
+        try:
+            for i, segment in enumerate(segments):
+                if should_stop():
+                    return
+                current = upcoming
+                if i + 1 < len(segments):
+                    upcoming = self._synthesis_pool.submit(self.synthesize, segments[i + 1], tts_event)
+                else:
+                    upcoming = None
+                # Синтез учитывается в трассировке по первому фрагменту (остальные идут параллельно воспроизведению)
+                if current is None:
+                    self._speak_segment(segment, tts_event, trace)
+                else:
+                    audio_file = self._await_synthesis(current, tts_event)
+                    if audio_file and not should_stop():
+                        self.play_audio(audio_file, tts_event, trace)
+        finally:
+            if upcoming is not None:
+                upcoming.cancel()
+    
+    @staticmethod
+    def _await_synthesis(future, tts_event):
+        """Результат синтеза из пула; при отмене фразы возвращается None сразу, синтез завершится в фоне"""
+        while not future.done():
+            if tts_event.wait(0.02):
+                return None
+        return future.result()
+    
+    def _speak_segment(self, text, tts_event, trace=None):
+        """Синтез и воспроизведение одного фрагмента (Google TTS при промахе кэша - потоково)"""
+        if self.settings.tts_engine == "google" and self.settings.google_streaming:
+            audio_file = find_google(self.audio_cache, text)
+            if trace is not None:
+                trace.set_cache(audio_file is not None)
+            if audio_file is None:
+                self.stream_google(text, tts_event, trace)
+                return
+        else:
+            audio_file = self._await_synthesis(self._synthesis_pool.submit(self.synthesize, text, tts_event, trace),
+                                               tts_event)
+        if tts_event.is_set():
+            return
+        if audio_file:
+            self.play_audio(audio_file, tts_event, trace)
+    
+    def stream_google(self, text, tts_event, trace=None):
+        """Потоковый синтез Google TTS: звук начинается с первого фрагмента, файл кэша пишется в фоне"""
+        def should_stop():
+            return tts_event.is_set()
+        
+        sink, on_finish = self._speaker_stream_sink(should_stop, trace)
+        feeders = [ChunkFeeder("speaker", sink, on_finish, should_stop)]
+        if self.mic_device_index() is not None:
+            sink, on_finish = self._mic_stream_sink(should_stop, trace)
+            feeders.append(ChunkFeeder("mic", sink, on_finish, should_stop))
+        
+        synthesis = GoogleStreamingSynthesis(text, lang=GOOGLE_LANGUAGE)
+        if trace is not None:
+            trace.mark("synthesis_start")
+        try:
+            mp3_data = synthesis.run(feeders, should_stop)
+        except Exception as e:
+            logging.error(f"Ошибка при потоковой генерации аудио через Google: {e}")
+            mp3_data = None
+        finally:
+            if trace is not None:
+                trace.mark("synthesis_end")
+            for feeder in feeders:
+                feeder.join()
+        
+        if synthesis.time_to_first_sample is not None:
+            logging.debug(f"Google TTS (поток): первый фрагмент через {synthesis.time_to_first_sample * 1000:.0f} мс")
+        if mp3_data:
+            threading.Thread(target=self.audio_cache.put_bytes, args=("google", text, mp3_data),
+                             kwargs={"language": GOOGLE_LANGUAGE}, daemon=True).start()
+    
+    def _speaker_stream_sink(self, should_stop, trace=None):
+        """Приемник потока для динамиков: фрагменты ставятся в очередь канала pygame"""
+        freq, _, channels = self._ensure_mixer()
+        latency = self.settings.mixer_buffer / freq
+        state = {"channel": None, "sound": None}
+        
+        def sink(audio):
+            sound = self._make_sound(audio, freq, channels, max(self.settings.output_volume, 1.0))
+            sound.set_volume(min(self.settings.output_volume, 1.0))
+            state["sound"] = sound
+            channel = state["channel"]
+            if channel is None or not channel.get_busy():
+                state["channel"] = sound.play()
+                if trace is not None:
+                    trace.mark("first_speaker", time.perf_counter() + latency)
+                return
+            # В канале pygame помещается только один звук в очереди
+            while channel.get_busy() and channel.get_queue() is not None:
+                time.sleep(0.005)
+            channel.queue(sound)
+        
+        def on_finish():
+            # Дожидаемся конца последнего фрагмента, чтобы следующее предложение не наложилось
+            self._wait_for_channel(state["channel"], state["sound"], should_stop)
+        return sink, on_finish
+    
+    def _mic_stream_sink(self, should_stop, trace=None):
+        """Приемник потока для виртуального микрофона: фрагменты дописываются в постоянный поток"""
+        mic_index = self.mic_device_index()
+        state = {"opened": False, "key_pressed": False}
+        
+        def sink(audio):
+            if not state["opened"]:
+                self.mic_output.ensure_open(mic_index)
+                state["opened"] = True
+                if self.settings.voice_chat_key:
+                    state["key_pressed"] = self._ptt_press()
+                    logging.info(f"[MIC KEY] Клавиша микрофона активирована: {state['key_pressed']}")
+                    if state["key_pressed"] and trace is not None:
+                        trace.mark("ptt_down")
+                if trace is not None:
+                    trace.mark("first_mic", time.perf_counter() + self.mic_output.latency)
+            self.mic_output.push(audio.samples, audio.frame_rate, self.settings.mic_volume, should_stop)
+        
+        def on_finish():
+            if state["opened"]:
+                self.mic_output.wait_drained(should_stop)
+                if should_stop():
+                    self.mic_output.clear()
+            if state["key_pressed"] and self.settings.voice_chat_key:
+                self._ptt_release()
+                logging.info(f"[MIC KEY] Клавиша микрофона деактивирована")
+                if trace is not None:
+                    trace.mark("ptt_up")
+        return sink, on_finish
+    
+    def load_audio(self, audio_file):
+        """
+        Декодированная фраза для воспроизведения
+        Повтор берется из памяти; новая фраза декодируется в память и сразу играет,
+        а ее PCM записывается в кэш в фоне
+        """
+        pcm_file = self.audio_cache.pcm_path_for(audio_file)
+        
+        def load():
+            if os.path.exists(pcm_file):
+                return DecodedAudio.from_wav(pcm_file)
+            audio = decode_audio(audio_file)
+            threading.Thread(target=self.audio_cache.store_pcm, args=(audio_file, audio), daemon=True).start()
+            return audio
+        return self.pcm_lru.get(pcm_file, load)
+    
+    def play_audio(self, audio_file, cancel_event=None, trace=None):
+        """Воспроизведение на динамики и в микрофон из одного декодированного буфера с выровненным стартом"""
+        try:
+            if trace is not None:
+                trace.mark("decode_start")
+            audio = self.load_audio(audio_file)
+            if trace is not None:
+                trace.mark("decode_end")
+        except Exception as e:
+            logging.error(f"Ошибка при загрузке аудио {audio_file}: {e}")
+            return
+        
+        sinks = [self.speaker_sink()]
+        mic_index = self.mic_device_index()
+        if mic_index is not None and len(audio.samples) > 0:
+            sinks.append(self.mic_sink(mic_index, trace))
+        
+        should_stop = cancel_event.is_set if cancel_event else None
+        skew = self.playback.play(audio, sinks, should_stop, {"mic": self.settings.mic_offset_ms / 1000})
+        if trace is not None:
+            # Момент, когда звук слышен: старт приемника плюс его задержка вывода
+            for sink in sinks:
+                if sink.started_at is not None:
+                    trace.mark(f"first_{sink.name}", sink.started_at + sink.latency)
+        if skew is not None:
+            logging.debug(f"Расхождение микрофона и динамиков: {skew * 1000:+.1f} мс")
+    
+    def _wait_for_channel(self, channel, sound, should_stop=None):
+        """Ожидание окончания звука на канале pygame (или остановки воспроизведения)"""
+        while channel is not None and channel.get_busy() and not (should_stop and should_stop()):
+            if channel.get_sound() is not sound and channel.get_queue() is not sound:
+                break
+            time.sleep(0.01)
+    
+    def _ensure_mixer(self):
+        """Инициализация микшера pygame с заданным буфером (один раз; повторно - только если он был закрыт)"""
+        with self._audio_lock:
+            import pygame
+            mixer_format = pygame.mixer.get_init()
+            if not mixer_format:
+                pygame.mixer.init(frequency=self.settings.mixer_frequency, size=-16, channels=2,
+                                  buffer=self.settings.mixer_buffer)
+                mixer_format = pygame.mixer.get_init()
+                logging.debug(f"Микшер pygame: {mixer_format}, буфер {self.settings.mixer_buffer} кадров")
+            return mixer_format
+    
+    def speaker_sink(self):
+        """Приемник для динамиков (pygame; Sound.play, чтобы stop_playback всегда останавливал всё)"""
+        freq, _, _ = self._ensure_mixer()
+        return SpeakerSink(self._mixer_sound, latency=self.settings.mixer_buffer / freq)
+    
+    def mic_device_index(self) -> Optional[int]:
+        """Устройство виртуального микрофона из настроек или None, если вывод в микрофон выключен"""
+        mic_index = self.settings.mic_device_index
+        return mic_index if isinstance(mic_index, int) and mic_index >= 0 else None
+    
+    def mic_sink(self, mic_index, trace=None):
+        """Приемник для виртуального микрофона (PyAudio) с нажатием клавиши голосового чата"""
+        key_state = {"pressed": False}
+        
+        def press_key():
+            if self.settings.voice_chat_key:
+                key = self.settings.voice_chat_key
+                logging.info(f"[MIC KEY] Нажимаем клавишу микрофона '{key}'")
+                key_state["pressed"] = self._ptt_press()
+                logging.info(f"[MIC KEY] Клавиша микрофона активирована: {key_state['pressed']}")
+                if key_state["pressed"] and trace is not None:
+                    trace.mark("ptt_down")
+        
+        def release_key():
+            # Гарантированное освобождение клавиши только если она была нажата
+            if key_state["pressed"] and self.settings.voice_chat_key:
+                self._ptt_release()
+                logging.info(f"[MIC KEY] Клавиша микрофона деактивирована")
+                if trace is not None:
+                    trace.mark("ptt_up")
+        
+        return MicSink(self.mic_output, mic_index, self.settings.mic_volume, press_key, release_key)
+    
+    def _mixer_sound(self, audio):
+        """
+        pygame.Sound для декодированной фразы с громкостью
+        Усиленная (выше 100%) копия создается один раз на пару (фраза, усиление) и хранится вместе с фразой
+        """
+        freq, _, channels = self._ensure_mixer()
+        gain = max(self.settings.output_volume, 1.0)
+        nbytes = int(len(audio.samples) * freq / audio.frame_rate) * channels * 2
+        sound = audio.derived(("sound", freq, channels, gain),
+                              lambda: self._make_sound(audio, freq, channels, gain), nbytes)
+        sound.set_volume(min(self.settings.output_volume, 1.0))
+        return sound
+    
+    def _make_sound(self, audio, freq, channels, gain=1.0):
+        """pygame.Sound из декодированного PCM с приведением к формату микшера и усилением"""
+        import pygame
+        if gain == 1.0:
+            samples = convert_format(audio.samples, audio.frame_rate, freq, channels, np.int16)
+        else:
+            samples = convert_format(audio.samples, audio.frame_rate, freq, channels, np.float32)
+            samples = from_float32(samples * gain, np.int16)
+        return pygame.sndarray.make_sound(samples if channels > 1 else samples[:, 0])
+    
+    def drop_gained_sounds(self):
+        """Сброс усиленных Sound после изменения громкости (они будут созданы заново при воспроизведении)"""
+        gain = max(self.settings.output_volume, 1.0)
+        dropped = self.pcm_lru.forget_derived(lambda key: key[0] == "sound" and key[3] != gain)
+        if dropped:
+            logging.debug(f"Сброшено усиленных Sound: {dropped}")
+    
+    def _prefetch(self, texts: List[str]) -> int:
+        prepared = 0
+        for text in texts:
+            for segment in segment_text(text, self.settings.sentence_chunking, self.settings.max_segment_chars):
+                audio_file = self.synthesize(segment)
+                if not audio_file:
+                    continue
+                try:
+                    self.load_audio(audio_file)
+                    prepared += 1
+                except Exception as e:
+                    logging.error(f"Ошибка при подготовке фразы {audio_file}: {e}")
+        return prepared
+    
+    def _stop_audio(self):
+        """Остановка звука, локального синтеза и отпускание клавиши микрофона"""
+        pygame = sys.modules.get("pygame")
+        
+        # Отпускаем клавишу микрофона, если она нажата
+        if self.settings.voice_chat_key:
+            self._ptt_release()
+        
+        # Глушим звук в динамиках и сбрасываем буфер микрофона (поток остается открытым)
+        if pygame is not None and pygame.mixer.get_init():
+            pygame.mixer.stop()
+        if self._mic_output is not None:
+            self._mic_output.clear()
+        
+        # Прерываем локальный синтез и отменяем задания в его очереди
+        self.local_tts.stop()
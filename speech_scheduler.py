@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Планировщик заданий озвучивания для TTS Overlay
+Очередь с фиксированным числом рабочих потоков вместо отдельного потока на каждую фразу
+"""
+
+import time
+import logging
+import threading
+import itertools
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Политики постановки в очередь
+POLICY_FIFO = "fifo"                # по порядку; при переполнении новое задание отклоняется
+POLICY_INTERRUPT = "interrupt"      # новое задание прерывает текущее и очищает очередь
+POLICY_DROP_OLDEST = "drop_oldest"  # при переполнении выбрасывается самое старое задание в очереди
+POLICIES = (POLICY_FIFO, POLICY_INTERRUPT, POLICY_DROP_OLDEST)
+
+
+class CancelToken(threading.Event):
+    """Флаг отмены отдельного задания (совместим с threading.Event)"""
+
+    def cancel(self) -> None:
+        self.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.is_set()
+
+
+class SpeechJob:
+    """Задание озвучивания и его временные метки"""
+
+    def __init__(self, job_id: int, func: Callable[[CancelToken], Any], key: Optional[str] = None):
+        self.id = job_id
+        self.func = func
+        self.key = key
+        self.token = CancelToken()
+        self.status = "queued"  # queued, running, done, failed, cancelled, dropped, rejected
+        self.error: Optional[Exception] = None
+        self.trace: Optional[Any] = None  # Трассировка задержек (UtteranceTrace), если задание - фраза
+        self.enqueued_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def wait_time(self) -> Optional[float]:
+        """Время ожидания в очереди (секунды)"""
+        return self.started_at - self.enqueued_at if self.started_at is not None else None
+
+    def cancel(self) -> None:
+        self.token.cancel()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Ожидание завершения задания"""
+        return self._done.wait(timeout)
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished_at = time.perf_counter()
+        self._done.set()
+
+
+class SpeechScheduler:
+    """Очередь заданий с ограниченным пулом рабочих потоков"""
+
+    def __init__(self, workers: int = 1, max_queue: int = 8, policy: str = POLICY_FIFO,
+                 on_interrupt: Optional[Callable[[], None]] = None):
+        self.max_queue = max(1, int(max_queue))
+        self.policy = policy if policy in POLICIES else POLICY_FIFO
+        # Вызывается при прерывании (например, чтобы заглушить звук уже играющих фраз)
+        self.on_interrupt = on_interrupt
+        self._queue: Deque[SpeechJob] = deque()
+        self._running: List[SpeechJob] = []
+        self._cond = threading.Condition()
+        self._ids = itertools.count(1)
+        self._shutdown = False
+        self._counters = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "dropped": 0, "rejected": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_count = 0
+        self._workers = []
+        for i in range(max(1, int(workers))):
+            worker = threading.Thread(target=self._run, name=f"tts-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func: Callable[[CancelToken], Any], key: Optional[str] = None,
+               policy: Optional[str] = None) -> SpeechJob:
+        """
+        Постановка задания в очередь
+
+        Args:
+            func (callable): Функция задания, получает CancelToken
+            key (str): Необязательный ключ задания (например, текст фразы)
+            policy (str): Политика для этого задания (по умолчанию - политика планировщика)
+
+        Returns:
+            SpeechJob: Задание; status == "rejected", если очередь переполнена
+        """
+        policy = policy if policy in POLICIES else self.policy
+        job = SpeechJob(next(self._ids), func, key)
+        if policy == POLICY_INTERRUPT:
+            with self._cond:
+                interrupted = bool(self._queue or self._running)
+                self._cancel_locked()
+            # Звук прерванных фраз глушится до постановки нового задания, чтобы не задеть его
+            if interrupted and self.on_interrupt:
+                self.on_interrupt()
+        with self._cond:
+            self._counters["submitted"] += 1
+            if policy != POLICY_INTERRUPT and len(self._queue) >= self.max_queue:
+                if policy == POLICY_DROP_OLDEST:
+                    oldest = self._queue.popleft()
+                    oldest.cancel()
+                    oldest._finish("dropped")
+                    self._counters["dropped"] += 1
+                else:
+                    job._finish("rejected")
+                    self._counters["rejected"] += 1
+                    logging.warning(f"Очередь озвучивания переполнена ({self.max_queue}), фраза отклонена")
+                    return job
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def cancel_all(self) -> None:
+        """Отмена всех заданий: ожидающие удаляются, выполняющиеся получают сигнал отмены"""
+        with self._cond:
+            self._cancel_locked()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Глубина очереди, число выполняющихся заданий, счетчики и время ожидания (мс)"""
+        with self._cond:
+            result = dict(self._counters)
+            result.update({
+                "queue_depth": len(self._queue),
+                "running": len(self._running),
+                "wait_avg_ms": (self._wait_total / self._wait_count * 1000) if self._wait_count else 0.0,
+                "wait_max_ms": self._wait_max * 1000,
+            })
+        return result
+
+    def shutdown(self) -> None:
+        """Остановка рабочих потоков"""
+        with self._cond:
+            self._shutdown = True
+            self._cancel_locked()
+            self._cond.notify_all()
+
+    def _cancel_locked(self) -> None:
+        while self._queue:
+            job = self._queue.popleft()
+            job.cancel()
+            job._finish("cancelled")
+            self._counters["cancelled"] += 1
+        for job in self._running:
+            job.cancel()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._cond.wait()
+                if self._shutdown:
+                    return
+                job = self._queue.popleft()
+                job.status = "running"
+                job.started_at = time.perf_counter()
+                wait = job.wait_time
+                self._wait_total += wait
+                self._wait_count += 1
+                self._wait_max = max(self._wait_max, wait)
+                self._running.append(job)
+                depth = len(self._queue)
+            logging.debug(f"Задание озвучивания #{job.id}: ожидание {wait * 1000:.0f} мс, в очереди {depth}")
+
+            status = "done"
+            try:
+                job.func(job.token)
+                if job.token.cancelled:
+                    status = "cancelled"
+            except Exception as e:
+                job.error = e
+                status = "failed"
+                logging.error(f"Ошибка в задании озвучивания #{job.id}: {e}")
+            with self._cond:
+                self._running.remove(job)
+                self._counters[status] += 1
+            job._finish(status)
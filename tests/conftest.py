@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""Модули приложения лежат в корне репозитория - добавляем его в sys.path для тестов"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
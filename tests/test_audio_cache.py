@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Кэш аудио: счетчики размера при одновременном вытеснении, очистка и одновременная запись ключа"""
+
+import os
+import threading
+import time
+
+from audio_cache import AudioCache, make_cache_key
+
+ENTRY_SIZE = 1000
+
+
+def fill(cache: AudioCache, count: int, engine: str = "google"):
+    keys = []
+    for i in range(count):
+        key = make_cache_key(engine, f"Фраза {i}")
+        path = cache.path_for(key, engine)
+        with open(path, "wb") as f:
+            f.write(b"\0" * ENTRY_SIZE)
+        cache.store(key, engine, path)
+        keys.append(key)
+    return keys
+
+
+def indexed(cache: AudioCache):
+    with cache._lock:
+        return cache._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+
+def test_concurrent_evictors_keep_counters_in_sync(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    fill(cache, 300)
+    limit = 100 * ENTRY_SIZE
+    barrier = threading.Barrier(8)
+
+    def evict():
+        barrier.wait()
+        cache.evict_to(limit)
+
+    threads = [threading.Thread(target=evict) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    count, size = indexed(cache)
+    on_disk = sum(os.path.getsize(os.path.join(root, name))
+                  for root, _, names in os.walk(cache.partition("google")) for name in names)
+    stats = cache.stats()
+    assert (stats["entries"], stats["size"]) == (count, size)
+    assert size == on_disk
+    assert size <= limit
+    cache.close()
+
+
+def test_purge_removes_legacy_files_in_root_and_partitions(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    keys = fill(cache, 2, engine="voicerss")
+    partition = cache.partition("voicerss")
+    legacy = [
+        os.path.join(cache.cache_folder, "-123456789.mp3"),  # hash(text) в корне
+        os.path.join(partition, "0cc175b9c0f1b6a831c399e269772661.mp3"),  # md5-имя VoiceRSS
+        os.path.join(cache.partition("google"), "notes.txt"),
+    ]
+    kept = [
+        os.path.join(partition, f"{keys[0]}.pcm.wav"),
+        os.path.join(partition, f"{keys[1]}.mp3.part"),  # запись еще идет
+    ]
+    for path in legacy + kept:
+        with open(path, "wb") as f:
+            f.write(b"x")
+
+    assert cache.purge_legacy_files() == len(legacy)
+    assert not any(os.path.exists(path) for path in legacy)
+    assert all(os.path.exists(path) for path in kept)
+    assert all(os.path.exists(cache.path_for(key, "voicerss")) for key in keys)
+    assert os.path.exists(os.path.join(cache.cache_folder, "index.sqlite3"))
+    cache.close()
+
+
+def test_clear_removes_unindexed_files(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    keys = fill(cache, 3, engine="voicerss")
+    partition = cache.partition("voicerss")
+    stray = [
+        os.path.join(cache.cache_folder, "-123456789.mp3"),
+        os.path.join(partition, "0cc175b9c0f1b6a831c399e269772661.mp3"),
+        os.path.join(partition, f"{keys[0]}.mp3.part"),
+        os.path.join(cache.partition("google"), f"{keys[1]}.pcm.wav"),
+    ]
+    for path in stray:
+        with open(path, "wb") as f:
+            f.write(b"x")
+
+    assert cache.clear() == len(keys) + len(stray)
+    assert not any(os.path.isfile(os.path.join(root, name))
+                   for root, _, names in os.walk(cache.cache_folder) for name in names
+                   if not name.startswith("index.sqlite3"))
+    assert cache.stats()["entries"] == 0
+    cache.close()
+
+
+def test_same_key_is_written_once_by_concurrent_callers(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    calls = []
+    barrier = threading.Barrier(4)
+    results = []
+
+    def generate(path):
+        calls.append(path)
+        time.sleep(0.1)
+        with open(path, "wb") as f:
+            f.write(b"\xff" * ENTRY_SIZE)
+        return True
+
+    def synthesize():
+        barrier.wait()
+        results.append(cache.get_or_create("google", "Да.", generate))
+
+    def stream():
+        barrier.wait()
+        time.sleep(0.03)  # поток Google заканчивается, пока синтез того же ключа еще идет
+        results.append(cache.put_bytes("google", "Да.", b"\xff" * ENTRY_SIZE))
+
+    threads = [threading.Thread(target=synthesize) for _ in range(3)] + [threading.Thread(target=stream)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    path = cache.find("google", "Да.")
+    assert path and results == [path] * 4
+    assert len(calls) == 1
+    assert not [name for name in os.listdir(cache.partition("google")) if name.endswith(".part")]
+    assert cache.stats()["entries"] == 1
+    cache.close()
+
+
+def test_waiter_writes_itself_when_first_writer_fails(tmp_path):
+    cache = AudioCache(str(tmp_path / "cache"))
+    started = threading.Event()
+
+    def failing(path):
+        started.set()
+        time.sleep(0.1)
+        return False
+
+    results = {}
+    first = threading.Thread(target=lambda: results.setdefault("first", cache.get_or_create("google", "Нет.", failing)))
+    first.start()
+    assert started.wait(1.0)
+    results["second"] = cache.put_bytes("google", "Нет.", b"\xff" * ENTRY_SIZE)
+    first.join()
+    assert results["first"] is None
+    assert results["second"] == cache.find("google", "Нет.")
+    cache.close()
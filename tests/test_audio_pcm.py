@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""PcmLRU: лимит памяти с учетом производных объектов, созданных после загрузки фразы"""
+
+import threading
+
+import numpy as np
+
+from audio_pcm import DecodedAudio, PcmLRU
+
+FRAMES = 500  # 1000 байт int16 моно
+
+
+def phrase() -> DecodedAudio:
+    return DecodedAudio(np.zeros((FRAMES, 1), dtype=np.int16), 44100)
+
+
+def test_derived_bytes_enforce_budget_immediately():
+    lru = PcmLRU(3500)
+    entries = {name: lru.get(name, phrase) for name in ("a", "b", "c")}
+    assert lru.current_bytes == 3000
+
+    # Sound для уже загруженной фразы: лимит превышен - старая фраза вытесняется без новой загрузки
+    entries["c"].derived(("sound", 44100, 2, 1.0), object, nbytes=1500)
+    assert lru.current_bytes <= 3500
+    assert lru.get("c") is entries["c"]
+    assert lru.misses == 3  # "c" осталась в памяти
+    assert lru.get("a", phrase) is not entries["a"]  # "a" вытеснена
+
+
+def test_evicted_entry_no_longer_affects_lru():
+    lru = PcmLRU(1500)
+    first = lru.get("a", phrase)
+    lru.get("b", phrase)
+    assert first.on_grow is None
+    first.derived("sound", object, nbytes=10_000)
+    assert lru.current_bytes == 1000
+
+
+def test_concurrent_derived_counts_every_object_once():
+    audio = phrase()
+    barrier = threading.Barrier(8)
+    created = []
+
+    def add(worker):
+        barrier.wait()
+        for i in range(200):
+            audio.derived(("sound", i % 50), lambda: created.append(1) or object(), nbytes=10)
+            audio.derived(("mic", worker, i), object, nbytes=1)
+
+    threads = [threading.Thread(target=add, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 50
+    assert audio.nbytes == FRAMES * 2 + 50 * 10 + 8 * 200
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+"""API управления на loopback: задания, back-pressure, защита от запросов из браузера и простаивающие соединения"""
+
+import http.client
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from control_api import ControlServer
+from speech_scheduler import SpeechScheduler
+
+
+class FakeEngine:
+    """Ядро с настоящей очередью: фраза "звучит", пока не установлен release"""
+
+    def __init__(self, max_queue: int = 8):
+        self.release = threading.Event()
+        self.release.set()
+        self.scheduler = SpeechScheduler(workers=1, max_queue=max_queue)
+        self.stopped = 0
+        self.prefetched = []
+        self._prefetcher = ThreadPoolExecutor(max_workers=1)
+
+    def say(self, text, policy=None):
+        return self.scheduler.submit(lambda token: self.release.wait(5), key=text, policy=policy)
+
+    def stop(self):
+        self.stopped += 1
+        self.scheduler.cancel_all()
+
+    def prefetch(self, texts):
+        return self._prefetcher.submit(lambda: self.release.wait(5) and self.prefetched.extend(texts))
+
+    def stats(self):
+        return {"queue": self.scheduler.metrics()}
+
+    def close(self):
+        self.release.set()
+        self.scheduler.shutdown()
+        self._prefetcher.shutdown()
+
+
+@pytest.fixture
+def start():
+    started = []
+
+    def make(engine=None, **kwargs):
+        engine = engine or FakeEngine()
+        server = ControlServer(engine, **kwargs).start()
+        started.append((server, engine))
+        return server, engine
+
+    yield make
+    for server, engine in started:
+        server.stop()
+        engine.close()
+
+
+def call(server, method, path, payload=None, headers=None, body=None, conn=None):
+    """Запрос к серверу. Returns: (код, ответ JSON, заголовки)"""
+    own = conn is None
+    conn = conn or http.client.HTTPConnection(*server.address, timeout=5)
+    request_headers = {"Content-Type": "application/json"} if method == "POST" else {}
+    request_headers.update(headers or {})
+    if payload is not None:
+        body = json.dumps(payload).encode("utf-8")
+    conn.request(method, path, body=body, headers=request_headers)
+    response = conn.getresponse()
+    raw = response.read()
+    if own:
+        conn.close()
+    return response.status, json.loads(raw) if raw else None, response
+
+
+def test_speak_returns_job_with_status_and_timing(start):
+    server, _ = start()
+    status, job, _ = call(server, "POST", "/speak", {"text": "Привет"})
+    assert status == 202
+    assert job["status"] in ("queued", "running", "done")
+    for _ in range(50):
+        status, job, _ = call(server, "GET", f"/jobs/{job['id']}")
+        if job["status"] == "done":
+            break
+        time.sleep(0.02)
+    assert status == 200 and job["status"] == "done"
+    assert job["timing_ms"]["total"] is not None
+
+    status, job, _ = call(server, "POST", "/speak", {"text": "С ожиданием", "wait": 2})
+    assert status == 200 and job["status"] == "done"
+
+
+def test_bad_requests(start):
+    server, _ = start()
+    assert call(server, "POST", "/speak", {"text": "  "})[0] == 400
+    assert call(server, "POST", "/speak", {"text": "a", "policy": "nope"})[0] == 400
+    assert call(server, "POST", "/speak", body=b"[1, 2]")[0] == 400
+    assert call(server, "POST", "/speak", body=b"{")[0] == 400
+    assert call(server, "GET", "/jobs/999")[0] == 404
+    assert call(server, "GET", "/unknown")[0] == 404
+
+
+def test_post_requires_json_content_type_even_without_body(start):
+    server, engine = start()
+    # Такой запрос браузер отправляет с чужой страницы без preflight
+    status, _, _ = call(server, "POST", "/stop", headers={"Content-Type": "text/plain"}, body=b"")
+    assert status == 415
+    status, _, _ = call(server, "POST", "/speak", headers={"Content-Type": "text/plain"},
+                        body=json.dumps({"text": "a"}).encode())
+    assert status == 415
+    assert engine.stopped == 0
+    assert call(server, "POST", "/stop")[0] == 200
+    assert engine.stopped == 1
+
+
+@pytest.mark.parametrize("host, expected", [
+    ("evil.example", 403),
+    ("evil.example:8765", 403),
+    ("127.0.0.1.evil.example", 403),
+    ("localhost:8765", 200),
+    ("127.0.0.1", 200),
+])
+def test_host_header_must_be_loopback(start, host, expected):
+    server, _ = start()
+    assert call(server, "GET", "/health", headers={"Host": host})[0] == expected
+
+
+def test_token(start):
+    server, _ = start(token="secret")
+    assert call(server, "GET", "/health")[0] == 401
+    assert call(server, "GET", "/health", headers={"Authorization": "Bearer wrong"})[0] == 401
+    assert call(server, "GET", "/health", headers={"Authorization": "Bearer secret"})[0] == 200
+
+
+def test_rate_limit_returns_429_with_retry_after(start):
+    server, _ = start(rate=1, burst=2)
+    conn = http.client.HTTPConnection(*server.address, timeout=5)
+    codes = [call(server, "POST", "/speak", {"text": f"Фраза {i}"}, conn=conn)[0] for i in range(2)]
+    status, _, response = call(server, "POST", "/speak", {"text": "Лишняя"}, conn=conn)
+    conn.close()
+    assert codes == [202, 202]
+    assert status == 429
+    assert int(response.getheader("Retry-After")) >= 1
+
+
+def test_full_queue_returns_429(start):
+    engine = FakeEngine(max_queue=1)
+    engine.release.clear()
+    server, _ = start(engine, rate=0)
+    first = call(server, "POST", "/speak", {"text": "Играет"})[0]
+    time.sleep(0.1)  # первая фраза взята рабочим потоком
+    second = call(server, "POST", "/speak", {"text": "В очереди"})[0]
+    third, _, response = call(server, "POST", "/speak", {"text": "Не помещается"})
+    assert (first, second, third) == (202, 202, 429)
+    assert response.getheader("Retry-After") == "1"
+    assert server.stats()["queue_full"] == 1
+
+
+def test_prefetch_backlog_returns_429(start):
+    engine = FakeEngine()
+    engine.release.clear()
+    server, _ = start(engine, rate=0, max_prefetch=3)
+    assert call(server, "POST", "/prefetch", {"texts": ["а", "б"]})[0] == 202
+    assert call(server, "POST", "/prefetch", {"texts": ["в", "г"]})[0] == 429
+    engine.release.set()
+    for _ in range(50):
+        if server.stats()["prefetch_pending"] == 0:
+            break
+        time.sleep(0.02)
+    assert call(server, "POST", "/prefetch", {"texts": ["в", "г"]})[0] == 202
+
+
+def test_burst_of_requests_is_bounded(start):
+    engine = FakeEngine(max_queue=4)
+    engine.release.clear()
+    server, _ = start(engine, rate=20, burst=10)
+    conn = http.client.HTTPConnection(*server.address, timeout=5)
+    codes = [call(server, "POST", "/speak", {"text": f"Сообщение {i}"}, conn=conn)[0] for i in range(200)]
+    conn.close()
+    assert set(codes) == {202, 429}
+    # Принято не больше, чем помещается в очередь плюс одна выполняющаяся фраза
+    assert codes.count(202) <= 5
+    assert engine.scheduler.metrics()["queue_depth"] <= 4
+
+
+def test_idle_keep_alive_connections_release_slots(start):
+    server, _ = start(max_connections=2, idle_timeout=0.3)
+    idle = []
+    for _ in range(2):
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        assert call(server, "GET", "/health", conn=conn)[0] == 200
+        idle.append(conn)
+    assert call(server, "GET", "/health")[0] == 503
+    time.sleep(0.6)
+    assert call(server, "GET", "/health")[0] == 200
+    for conn in idle:
+        conn.close()
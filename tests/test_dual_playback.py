@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""Расхождение микрофона и динамиков по фактическому началу звучания (поддельный PyAudio)"""
+
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from audio_pcm import DecodedAudio
+from dual_playback import DualPlayback, MicSink, SpeakerSink
+from mic_stream import MicOutputStream
+
+RATE = 48000
+BLOCK = 256
+DAC_LATENCY = 0.02
+
+
+class FakeStream:
+    """Выходной поток: callback вызывается в реальном времени, первый - через start_delay секунд"""
+
+    def __init__(self, callback, start_delay):
+        self.callback = callback
+        self.start_delay = start_delay
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        if self.closed.wait(self.start_delay):
+            return
+        while not self.closed.is_set():
+            now = time.perf_counter()
+            self.callback(None, BLOCK, {"current_time": now, "output_buffer_dac_time": now + DAC_LATENCY}, 0)
+            time.sleep(BLOCK / RATE)
+
+    def is_active(self):
+        return not self.closed.is_set()
+
+    def get_output_latency(self):
+        return DAC_LATENCY
+
+    def stop_stream(self):
+        self.closed.set()
+
+    def close(self):
+        self.closed.set()
+
+
+class FakePyAudio:
+    def __init__(self, start_delay):
+        self.start_delay = start_delay
+
+    def open(self, stream_callback, **kwargs):
+        return FakeStream(stream_callback, self.start_delay)
+
+
+class FakeSound:
+    def play(self):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def fake_pyaudio_module(monkeypatch):
+    monkeypatch.setitem(sys.modules, "pyaudio", types.SimpleNamespace(paInt16=8, paContinue=0))
+
+
+def play(start_delay):
+    output = MicOutputStream(FakePyAudio(start_delay), rate=RATE, channels=2, frames_per_buffer=BLOCK)
+    audio = DecodedAudio(np.ones((RATE // 10, 2), dtype=np.int16), RATE)
+    speaker = SpeakerSink(lambda audio: FakeSound())
+    mic = MicSink(output, device_index=0)
+    skew = DualPlayback().play(audio, [speaker, mic])
+    output.close()
+    return skew, mic
+
+
+def test_skew_reflects_late_device_start():
+    # Устройство начинает забирать кадры на 150 мс позже - предсказание дало бы ~0
+    skew, mic = play(start_delay=0.15)
+    assert mic.started_at is not None
+    assert mic.latency == pytest.approx(DAC_LATENCY)
+    assert skew > 0.1
+
+
+def test_skew_is_small_when_device_is_on_time():
+    skew, _ = play(start_delay=0.0)
+    assert abs(skew) < 0.03
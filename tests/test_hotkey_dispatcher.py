@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""HotkeyDispatcher с FakeKeyboardBackend: debounce удержания, схлопывание повторов и счетчики"""
+
+from hotkey_dispatcher import FakeKeyboardBackend, HotkeyDispatcher
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeJob:
+    def __init__(self):
+        self.status = "running"
+
+
+def make_dispatcher(post=None):
+    backend = FakeKeyboardBackend(invalid=("bad+combo",))
+    clock = FakeClock()
+    dispatcher = HotkeyDispatcher(backend, post=post, debounce=0.25, clock=clock)
+    return backend, clock, dispatcher
+
+
+def test_held_key_fires_once():
+    backend, clock, dispatcher = make_dispatcher()
+    calls = []
+    dispatcher.register("ctrl+1", "history_1", lambda: calls.append(clock.now))
+
+    # Автоповтор 30 Гц в течение секунды: каждое событие ближе 0.25 с к предыдущему
+    for _ in range(30):
+        backend.trigger("ctrl+1")
+        clock.now += 1 / 30
+    assert len(calls) == 1
+
+    # После отпускания и паузы - новое срабатывание
+    clock.now += 0.5
+    backend.trigger("ctrl+1")
+    assert len(calls) == 2
+    assert backend.suppressed["ctrl+1"] is True
+
+
+def test_repeats_are_coalesced_while_phrase_is_active():
+    backend, clock, dispatcher = make_dispatcher()
+    jobs = []
+
+    def speak():
+        jobs.append(FakeJob())
+        return jobs[-1]
+
+    dispatcher.register("ctrl+2", "history_2", speak, key=lambda: "Иду на точку B")
+    dispatcher.register("ctrl+3", "history_3", speak, key=lambda: "Иду на точку B")
+    for combo in ("ctrl+2", "ctrl+3", "ctrl+2", "ctrl+3"):
+        backend.trigger(combo)
+        clock.now += 0.5
+    # Одна фраза под двумя сочетаниями: пока она звучит, остальные нажатия схлопываются
+    assert len(jobs) == 1
+
+    jobs[0].status = "done"
+    backend.trigger("ctrl+2")
+    assert len(jobs) == 2
+
+
+def test_pending_post_is_coalesced():
+    posted = []
+    backend, clock, dispatcher = make_dispatcher(post=posted.append)
+    calls = []
+    dispatcher.register("ctrl+4", "history_4", lambda: calls.append(1))
+    backend.trigger("ctrl+4")
+    clock.now += 0.5
+    backend.trigger("ctrl+4")  # первое действие еще не выполнено потоком интерфейса
+    assert len(posted) == 1
+    posted[0]()
+    clock.now += 0.5
+    backend.trigger("ctrl+4")
+    assert len(posted) == 2 and calls == [1]
+
+
+def test_counters():
+    backend, clock, dispatcher = make_dispatcher()
+    job = FakeJob()
+    dispatcher.register("ctrl+5", "history_5", lambda: job)
+    dispatcher.register("alt+t", "toggle", lambda: None)
+
+    def failing():
+        raise RuntimeError("boom")
+
+    dispatcher.register("alt+f", "focus", failing)
+    assert not dispatcher.register("bad+combo", "broken", lambda: None)
+
+    backend.trigger("ctrl+5", times=5)  # удержание: 1 выполнено, 4 отсеяно
+    clock.now += 0.5
+    backend.trigger("ctrl+5")  # фраза еще звучит - схлопнуто
+    backend.trigger("alt+t")
+    backend.trigger("alt+f")
+
+    stats = dispatcher.stats()
+    assert stats["events"] == 8
+    assert stats["dispatched"] == 3
+    assert stats["debounced"] == 4
+    assert stats["coalesced"] == 1
+    assert stats["errors"] == 1
+    assert stats["actions"]["history_5"] == {"dispatched": 1, "debounced": 4, "coalesced": 1}
+    assert "broken" not in stats["actions"]
+
+    dispatcher.clear()
+    assert backend.hotkeys == {}
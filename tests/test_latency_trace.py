@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""Перцентили и разбивка задержек по этапам на заданных метках времени"""
+
+import pytest
+
+from latency_trace import LatencyStats, UtteranceTrace, percentile
+
+
+def make_trace(engine, synthesis_ms, hit=False):
+    """Фраза с метками от нуля: очередь 5 мс, затем синтез, декодирование 2 мс и звук"""
+    clock = iter([0.0]).__next__  # только метка enqueue берется из часов
+    trace = UtteranceTrace("Фраза", engine, clock=clock)
+    at = 0.005
+    trace.mark("start", at)
+    trace.set_cache(hit)
+    trace.mark("synthesis_start", at)
+    at += synthesis_ms / 1000
+    trace.mark("synthesis_end", at)
+    trace.mark("decode_start", at)
+    trace.mark("decode_end", at + 0.002)
+    trace.mark("first_speaker", at + 0.012)
+    trace.mark("first_mic", at + 0.015)
+    trace.status = "done"
+    trace.mark("done", at + 0.5)
+    return trace
+
+
+def test_percentile_interpolates():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == pytest.approx(50.5)
+    assert percentile(values, 95) == pytest.approx(95.05)
+    assert percentile(values, 99) == pytest.approx(99.01)
+    assert percentile([7.0], 95) == 7.0
+    assert percentile([], 50) == 0.0
+
+
+def test_stage_breakdown_of_one_phrase():
+    trace = make_trace("google", 100)
+    # Первая метка этапа не перезаписывается, "done" - перезаписывается
+    trace.mark("synthesis_start", 1.0)
+    durations = trace.durations()
+    assert set(durations) == {"queue_wait", "synthesis", "decode", "first_speaker", "first_mic", "total"}
+    assert durations["queue_wait"] == pytest.approx(5)
+    assert durations["synthesis"] == pytest.approx(100)
+    assert durations["decode"] == pytest.approx(2)
+    assert durations["first_speaker"] == pytest.approx(117)
+    assert durations["first_mic"] == pytest.approx(120)
+    assert durations["total"] == pytest.approx(605)
+    assert trace.to_dict()["marks_ms"]["first_speaker"] == pytest.approx(117)
+
+
+def test_percentiles_per_engine_and_stage():
+    stats = LatencyStats()
+    for i in range(1, 21):
+        stats.record(make_trace("google", i * 10, hit=i % 4 == 0))
+    stats.record(make_trace("local", 50, hit=True))
+
+    google = stats.percentiles()["google"]
+    assert google["synthesis"] == {"count": 20, "p50": 105.0, "p95": 190.5, "p99": 198.1, "max": 200.0}
+    assert google["queue_wait"]["p50"] == pytest.approx(5)
+    assert google["decode"]["p95"] == pytest.approx(2)
+    assert google["first_speaker"]["p50"] == pytest.approx(5 + 105 + 12)
+    assert "ptt_hold" not in google
+    assert google["cache"] == {"hit": 5, "miss": 15}
+
+    assert list(stats.percentiles("local")) == ["local"]
+    assert stats.percentiles("local")["local"]["synthesis"]["max"] == pytest.approx(50)
+
+
+def test_window_keeps_last_values():
+    stats = LatencyStats(window=10)
+    for i in range(1, 21):
+        stats.record(make_trace("voicerss", i * 10))
+    synthesis = stats.percentiles()["voicerss"]["synthesis"]
+    assert synthesis["count"] == 10
+    assert synthesis["p50"] == pytest.approx(155)
+    assert synthesis["max"] == pytest.approx(200)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""Список голосов pyttsx3 без ожидания в вызывающем потоке (окно настроек)"""
+
+import threading
+import time
+import types
+
+from local_tts_worker import LocalTTSWorker
+
+VOICES = [types.SimpleNamespace(id="ru", name="Irina"), types.SimpleNamespace(id="en", name="Zira")]
+
+
+class SlowEngine:
+    """pyttsx3 с долгим перечислением голосов"""
+
+    def __init__(self, release):
+        self.release = release
+
+    def getProperty(self, name):
+        assert name == "voices"
+        self.release.wait(5)
+        return VOICES
+
+    def stop(self):
+        pass
+
+
+def test_load_voices_returns_before_engine_answers():
+    release = threading.Event()
+    worker = LocalTTSWorker(lambda: SlowEngine(release))
+    try:
+        started = time.perf_counter()
+        future = worker.load_voices()
+        assert time.perf_counter() - started < 0.1
+        assert not future.done()
+
+        loaded = threading.Event()
+        future.add_done_callback(lambda f: loaded.set())
+        release.set()
+        assert loaded.wait(1.0)
+        assert [voice.id for voice in future.result()] == ["ru", "en"]
+        # Повторный запрос берется из кэша голосов
+        assert worker.get_voices() is future.result()
+    finally:
+        release.set()
+        worker.shutdown()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""prewarm_cache: лимит и политика кэша из настроек, остановка, если набор не помещается"""
+
+import json
+import sys
+import types
+
+import pytest
+
+import prewarm_cache
+from audio_cache import AudioCache
+
+FILE_SIZE = 300 * 1024
+
+
+class FakeGTTS:
+    def __init__(self, text, lang="ru", slow=False):
+        self.text = text
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(b"\xff" * FILE_SIZE)
+
+
+@pytest.fixture(autouse=True)
+def fake_gtts(monkeypatch):
+    monkeypatch.setitem(sys.modules, "gtts", types.SimpleNamespace(gTTS=FakeGTTS))
+
+
+def run(tmp_path, phrases, cache_max_mb):
+    settings = tmp_path / "settings.json"
+    settings.write_text(json.dumps({"tts_engine": "google", "cache_max_mb": cache_max_mb,
+                                    "cache_eviction": "lfu"}), encoding="utf-8")
+    phrase_file = tmp_path / "phrases.txt"
+    phrase_file.write_text("\n".join(phrases), encoding="utf-8")
+    cache_dir = str(tmp_path / "cache")
+    code = prewarm_cache.main([str(phrase_file), "--settings", str(settings), "--cache", cache_dir,
+                               "--no-pcm", "--workers", "1", "--rate", "1000"])
+    return code, AudioCache(cache_dir)
+
+
+def test_settings_include_cache_budget(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"cache_max_mb": 5, "cache_eviction": "lfu", "voice_id": ""}), encoding="utf-8")
+    settings = prewarm_cache.load_settings(str(path))
+    assert settings["cache_max_mb"] == 5
+    assert settings["cache_eviction"] == "lfu"
+    assert settings["voice_id"] is None
+
+
+def test_set_within_budget(tmp_path):
+    code, cache = run(tmp_path, [f"Фраза {i}" for i in range(3)], cache_max_mb=1)
+    assert code == 0
+    assert cache.stats()["entries"] == 3
+    cache.close()
+
+
+def test_stops_when_set_does_not_fit(tmp_path, capsys):
+    code, cache = run(tmp_path, [f"Фраза {i}" for i in range(8)], cache_max_mb=1)
+    assert code == 1
+    assert "не помещается в лимит кэша" in capsys.readouterr().out
+    # Синтез остановлен после превышения, а кэш не вышел за лимит
+    assert cache.stats()["entries"] < 8
+    assert cache.total_size() <= 1024 * 1024
+    cache.close()
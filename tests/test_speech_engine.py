@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+"""Прерывание фразы при tts_workers=1: новая фраза не ждет сетевой синтез прерванной"""
+
+import os
+import threading
+import time
+
+from speech_engine import SpeechEngine
+from speech_scheduler import POLICY_INTERRUPT
+from tts_settings import TTSSettings
+
+
+class BlockingEngine(SpeechEngine):
+    """Синтез первой фразы висит, пока тест не отпустит "сеть"; воспроизведение только запоминается"""
+
+    def __init__(self, settings, cache_folder):
+        super().__init__(settings, cache_folder=cache_folder)
+        self.network = threading.Event()
+        self.played = []
+        self.played_event = threading.Event()
+
+    def synthesize(self, text, cancel_event=None, trace=None):
+        if text.startswith("Долгая"):
+            self.network.wait(5)
+        return f"{text}.mp3"
+
+    def play_audio(self, audio_file, cancel_event=None, trace=None):
+        self.played.append((time.perf_counter(), audio_file))
+        self.played_event.set()
+
+
+def make_engine(tmp_path):
+    settings = TTSSettings(settings_path=os.path.join(str(tmp_path), "settings.json"))
+    settings.tts_engine = "voicerss"
+    settings.tts_workers = 1
+    settings.sentence_chunking = False
+    return BlockingEngine(settings, os.path.join(str(tmp_path), "cache"))
+
+
+def test_interrupt_does_not_wait_for_cancelled_synthesis(tmp_path):
+    tts = make_engine(tmp_path)
+    try:
+        first = tts.say("Долгая фраза")
+        time.sleep(0.1)  # первая фраза уже в рабочем потоке и ждет ответа сети
+        started = time.perf_counter()
+        second = tts.say("Срочная фраза", policy=POLICY_INTERRUPT)
+        assert tts.played_event.wait(1.0)
+        assert tts.played == [(tts.played[0][0], "Срочная фраза.mp3")]
+        assert tts.played[0][0] - started < 0.5
+        assert first.wait(1.0) and first.status == "cancelled"
+        assert second.wait(1.0) and second.status == "done"
+    finally:
+        tts.network.set()
+        tts.close()
+
+
+def test_interrupt_between_segments(tmp_path):
+    tts = make_engine(tmp_path)
+    tts.settings.sentence_chunking = True
+    try:
+        # Первое предложение играет сразу, второе ("Долгая ...") синтезируется в фоне и висит
+        first = tts.say("Короткое начало. Долгая вторая часть.")
+        assert tts.played_event.wait(1.0)
+        tts.played_event.clear()
+        started = time.perf_counter()
+        tts.say("Срочная фраза", policy=POLICY_INTERRUPT)
+        assert tts.played_event.wait(1.0)
+        assert tts.played[-1][1] == "Срочная фраза.mp3"
+        assert tts.played[-1][0] - started < 0.5
+        assert first.wait(1.0) and first.status == "cancelled"
+    finally:
+        tts.network.set()
+        tts.close()
+
+
+def test_mic_device_index_is_checked_the_same_way_everywhere(tmp_path):
+    tts = make_engine(tmp_path)
+    try:
+        # Пустая строка - так сохраняется None в settings.json
+        for value in (-1, None, "", "1", -5):
+            tts.settings.mic_device_index = value
+            assert tts.mic_device_index() is None
+        tts.settings.mic_device_index = 0
+        assert tts.mic_device_index() == 0
+    finally:
+        tts.close()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""Границы фрагментов для конвейерного синтеза: сокращения, числа, длинные предложения, пустой текст"""
+
+import pytest
+
+from tts_backends import segment_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Первое! Второе? Третье... Четвертое.", ["Первое!", "Второе?", "Третье...", "Четвертое."]),
+    ("Да. Да.", ["Да.", "Да."]),
+    ("Строка\nвторая", ["Строка", "вторая"]),
+    # Сокращения и инициалы не заканчивают предложение
+    ("Т.е. он пришел в 10 ч. Потом ушел.", ["Т.е. он пришел в 10 ч.", "Потом ушел."]),
+    ("Это г. Москва, ул. Ленина. Да!", ["Это г. Москва, ул. Ленина.", "Да!"]),
+    ("Автор - А. С. Пушкин. Читаем.", ["Автор - А. С. Пушкин.", "Читаем."]),
+    ("Яблоки, груши и т.д. и т.п. Всё.", ["Яблоки, груши и т.д. и т.п.", "Всё."]),
+    ("Call Dr. Smith now. Ok.", ["Call Dr. Smith now.", "Ok."]),
+    # Десятичные числа
+    ("Цена 3.14 руб. Скидка 0.5%.", ["Цена 3.14 руб.", "Скидка 0.5%."]),
+    ("Версия 1.2.3 вышла.", ["Версия 1.2.3 вышла."]),
+])
+def test_sentence_boundaries(text, expected):
+    assert segment_text(text) == expected
+
+
+def test_long_sentence_is_split_by_clauses_then_words():
+    clause = "слово " * 20  # 120 символов
+    text = f"{clause.strip()}, {clause.strip()}, {clause.strip()}."
+    segments = segment_text(text, max_segment_chars=150)
+    assert all(len(segment) <= 150 for segment in segments)
+    assert len(segments) == 3
+    assert " ".join(segments) == text
+
+
+def test_word_longer_than_limit_is_hard_split():
+    segments = segment_text("А" * 450, max_segment_chars=200)
+    assert [len(segment) for segment in segments] == [200, 200, 50]
+
+
+@pytest.mark.parametrize("text", ["", "   ", "\n\t \n"])
+@pytest.mark.parametrize("chunking", [True, False])
+def test_blank_text_has_no_segments(text, chunking):
+    assert segment_text(text, chunking) == []
+
+
+def test_chunking_disabled_passes_text_through():
+    text = "Первое предложение. Второе, очень длинное " + "слово " * 60
+    assert segment_text(text, sentence_chunking=False, max_segment_chars=50) == [text]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""Потоковый синтез Google TTS с поддельным gTTS: первый звук до конца синтеза и отмена между фрагментами"""
+
+import threading
+import time
+
+import numpy as np
+
+from audio_pcm import DecodedAudio
+from tts_streaming import ChunkFeeder, GoogleStreamingSynthesis
+
+CHUNK_DELAY = 0.15
+
+
+class SlowChunkedTTS:
+    """gTTS с методом stream(): каждый фрагмент приходит через CHUNK_DELAY секунд"""
+
+    def __init__(self, text, lang="ru", slow=False, chunks=4):
+        self.chunks = chunks
+        self.yielded = 0
+
+    def stream(self):
+        for i in range(self.chunks):
+            time.sleep(CHUNK_DELAY)
+            self.yielded += 1
+            yield bytes([i]) * 16
+
+
+def fake_decode(data: bytes) -> DecodedAudio:
+    return DecodedAudio(np.full((441, 1), data[0], dtype=np.int16), 44100)
+
+
+def test_first_block_reaches_sink_before_synthesis_finishes():
+    received = []
+    first_block = threading.Event()
+
+    def sink(audio):
+        received.append((time.perf_counter(), int(audio.samples[0, 0])))
+        first_block.set()
+
+    feeder = ChunkFeeder("speaker", sink)
+    synthesis = GoogleStreamingSynthesis("Проверка", tts_factory=SlowChunkedTTS, decode=fake_decode)
+    mp3 = synthesis.run([feeder])
+    finished_at = time.perf_counter()
+    feeder.join(2)
+
+    assert mp3 == b"".join(bytes([i]) * 16 for i in range(4))
+    assert [value for _, value in received] == [0, 1, 2, 3]
+    # Первый блок передан в приемник, пока еще синтезировались остальные фрагменты
+    assert received[0][0] < finished_at - 2 * CHUNK_DELAY
+    assert synthesis.time_to_first_sample < 2 * CHUNK_DELAY
+
+
+def test_should_stop_cancels_between_chunks():
+    tts = SlowChunkedTTS("Проверка")
+    received = []
+    stop = threading.Event()
+
+    def sink(audio):
+        received.append(audio)
+        stop.set()  # отмена сразу после первого фрагмента
+
+    finished = threading.Event()
+    feeder = ChunkFeeder("mic", sink, on_finish=finished.set)
+    synthesis = GoogleStreamingSynthesis("Проверка", tts_factory=lambda **kwargs: tts, decode=fake_decode)
+    # Отмена проверяется после получения каждого следующего фрагмента (приемник успевает за CHUNK_DELAY)
+    result = synthesis.run([feeder], should_stop=stop.is_set)
+
+    assert result is None
+    assert tts.yielded < tts.chunks
+    assert finished.wait(2)  # приемник закрыт и после отмены
+    assert len(received) == 1
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""VoiceRSSAPI против локального HTTP-сервера на 127.0.0.1: keep-alive, повторы и таймауты"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from audio_cache import AudioCache
+from voice_api import VoiceRSSAPI
+
+MP3 = b"ID3" + b"\x00" * 64
+
+
+class StandInServer:
+    """Сервер по сценарию: очередь ответов (код, заголовки, задержка); по умолчанию - 200 с MP3"""
+
+    def __init__(self):
+        self.script = []
+        self.requests = []  # (порт клиента, параметры запроса)
+        self.times = []  # время прихода запросов
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests.append((self.client_address[1], self.path))
+                server.times.append(time.perf_counter())
+                status, headers, delay = server.script.pop(0) if server.script else (200, {}, 0)
+                if delay:
+                    time.sleep(delay)
+                body = MP3 if status == 200 else b"error"
+                try:
+                    self.send_response(status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass  # клиент закрыл соединение по таймауту
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.close()
+
+
+@pytest.fixture
+def make_api(server, tmp_path):
+    clients = []
+
+    def make(**kwargs):
+        kwargs.setdefault("backoff", 0.01)
+        api = VoiceRSSAPI("key", cache=AudioCache(str(tmp_path / "cache")), base_url=server.url, **kwargs)
+        clients.append(api)
+        return api
+
+    yield make
+    for api in clients:
+        api.close()
+        api.cache.close()
+
+
+def test_connection_is_reused_between_phrases(server, make_api):
+    api = make_api()
+    assert api.text_to_speech("Первая фраза")
+    assert api.text_to_speech("Вторая фраза")
+    assert len(server.requests) == 2
+    # Оба запроса пришли с одного клиентского порта - одно соединение keep-alive
+    assert server.requests[0][0] == server.requests[1][0]
+
+
+def test_retries_on_server_error(server, make_api):
+    server.script = [(503, {}, 0), (500, {}, 0)]
+    api = make_api(retries=2)
+    path = api.text_to_speech("Ошибка сервера")
+    assert path
+    with open(path, "rb") as f:
+        assert f.read() == MP3
+    assert len(server.requests) == 3
+    assert api.stats()["retries"] == 2
+
+
+def test_retry_after_is_respected_on_429(server, make_api):
+    server.script = [(429, {"Retry-After": "1"}, 0)]
+    api = make_api(retries=1)
+    started = time.perf_counter()
+    assert api.text_to_speech("Слишком часто")
+    assert time.perf_counter() - started >= 1.0
+    assert len(server.requests) == 2
+
+
+def test_client_error_is_not_retried(server, make_api):
+    server.script = [(400, {}, 0)]
+    api = make_api(retries=3)
+    assert api.text_to_speech("Неверный запрос") is None
+    assert len(server.requests) == 1
+    assert api.stats()["retries"] == 0
+
+
+def test_read_timeout(server, make_api):
+    server.script = [(200, {}, 1.0), (200, {}, 1.0)]
+    api = make_api(retries=1, read_timeout=0.2)
+    started = time.perf_counter()
+    assert api.text_to_speech("Долгий ответ") is None
+    elapsed = time.perf_counter() - started
+    # Две попытки по таймауту чтения, без ожидания полного ответа сервера
+    assert len(server.requests) == 2
+    assert elapsed < 1.0
+    assert api.stats()["failures"] == 2
+
+
+def test_batch_limiter_covers_retries(server, make_api):
+    server.script = [(503, {}, 0), (503, {}, 0)]
+    api = make_api(retries=2, backoff=0)
+    results = dict(api.synthesize_many(["Повтор под ограничением"], rate=5, burst=1))
+    assert results["Повтор под ограничением"]
+    # Каждая попытка ждет свой токен: не чаще 5 запросов в секунду
+    assert len(server.times) == 3
+    gaps = [b - a for a, b in zip(server.times, server.times[1:])]
+    assert min(gaps) >= 0.15
+
+
+def test_batch_with_zero_burst_does_not_hang(server, make_api):
+    api = make_api()
+    started = time.perf_counter()
+    results = dict(api.synthesize_many(["Без запаса"], max_workers=0, rate=20))
+    assert results["Без запаса"]
+    assert time.perf_counter() - started < 2.0
+
+
+def test_long_retry_after_is_not_waited(server, make_api):
+    server.script = [(429, {"Retry-After": "3600"}, 0)]
+    api = make_api(retries=2, max_retry_after=2.0)
+    started = time.perf_counter()
+    assert api.text_to_speech("Подождите час") is None
+    assert time.perf_counter() - started < 1.0
+    assert len(server.requests) == 1
+
+
+def test_cancel_interrupts_retry_pause(server, make_api):
+    server.script = [(503, {}, 0)]
+    api = make_api(retries=2, backoff=10)
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    started = time.perf_counter()
+    assert api.text_to_speech("Отмена во время паузы", cancel_event=cancel) is None
+    assert time.perf_counter() - started < 1.0
+    assert len(server.requests) == 1
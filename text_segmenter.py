@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Разбиение текста на предложения и фразы для конвейерного синтеза
+Каждый фрагмент синтезируется и кэшируется отдельно
+"""
+
+import re
+import textwrap
+from typing import List
+
+# Конец предложения: знак препинания с пробелом после него или перевод строки
+SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|\s*\n+\s*")
+
+# Граница придаточной части внутри длинного предложения
+CLAUSE_END = re.compile(r"(?<=[,;:—])\s+")
+
+# Сокращения, после которых точка не заканчивает предложение (обычно за ними идет имя или слово)
+ABBREVIATIONS = {
+    "г", "гг", "ул", "пр", "пер", "д", "кв", "им", "проф", "акад", "доц", "т.е", "т.к", "т.н", "напр", "см", "ср",
+    "mr", "mrs", "ms", "dr", "st", "vs", "e.g", "i.e",
+}
+
+# Слово с точками перед границей предложения ("т.е.", "г.", "3.14.")
+LAST_WORD = re.compile(r"[\w.]+$")
+
+
+def split_text(text: str, max_chars: int = 200) -> List[str]:
+    """
+    Разбиение текста на фрагменты для синтеза
+
+    Args:
+        text (str): Исходный текст
+        max_chars (int): Максимальная длина фрагмента. Длинные предложения
+            делятся по запятым и другим границам фраз, затем по словам
+
+    Returns:
+        list: Непустые фрагменты в исходном порядке
+    """
+    segments = []
+    for sentence in _sentences(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            segments.append(sentence)
+        else:
+            segments.extend(_split_long_sentence(sentence, max_chars))
+    return segments
+
+
+def _sentences(text: str) -> List[str]:
+    """Деление на предложения без разрыва после сокращений и инициалов"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        if _is_sentence_end(text, match.start(), match.end()) or "\n" in match.group():
+            sentences.append(text[start:match.start()])
+            start = match.end()
+    sentences.append(text[start:])
+    return sentences
+
+
+def _is_sentence_end(text: str, end: int, next_start: int) -> bool:
+    if text[end - 1] != ".":
+        return True
+    # После точки с маленькой буквы продолжается то же предложение ("и т.д. и т.п.")
+    if next_start < len(text) and text[next_start].islower():
+        return False
+    word = LAST_WORD.search(text, 0, end)
+    if word is None:
+        return True
+    word = word.group().rstrip(".")
+    # Инициалы ("А. С. Пушкин") и известные сокращения
+    if len(word) == 1 and word.isupper():
+        return False
+    return word.lower() not in ABBREVIATIONS
+
+
+def _split_long_sentence(sentence: str, max_chars: int) -> List[str]:
+    """Деление длинного предложения по границам фраз с объединением коротких частей"""
+    parts = []
+    current = ""
+    for clause in CLAUSE_END.split(sentence):
+        for piece in textwrap.wrap(clause, max_chars) or [clause]:
+            if current and len(current) + 1 + len(piece) > max_chars:
+                parts.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        parts.append(current)
+    return parts
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Синтез речи движками TTS Overlay с записью в общий кэш
+Используется и приложением, и утилитой предварительного заполнения кэша,
+поэтому ключи кэша у них всегда совпадают
+"""
+
+import logging
+import threading
+from typing import List, Optional
+
+from audio_cache import AudioCache
+from text_segmenter import split_text
+
+# Язык Google TTS (в приложении фиксирован)
+GOOGLE_LANGUAGE = "ru"
+
+
+def segment_text(text: str, sentence_chunking: bool = True, max_segment_chars: int = 200) -> List[str]:
+    """Фрагменты, на которые приложение делит текст при озвучивании (каждый кэшируется отдельно)"""
+    if not text or not text.strip():
+        return []
+    if sentence_chunking:
+        return split_text(text, int(max_segment_chars))
+    return [text]
+
+
+def find_google(cache: AudioCache, text: str) -> Optional[str]:
+    """Готовый файл Google TTS в кэше"""
+    return cache.find("google", text, language=GOOGLE_LANGUAGE)
+
+
+def synthesize_google(cache: AudioCache, text: str) -> Optional[str]:
+    """Синтез через Google TTS (gTTS). Возвращает путь к файлу в кэше или None"""
+    def synthesize(cache_path):
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=GOOGLE_LANGUAGE, slow=False)
+        tts.save(cache_path)
+        logging.debug(f"Аудио сохранено в кэш: {cache_path}")
+        return True
+
+    try:
+        return cache.get_or_create("google", text, synthesize, language=GOOGLE_LANGUAGE)
+    except Exception as e:
+        logging.error(f"Ошибка при генерации аудио через Google: {e}")
+        return None
+
+
+def find_local(cache: AudioCache, text: str, voice_id: Optional[str]) -> Optional[str]:
+    """Готовый файл локального движка в кэше"""
+    return cache.find("local", text, voice=voice_id)
+
+
+def synthesize_local(cache: AudioCache, worker, text: str, voice_id: Optional[str],
+                     cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+    """Синтез локальным движком pyttsx3 (в потоке LocalTTSWorker)"""
+    def synthesize(cache_path):
+        if not worker.save_to_file(text, cache_path, voice_id, cancel_event):
+            return False
+        logging.debug(f"Локальный аудио файл создан: {cache_path}")
+        return True
+
+    try:
+        return cache.get_or_create("local", text, synthesize, voice=voice_id, ext="wav")
+    except Exception as e:
+        logging.error(f"Ошибка при генерации аудио локально: {e}")
+        return None
@@ -1,46 +1,30 @@
 # --- Стандартные библиотеки ---
-import os
 import sys
-import json
 import time
-import tempfile
 import threading
-from dataclasses import dataclass, asdict, field
-from typing import Optional, List
 
 # --- GUI и взаимодействие ---
 import tkinter as tk
 from tkinter import ttk, messagebox
 import TKinterModernThemes as TKMT
 
-# --- Аудио и TTS ---
-import pygame
-import pyaudio
-import wave
-import numpy as np
-from gtts import gTTS
-import pyttsx3
-from pydub import AudioSegment
-
 # --- Сторонние утилиты ---
 import keyboard
 import ctypes
 from ctypes import wintypes
 
 # --- Внешние модули проекта ---
-try:
-    from voice_api import VoiceRSSAPI
-except ImportError:
-    print("Модуль voice_api.py не найден. Функции VoiceRSS будут недоступны.")
-    VoiceRSSAPI = None
+# Ядро озвучивания (движки, кэш, очередь, приемники звука); pygame, PyAudio, pyttsx3 и клиент VoiceRSS
+# загружаются в нем при первом использовании или в фоновом прогреве
+from tts_settings import TTSSettings
+from speech_engine import SpeechEngine
+from control_api import ControlServer
+from hotkey_dispatcher import HotkeyDispatcher, KeyboardModuleBackend
+from log_setup import setup_logging, set_log_level
 
 import logging
-logging.basicConfig(
-    filename="tts_overlay_debug.log",
-    filemode="w",
-    level=logging.DEBUG,
-    format="%(asctime)s %(levelname)s %(message)s"
-)
+# Запись в файл и консоль идет в отдельном потоке; уровень из настроек применяется при запуске окна
+setup_logging("tts_overlay_debug.log", level=logging.DEBUG)
 logging.debug("=== TTS Overlay стартует ===")
 
 # Константы для Windows API
@@ -80,52 +64,10 @@ VK_CODE = {
     'right_control': 0xA3, 'left_menu': 0xA4, 'right_menu': 0xA5
 }
 
-@dataclass
-class TTSSettings:
-    output_device_index: int = 0
-    mic_device_index: int = -1
-    output_volume: float = 0.8
-    mic_volume: float = 0.8
-    voice_id: Optional[str] = None
-    tts_engine: str = "google"
-    voicerss_language: str = "ru-ru"
-    voicerss_voice: Optional[str] = None
-    voicerss_api_key: Optional[str] = ""
-    voice_chat_key: Optional[str] = None
-    history_hotkey_modifier: str = "ctrl"
-    remove_queue: bool = False
-    toggle_visibility_key: str = "alt+t"  # Клавиша для открытия/закрытия меню (по умолчанию alt+t)
-    focus_window_key: Optional[str] = None  # Дополнительная клавиша для открытия окна (по умолчанию не задана)
-    settings_path: str = field(default_factory=lambda: os.path.join(os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)), "settings.json"), repr=False)
-
-    def load_settings(self):
-        if os.path.exists(self.settings_path):
-            try:
-                with open(self.settings_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                for key in asdict(self):
-                    if key in data:
-                        setattr(self, key, data[key] if data[key] is not None else None)
-            except Exception as e:
-                print(f"Ошибка при загрузке настроек: {e}")
-
-    def save_settings(self):
-        try:
-            data = asdict(self)
-            data.pop('settings_path', None)
-            # Приводим все None к пустой строке для корректного сохранения в json
-            for k, v in data.items():
-                if v is None:
-                    data[k] = ""
-            with open(self.settings_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=4)
-        except Exception as e:
-            print(f"Ошибка при сохранении настроек: {e}")
-
 class TTSOverlay(TKMT.ThemedTKinterFrame):
     def __init__(self):
         logging.debug("TTSOverlay.__init__() стартует")
-        print("Инициализация приложения...")
+        logging.info("Инициализация приложения...")
         # Инициализация главного окна с темой
         super().__init__("TTS Overlay", "azure", "dark", useconfigfile=False, usecommandlineargs=False)
         
@@ -135,20 +77,13 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         # Устанавливаем окно поверх всех других окон
         self.root.attributes('-topmost', True)
         
-        # Инициализация pygame для проигрывания звука
-        pygame.mixer.init()
-        
-        # Инициализация PyAudio для работы с аудиоустройствами
-        self.p = pyaudio.PyAudio()
-        logging.debug("PyAudio инициализирован")
-        print("PyAudio инициализирован")
-        
-        # Инициализация локального движка TTS
-        self.engine = pyttsx3.init()
-        
-        # Загружаем настройки
+        # Загружаем настройки (нужны для инициализации звука)
         self.settings = TTSSettings()
         self.settings.load_settings()
+        set_log_level(self.settings.log_level)
+        
+        # Ядро озвучивания; клавишу голосового чата нажимает и отпускает окно
+        self.engine = SpeechEngine(self.settings, ptt_press=self._press_mic_key, ptt_release=self._release_mic_key)
         
         # Создание кастомной полосы заголовка
         self.create_title_bar()
@@ -156,30 +91,10 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         # Создание главного интерфейса
         self.create_widgets()
         
-        # Получение списка аудиоустройств
-        self.get_audio_devices()
-        
-        # Регистрация горячих клавиш
+        # Регистрация горячих клавиш: все сочетания идут через диспетчер в главный поток
+        self.hotkeys = HotkeyDispatcher(KeyboardModuleBackend(keyboard), post=lambda fn: self.root.after(0, fn))
         self.register_hotkeys()
         
-        # Создание папки для кэша, если её нет
-        self.cache_folder = os.path.join(os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)), "cache")
-        if not os.path.exists(self.cache_folder):
-            os.makedirs(self.cache_folder)
-        
-        # Очередь для хранения временных файлов
-        self.temp_files = []
-        
-        # Запуск потока для очистки временных файлов
-        self.cleanup_thread = threading.Thread(target=self.cleanup_temp_files, daemon=True)
-        self.cleanup_thread.start()
-        print("Рабочий поток запущен")
-        
-        # Запуск потока для очистки старых файлов кэша
-        self.cache_cleanup_thread = threading.Thread(target=self.cleanup_cache, daemon=True)
-        self.cache_cleanup_thread.start()
-        print("Рабочий поток запущен")
-        
         # Буфер для хранения истории фраз
         self.phrase_history = [""] * 10
         
@@ -194,11 +109,25 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         
         self.mic_thread = None
         self._stop_mic = False
-        self.active_tts_threads = []
-        self._tts_stop_flag = False
-        self._tts_engines = []
-        self._tts_events = []
         self.tts_lock = threading.Lock()
+        
+        # Фоновая подготовка того, что понадобится для первой фразы с текущими настройками
+        threading.Thread(target=self.engine.warm_up, name="warm-up", daemon=True).start()
+        
+        # Локальный HTTP API для отправки текста из других программ (бот трансляции, чат)
+        self.control_api = None
+        if self.settings.control_api_enabled:
+            self.start_control_api()
+    
+    def start_control_api(self):
+        """Запуск API управления на 127.0.0.1 (порт и токен из настроек)"""
+        try:
+            self.control_api = ControlServer(self.engine, port=int(self.settings.control_api_port),
+                                             speak=self.speak_from_api, token=self.settings.control_api_token,
+                                             rate=float(self.settings.control_api_rate)).start()
+        except OSError as e:
+            logging.error(f"Не удалось запустить API управления на порту {self.settings.control_api_port}: {e}")
+            self.control_api = None
     
     def create_title_bar(self):
         """Создание кастомной полосы заголовка"""
@@ -264,23 +193,14 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
     
     def on_close(self):
         """Обработка закрытия приложения"""
-        # Останавливаем воспроизведение, если оно идет
-        if pygame.mixer.get_init() and pygame.mixer.music.get_busy():
-            pygame.mixer.music.stop()
-        
-        # Удаляем временные файлы
-        for file in self.temp_files:
-            try:
-                if os.path.exists(file):
-                    os.remove(file)
-            except:
-                pass
+        # Останавливаем API управления, воспроизведение, очередь озвучивания, потоки синтеза и аудиоустройства
+        if self.control_api is not None:
+            self.control_api.stop()
+        self.engine.close()
         
         # Отменяем регистрацию горячих клавиш
-        keyboard.unhook_all()
-        
-        # Закрываем PyAudio
-        self.p.terminate()
+        logging.debug(f"Горячие клавиши: {self.hotkeys.stats()}")
+        self.hotkeys.clear()
         
         # Закрываем приложение
         self.root.destroy()
@@ -331,8 +251,8 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         """Получение списка аудиоустройств"""
         devices = []
         
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
+        for i in range(self.engine.p.get_device_count()):
+            device_info = self.engine.p.get_device_info_by_index(i)
             # Преобразуем значение в int для корректного сравнения
             max_output_channels = int(device_info['maxOutputChannels'])
             if max_output_channels > 0:
@@ -343,8 +263,8 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         
         # Получаем список устройств ввода для микрофона
         input_devices = []
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
+        for i in range(self.engine.p.get_device_count()):
+            device_info = self.engine.p.get_device_info_by_index(i)
             # Преобразуем значение в int для корректного сравнения
             max_input_channels = int(device_info['maxInputChannels'])
             if max_input_channels > 0:
@@ -354,45 +274,25 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         logging.debug(f"Найдено устройств ввода: {len(self.mic_devices)}")
     
     def register_hotkeys(self):
-        try:
-            keyboard.unhook_all()
-            time.sleep(0.1)
-        except Exception as e:
-            logging.error(f"Ошибка при отмене хоткеев: {e}")
+        """Таблица горячих клавиш (повторы при удержании отсеиваются, повтор звучащей фразы схлопывается)"""
+        self.hotkeys.clear()
+        time.sleep(0.1)
+        self.hotkeys.debounce = max(0, int(self.settings.hotkey_debounce_ms)) / 1000
         toggle_key = self.settings.toggle_visibility_key or "alt+t"
-        try:
-            keyboard.add_hotkey(toggle_key, lambda: (self.root.after(0, self._toggle_visibility_mainthread), None)[1], suppress=True)
-            logging.debug(f"Зарегистрирован хоткей для переключения видимости: {toggle_key}")
-        except Exception as e:
-            logging.warning(f"Не удалось зарегистрировать хоткей для переключения видимости {toggle_key}: {e}")
-            try:
-                keyboard.add_hotkey("alt+t", lambda: (self.root.after(0, self._toggle_visibility_mainthread), None)[1], suppress=True)
-                logging.debug("Зарегистрирован стандартный хоткей для переключения видимости: alt+t")
-            except Exception as e2:
-                logging.error(f"Не удалось зарегистрировать стандартный хоткей: {e2}")
+        if not self.hotkeys.register(toggle_key, "toggle_visibility", self._toggle_visibility_mainthread):
+            self.hotkeys.register("alt+t", "toggle_visibility", self._toggle_visibility_mainthread)
         focus_key = self.settings.focus_window_key
         if focus_key:
-            try:
-                keyboard.add_hotkey(focus_key, lambda: (self.root.after(0, self.show_and_focus_window), None)[1], suppress=True)
-                logging.debug(f"Зарегистрирован хоткей для открытия окна: {focus_key}")
-            except Exception as e:
-                logging.warning(f"Не удалось зарегистрировать хоткей для открытия окна {focus_key}: {e}")
+            self.hotkeys.register(focus_key, "focus_window", self.show_and_focus_window)
         modifier = self.settings.history_hotkey_modifier or "ctrl"
         for i in range(10):
-            hotkey = f"{modifier}+{i}"
-            try:
-                def create_handler(num):
-                    return lambda: (self.root.after(0, self._play_saved_phrase_mainthread, num), None)[1]
-                keyboard.add_hotkey(hotkey, create_handler(i), suppress=True)
-                logging.debug(f"Зарегистрирован хоткей для истории: {hotkey}")
-            except Exception as e:
-                logging.warning(f"Не удалось зарегистрировать хоткей для истории {hotkey}: {e}")
+            # Ключ схлопывания - текст фразы: пока она в очереди или звучит, повторное нажатие ее не ставит
+            self.hotkeys.register(f"{modifier}+{i}", f"history_{i}",
+                                  lambda num=i: self._play_saved_phrase_mainthread(num),
+                                  key=lambda num=i: self._saved_phrase(num))
         if self.settings.voice_chat_key and self.settings.voice_chat_key != toggle_key:
-            try:
-                keyboard.add_hotkey(self.settings.voice_chat_key, lambda: (self.root.after(0, self.show_and_focus_window), None)[1], suppress=False)
-                logging.debug(f"Зарегистрирован хоткей для микрофона: {self.settings.voice_chat_key}")
-            except Exception as e:
-                logging.warning(f"Не удалось зарегистрировать хоткей для voice_chat_key: {e}")
+            self.hotkeys.register(self.settings.voice_chat_key, "voice_chat_key", self.show_and_focus_window,
+                                  suppress=False)
     
     def toggle_visibility(self):
         self.root.after(0, self._toggle_visibility_mainthread)
@@ -445,22 +345,7 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
             self.root.withdraw()
             self.set_status("Озвучивание...")
             self.check_and_fix_key_stuck()
-            if getattr(self.settings, 'remove_queue', False):
-                self.stop_playback()
-            self._tts_stop_flag = False
-            tts_event = threading.Event()
-            def tts_job():
-                try:
-                    self.text_to_speech(text, tts_event)
-                finally:
-                    with self.tts_lock:
-                        if threading.current_thread() in self.active_tts_threads:
-                            self.active_tts_threads.remove(threading.current_thread())
-            tts_thread = threading.Thread(target=tts_job, daemon=True)
-            tts_thread.start()
-            with self.tts_lock:
-                self.active_tts_threads.append(tts_thread)
-                self._tts_events.append(tts_event)
+            self.enqueue_speech(text)
         if threading.current_thread() is threading.main_thread():
             do_speak()
         else:
@@ -476,197 +361,35 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
     def play_saved_phrase(self, index):
         self.root.after(0, self._play_saved_phrase_mainthread, index)
 
-    def _play_saved_phrase_mainthread(self, index):
+    def _saved_phrase(self, index):
+        """Фраза из истории для клавиши с цифрой index (1..9, 0 - десятая) или None"""
         real_index = index - 1 if index > 0 else 9
         if 0 <= real_index < len(self.phrase_history) and self.phrase_history[real_index]:
-            phrase = self.phrase_history[real_index]
-            if getattr(self.settings, 'remove_queue', False):
-                self.stop_playback()
+            return self.phrase_history[real_index]
+        return None
+
+    def _play_saved_phrase_mainthread(self, index):
+        phrase = self._saved_phrase(index)
+        if phrase:
             self.check_and_fix_key_stuck()
             self.set_status(f"🔊 Воспроизведение фразы #{index}")
-            self._tts_stop_flag = False
-            tts_event = threading.Event()
-            def tts_job():
-                try:
-                    self.text_to_speech(phrase, tts_event)
-                finally:
-                    with self.tts_lock:
-                        if threading.current_thread() in self.active_tts_threads:
-                            self.active_tts_threads.remove(threading.current_thread())
-            tts_thread = threading.Thread(target=tts_job, daemon=True)
-            tts_thread.start()
-            with self.tts_lock:
-                self.active_tts_threads.append(tts_thread)
-                self._tts_events.append(tts_event)
-    
-    def cleanup_temp_files(self):
-        """Фоновый поток для очистки временных файлов"""
-        while True:
-            time.sleep(5)  # Проверяем каждые 5 секунд
-            if self.temp_files:
-                for file_path in list(self.temp_files):
-                    try:
-                        if os.path.exists(file_path):
-                            os.unlink(file_path)
-                            self.temp_files.remove(file_path)
-                    except Exception as e:
-                        # Если файл еще занят, пробуем позже
-                        print(f"Не удалось удалить временный файл {file_path}: {e}")
-                        continue
-    
-    def generate_audio_google(self, text):
-        """Генерация аудио через Google TTS"""
-        # Проверяем, есть ли в кэше
-        text_hash = hash(text)
-        cache_path = os.path.join(self.cache_folder, f"{text_hash}.mp3")
-        
-        if os.path.exists(cache_path):
-            print(f"Используется кэшированный файл: {cache_path}")
-            return cache_path
-        
-        # Если нет в кэше, генерируем новый
-        try:
-            tts = gTTS(text=text, lang='ru', slow=False)
-            tts.save(cache_path)
-            print(f"Аудио сохранено в кэш: {cache_path}")
-            return cache_path
-        except Exception as e:
-            print(f"Ошибка при генерации аудио через Google: {e}")
-            return None
-    
-    def generate_audio_local(self, text):
-        """Генерация аудио через локальный движок pyttsx3"""
-        # Получаем список доступных голосов
-        voices = self.engine.getProperty('voices')
-        
-        # Если задан конкретный ID голоса, используем его
-        if self.settings.voice_id:
-            for voice in voices:
-                if voice.id == self.settings.voice_id:
-                    self.engine.setProperty('voice', voice.id)
-                    break
-        
-        # Генерируем во временный файл
-        temp_file = tempfile.mktemp(suffix='.wav')
-        
-        try:
-            self.engine.save_to_file(text, temp_file)
-            self.engine.runAndWait()
-            print(f"Локальный аудио файл создан: {temp_file}")
-            
-            # Добавляем во временные файлы для очистки
-            self.temp_files.append(temp_file)
-            
-            return temp_file
-        except Exception as e:
-            print(f"Ошибка при генерации аудио локально: {e}")
-            return None
+            return self.enqueue_speech(phrase)
+        return None
     
-    def generate_audio_voicerss(self, text):
-        """Генерация аудио через VoiceRSS API"""
-        if VoiceRSSAPI is None:
-            print("Модуль VoiceRSS API не загружен")
-            return None
-        
-        try:
-            # Создаем экземпляр API с ключом из настроек или демо-ключом
-            api_key = self.settings.voicerss_api_key
-            if not api_key:
-                api = VoiceRSSAPI()
-                api_key = api.get_demo_key()
-                print("Используется демо-ключ VoiceRSS API")
-            else:
-                api = VoiceRSSAPI(api_key)
-            
-            # Получаем язык и голос из настроек
-            language = self.settings.voicerss_language or "ru-ru"
-            voice = self.settings.voicerss_voice
-            
-            # Генерируем аудио
-            audio_file = api.text_to_speech(text, language, voice)
-            if audio_file and os.path.exists(audio_file):
-                print(f"VoiceRSS аудио файл создан: {audio_file}")
-                return audio_file
-            else:
-                print("Ошибка при генерации аудио через VoiceRSS API или файл не создан")
-                return None
-        except Exception as e:
-            print(f"Ошибка при генерации аудио через VoiceRSS: {e}")
-            return None
-    
-    def text_to_speech(self, text, tts_event):
-        tts_engine = self.settings.tts_engine
-        if self._tts_stop_flag or tts_event.is_set():
-            return
-        try:
-            if tts_engine == "google":
-                audio_file = self.generate_audio_google(text)
-                if self._tts_stop_flag or tts_event.is_set():
-                    return
-                if audio_file:
-                    self.play_audio_output(audio_file)
-                    if self.settings.mic_device_index != -1:
-                        self.play_audio_mic(audio_file)
-            elif tts_engine == "local":
-                import pyttsx3
-                engine = pyttsx3.init()
-                self._tts_engines.append(engine)
-                voices = engine.getProperty('voices')
-                if self.settings.voice_id:
-                    for voice in voices:
-                        if voice.id == self.settings.voice_id:
-                            engine.setProperty('voice', voice.id)
-                            break
-                temp_file = tempfile.mktemp(suffix='.wav')
-                try:
-                    engine.save_to_file(text, temp_file)
-                    engine.runAndWait()
-                    if self._tts_stop_flag or tts_event.is_set():
-                        return
-                    self.play_audio_output(temp_file)
-                    if self.settings.mic_device_index != -1:
-                        self.play_audio_mic(temp_file)
-                finally:
-                    engine.stop()
-                    if engine in self._tts_engines:
-                        self._tts_engines.remove(engine)
-            elif tts_engine == "voicerss":
-                audio_file = self.generate_audio_voicerss(text)
-                if self._tts_stop_flag or tts_event.is_set():
-                    return
-                if audio_file:
-                    self.play_audio_output(audio_file)
-                    if self.settings.mic_device_index != -1:
-                        self.play_audio_mic(audio_file)
-        finally:
-            try:
-                self.active_tts_threads.remove(threading.current_thread())
-            except Exception:
-                pass
-            try:
-                self._tts_events.remove(tts_event)
-            except Exception:
-                pass
+    def enqueue_speech(self, text):
+        """Постановка фразы в очередь озвучивания с учетом выбранной политики"""
+        job = self.engine.say(text)
+        if job.status == "rejected":
+            self.set_status("⚠️ Очередь озвучивания переполнена")
+        return job
     
-    def play_audio_output(self, audio_file):
-        """Воспроизведение аудиофайла через pygame (Sound.play, чтобы stop_playback всегда останавливал всё)"""
-        import pygame
-        pygame.mixer.init()
-        sound = pygame.mixer.Sound(audio_file)
-        # Восстанавливаем громкость для всех каналов
-        for i in range(pygame.mixer.get_num_channels()):
-            ch = pygame.mixer.Channel(i)
-            ch.set_volume(min(self.settings.output_volume, 1.0))
-        # Усиление громкости выше 100% через numpy
-        if self.settings.output_volume > 1.0:
-            try:
-                arr = pygame.sndarray.array(sound)
-                arr = np.clip(arr * self.settings.output_volume, -32768, 32767).astype(arr.dtype)
-                sound = pygame.sndarray.make_sound(arr)
-            except Exception as e:
-                logging.warning(f"Не удалось усилить громкость выше 100%: {e}")
-        sound.set_volume(min(self.settings.output_volume, 1.0))
-        sound.play()
+    def speak_from_api(self, text, policy=None):
+        """Фраза из API управления: та же очередь, что и из окна; история обновляется в главном потоке"""
+        self.check_and_fix_key_stuck()
+        job = self.engine.say(text, policy)
+        if job.status != "rejected":
+            self.root.after(0, self.add_to_history, text)
+        return job
     
     def _press_mic_key(self):
         """Оптимизированное нажатие клавиши микрофона"""
@@ -710,98 +433,12 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
             logging.error(f"Ошибка при освобождении клавиши микрофона: {e}")
             return False
         
-    def play_audio_mic(self, audio_file):
-        # Для передачи аудио в микрофон, нужно использовать Virtual Audio Cable или аналог
-        mic_index = self.settings.mic_device_index
-        if isinstance(mic_index, int) and mic_index >= 0:
-            key_pressed = False
-            try:
-                print(f"Начало воспроизведения через микрофон (устройство {mic_index})")
-                # Конвертируем в WAV, если это MP3
-                if audio_file.endswith('.mp3'):
-                    wav_file = self._convert_mp3_to_wav(audio_file)
-                else:
-                    wav_file = audio_file
-                # Проверка на None
-                if not wav_file or not os.path.exists(wav_file):
-                    print(f"Файл для воспроизведения через микрофон не найден: {wav_file}")
-                    return
-                wf = wave.open(wav_file, 'rb')
-                channels = wf.getnchannels()
-                width = wf.getsampwidth()
-                rate = wf.getframerate()
-                stream = self.p.open(format=self.p.get_format_from_width(width),
-                                    channels=channels,
-                                    rate=rate,
-                                    output=True,
-                                    output_device_index=mic_index)
-                chunk_size = 1024
-                data = wf.readframes(chunk_size)
-                
-                # Проверяем наличие аудиоданных перед нажатием клавиши
-                if len(data) > 0 and self.settings.voice_chat_key:
-                    key = self.settings.voice_chat_key
-                    logging.info(f"[MIC KEY] Нажимаем клавишу микрофона '{key}'")
-                    
-                    # Нажимаем клавишу микрофона оптимизированным методом
-                    key_pressed = self._press_mic_key()
-                    logging.info(f"[MIC KEY] Клавиша микрофона активирована: {key_pressed}")
-                
-                try:
-                    while len(data) > 0:
-                        audio_data = np.frombuffer(data, dtype=np.int16)
-                        # Усиление громкости выше 100%
-                        audio_data = np.clip(audio_data * self.settings.mic_volume, -32768, 32767).astype(np.int16)
-                        stream.write(audio_data.tobytes())
-                        data = wf.readframes(chunk_size)
-                finally:
-                    # Гарантированное освобождение клавиши только если она была нажата
-                    if key_pressed and self.settings.voice_chat_key:
-                        # Отпускаем клавишу микрофона
-                        self._release_mic_key()
-                        logging.info(f"[MIC KEY] Клавиша микрофона деактивирована")
-                
-                stream.stop_stream()
-                stream.close()
-                wf.close()
-                print("Воспроизведение через микрофон завершено")
-            except Exception as e:
-                print(f"Ошибка при воспроизведении через микрофон: {e}")
-                logging.error(f"Ошибка при воспроизведении через микрофон: {e}")
-                # Гарантированное освобождение клавиши в случае ошибки
-                if key_pressed and self.settings.voice_chat_key:
-                    self._release_mic_key()
-                    logging.info(f"[MIC KEY] Клавиша микрофона деактивирована после ошибки")
-    
-    def _convert_mp3_to_wav(self, mp3_file):
-        # Используем pydub для конвертации из mp3 в wav
-        try:
-            print("Конвертация MP3 в WAV...")
-            # Создаем временный wav файл
-            temp_wav = tempfile.mktemp(suffix='.wav')
-            # Конвертируем MP3 в WAV с помощью pydub
-            try:
-                # Проверяем наличие ffmpeg в системе или в папке приложения
-                ffmpeg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ffmpeg", "bin")
-                if os.path.exists(os.path.join(ffmpeg_path, "ffmpeg.exe")):
-                    # Если ffmpeg есть в папке приложения, добавляем путь в PATH
-                    os.environ["PATH"] += os.pathsep + ffmpeg_path
-                    print(f"Путь к ffmpeg добавлен в PATH: {ffmpeg_path}")
-                sound = AudioSegment.from_mp3(mp3_file)
-                sound.export(temp_wav, format="wav")
-                print(f"Файл успешно конвертирован в {temp_wav}")
-                return temp_wav
-            except Exception as e:
-                print(f"Ошибка при конвертации с помощью pydub: {e}")
-                return None
-        except Exception as e:
-            print(f"Ошибка при конвертации MP3 в WAV: {e}")
-            return None
-    
     def open_settings(self):
-        print("Открытие окна настроек")
+        logging.debug("Открытие окна настроек")
         self._check_topmost_enabled = False
-        keyboard.unhook_all()
+        self.hotkeys.clear()
+        # Список устройств нужен только здесь - запрашиваем его при открытии настроек
+        self.get_audio_devices()
         settings_window = tk.Toplevel(self.root)
         settings_window.title("Настройки TTS Overlay")
         settings_window.geometry("600x470")
@@ -883,8 +520,8 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         mic_devices = []
         mic_devices.append((-1, "Отключено"))
         
-        for i in range(self.p.get_device_count()):
-            device_info = self.p.get_device_info_by_index(i)
+        for i in range(self.engine.p.get_device_count()):
+            device_info = self.engine.p.get_device_info_by_index(i)
             max_output_channels = int(device_info['maxOutputChannels'])
             if max_output_channels > 0:
                 name = device_info['name']
@@ -958,24 +595,42 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         
         ttk.Label(local_frame, text="Голос:").grid(row=0, column=0, sticky='w', pady=5)
         
-        # Получаем список доступных голосов
-        voices = self.engine.getProperty('voices')
-        voice_var = tk.StringVar()
-        voice_combo = ttk.Combobox(local_frame, textvariable=voice_var, width=50, state="readonly")
-        voice_combo['values'] = [f"{voice.name} ({voice.id})" for voice in voices]
-        
-        # Устанавливаем текущий голос
-        current_voice_id = self.settings.voice_id
-        for i, voice in enumerate(voices):
-            if voice.id == current_voice_id:
-                voice_var.set(f"{voice.name} ({voice.id})")
-                break
-        else:
-            if voices:
-                voice_var.set(f"{voices[0].name} ({voices[0].id})")
-        
+        # Список голосов запрашивается у движка в его потоке (первый раз - долго),
+        # окно открывается сразу, а список заполняется через after()
+        voices = []
+        voice_var = tk.StringVar(value="Загрузка голосов...")
+        voice_combo = ttk.Combobox(local_frame, textvariable=voice_var, width=50, state="disabled")
         voice_combo.grid(row=0, column=1, sticky='w', pady=5)
         
+        def fill_voices(loaded, error):
+            if not settings_window.winfo_exists():
+                return
+            if error is not None:
+                voice_var.set("Голоса недоступны")
+                return
+            voices.extend(loaded)
+            voice_combo['values'] = [f"{voice.name} ({voice.id})" for voice in voices]
+            voice_combo.config(state="readonly")
+            
+            # Устанавливаем текущий голос
+            current_voice_id = self.settings.voice_id
+            for voice in voices:
+                if voice.id == current_voice_id:
+                    voice_var.set(f"{voice.name} ({voice.id})")
+                    break
+            else:
+                voice_var.set(f"{voices[0].name} ({voices[0].id})" if voices else "")
+        
+        def on_voices_loaded(future):
+            try:
+                loaded, error = future.result(), None
+            except Exception as e:
+                logging.error(f"Ошибка при получении списка голосов: {e}")
+                loaded, error = [], e
+            self.root.after(0, lambda: fill_voices(loaded, error))
+        
+        self.engine.local_tts.load_voices().add_done_callback(on_voices_loaded)
+        
         # === Настройки VoiceRSS ===
         voicerss_frame = ttk.LabelFrame(engine_frame, text="Настройки VoiceRSS", padding=10)
         
@@ -989,9 +644,8 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         
         # Получаем список доступных языков
         languages = {}
-        if VoiceRSSAPI is not None:
-            api = VoiceRSSAPI()
-            languages = api.get_available_languages()
+        if self.engine.voicerss is not None:
+            languages = self.engine.voicerss.get_available_languages()
         
         voicerss_language_var = tk.StringVar()
         voicerss_language_combo = ttk.Combobox(voicerss_frame, textvariable=voicerss_language_var, width=50, state="readonly")
@@ -1017,11 +671,11 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         
         # Функция для обновления списка голосов при изменении языка
         def update_voicerss_voices(*args):
-            if VoiceRSSAPI is None:
+            if self.engine.voicerss is None:
                 return
             
             try:
-                api = VoiceRSSAPI()
+                api = self.engine.voicerss
                 language_selection = voicerss_language_var.get()
                 
                 if ":" in language_selection:
@@ -1042,7 +696,7 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
                                 first_voice = voices_list[0]
                                 voicerss_voice_var.set(f"{first_voice.get('name', '')} ({first_voice.get('gender', '')})")
             except Exception as e:
-                print(f"Ошибка при обновлении списка голосов: {e}")
+                logging.error(f"Ошибка при обновлении списка голосов: {e}")
         
         voicerss_language_var.trace('w', update_voicerss_voices)
         
@@ -1151,9 +805,13 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         ttk.Label(about_frame, text="Версия 1.3.0").pack(pady=5)
         ttk.Label(about_frame, text="© 2023-2024").pack(pady=5)
         
-        # Информация о кэше
-        cache_size = self.get_cache_size()
-        ttk.Label(about_frame, text=f"Размер кэша: {cache_size:.2f} МБ").pack(pady=5)
+        # Информация о кэше (счетчики ведутся кэшем по ходу работы, диск не читается)
+        cache_info_var = tk.StringVar()
+        ttk.Label(about_frame, textvariable=cache_info_var, justify='center').pack(pady=5)
+        
+        def refresh_cache_info():
+            cache_info_var.set(self.format_cache_stats(self.engine.audio_cache.stats()))
+        refresh_cache_info()
         
         # Кнопка очистки кэша
         clear_cache_button = ttk.Button(about_frame, text="Очистить кэш", 
@@ -1161,24 +819,33 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         clear_cache_button.pack(pady=10)
         
         def clear_cache():
-            try:
-                # Очищаем папку кэша
-                cache_folder = os.path.join(os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)), "cache")
-                for root, dirs, files in os.walk(cache_folder):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            os.unlink(file_path)
-                        except Exception as e:
-                            print(f"Ошибка при удалении файла {file_path}: {e}")
-                
-                messagebox.showinfo("Очистка кэша", "Кэш успешно очищен")
-                
-                # Обновляем информацию о размере кэша
-                cache_size = self.get_cache_size()
-                ttk.Label(about_frame, text=f"Размер кэша: {cache_size:.2f} МБ").pack(pady=5)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось очистить кэш: {e}")
+            # Файлы удаляются в фоновом потоке, прогресс передается в окно через after()
+            clear_cache_button.config(state='disabled')
+            
+            def on_progress(done, total):
+                self.root.after(0, lambda: cache_info_var.set(f"Очистка кэша: {done} из {total} файлов"))
+            
+            def on_finished(removed, error):
+                if not settings_window.winfo_exists():
+                    return
+                clear_cache_button.config(state='normal')
+                refresh_cache_info()
+                if error is None:
+                    messagebox.showinfo("Очистка кэша", f"Кэш успешно очищен (удалено файлов: {removed})", parent=settings_window)
+                else:
+                    messagebox.showerror("Ошибка", f"Не удалось очистить кэш: {error}", parent=settings_window)
+            
+            def worker():
+                removed, error = 0, None
+                try:
+                    # Очищаем кэш вместе с индексом
+                    removed = self.engine.audio_cache.clear(progress=on_progress)
+                    self.engine.pcm_lru.clear()
+                except Exception as e:
+                    error = e
+                self.root.after(0, lambda: on_finished(removed, error))
+            
+            threading.Thread(target=worker, name="cache-clear", daemon=True).start()
         
         # Кнопки внизу окна
         buttons_frame = ttk.Frame(settings_window)
@@ -1200,7 +867,9 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         def save_settings():
             try:
                 # Сохраняем громкость
-                self.settings.output_volume = output_volume_var.get()
+                if output_volume_var.get() != self.settings.output_volume:
+                    self.settings.output_volume = output_volume_var.get()
+                    self.engine.drop_gained_sounds()
                 self.settings.mic_volume = mic_volume_var.get()
                 
                 # Сохраняем движок
@@ -1284,90 +953,24 @@ class TTSOverlay(TKMT.ThemedTKinterFrame):
         import webbrowser
         webbrowser.open(url)
     
-    def get_cache_size(self):
-        """Получение размера кэша в MB"""
-        total_size = 0
-        if os.path.exists(self.cache_folder):
-            for file in os.listdir(self.cache_folder):
-                file_path = os.path.join(self.cache_folder, file)
-                if os.path.isfile(file_path):
-                    total_size += os.path.getsize(file_path)
-        
-        # Конвертируем байты в мегабайты
-        return total_size / (1024 * 1024)
-    
-    def cleanup_cache(self):
-        """Фоновый поток для очистки старых файлов кэша"""
-        while True:
-            try:
-                # Проверяем каждые 6 часов
-                time.sleep(6 * 60 * 60)
-                
-                # Максимальный размер кэша (в байтах) - 100 МБ
-                max_cache_size = 100 * 1024 * 1024
-                
-                if os.path.exists(self.cache_folder):
-                    # Получаем список файлов в кэше с их размерами и временем изменения
-                    files = []
-                    total_size = 0
-                    
-                    for file_name in os.listdir(self.cache_folder):
-                        file_path = os.path.join(self.cache_folder, file_name)
-                        if os.path.isfile(file_path):
-                            file_size = os.path.getsize(file_path)
-                            file_time = os.path.getmtime(file_path)
-                            files.append((file_path, file_size, file_time))
-                            total_size += file_size
-                    
-                    # Если размер кэша превышает максимальный, удаляем старые файлы
-                    if total_size > max_cache_size:
-                        # Сортируем файлы по времени изменения (от старых к новым)
-                        files.sort(key=lambda x: x[2])
-                        
-                        # Удаляем старые файлы, пока размер кэша не станет меньше максимального
-                        for file_path, file_size, _ in files:
-                            try:
-                                os.remove(file_path)
-                                total_size -= file_size
-                                print(f"Удален старый файл кэша: {file_path}")
-                                
-                                if total_size <= max_cache_size:
-                                    break
-                            except Exception as e:
-                                print(f"Ошибка при удалении файла кэша {file_path}: {e}")
-            except Exception as e:
-                print(f"Ошибка в потоке очистки кэша: {e}")
+    def format_cache_stats(self, stats):
+        """Текст статистики кэша для окна настроек"""
+        lines = [
+            f"Размер кэша: {stats['size'] / (1024 * 1024):.2f} МБ ({stats['entries']} файлов)",
+            f"Попадания в кэш: {stats['hits']} из {stats['hits'] + stats['misses']} ({stats['hit_rate']:.0%})",
+        ]
+        for engine, counters in sorted(stats['engines'].items()):
+            if engine:
+                lines.append(f"{engine}: {counters['size'] / (1024 * 1024):.2f} МБ, {counters['entries']} файлов, "
+                             f"попаданий {counters['hit_rate']:.0%}")
+        return "\n".join(lines)
     
     def stop_playback(self):
         """Быстрая остановка воспроизведения"""
-        import pygame
-        self._tts_stop_flag = True
-        
-        # Отпускаем клавишу микрофона, если она нажата
-        if self.settings.voice_chat_key:
-            self._release_mic_key()
-        
-        # Глушим звук
-        if pygame.mixer.get_init():
-            pygame.mixer.stop()
-        
-        # Останавливаем все движки pyttsx3
-        for engine in list(self._tts_engines):
-            try:
-                engine.stop()
-                self._tts_engines.remove(engine)
-            except Exception:
-                pass
-        
-        # Сигнализируем потокам завершиться
-        for ev in list(self._tts_events):
-            ev.set()
-        
-        # Очищаем активные потоки
-        self.active_tts_threads.clear()
-        self._tts_events.clear()
+        # Отменяем все задания: ожидающие удаляются, выполняющиеся получают сигнал отмены
+        self.engine.stop()
         self.set_status("⏹ Воспроизведение остановлено")
-        
+    
     def check_and_fix_key_stuck(self):
         if self.settings.voice_chat_key:
             try:
@@ -1515,7 +1118,4 @@ if __name__ == "__main__":
         app = TTSOverlay()
         app.run()
     except Exception as e:
-        logging.exception("Критическая ошибка при запуске приложения:")
-        print(f"Критическая ошибка: {e}")
-        import traceback
-        traceback.print_exc() 
\ No newline at end of file
+        logging.exception(f"Критическая ошибка при запуске приложения: {e}") 
\ No newline at end of file
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Настройки TTS Overlay (settings.json рядом с приложением)
+Отдельный модуль, чтобы ядро озвучивания можно было использовать без интерфейса
+"""
+
+import os
+import sys
+import json
+import logging
+from dataclasses import dataclass, asdict, field
+from typing import Optional
+
+
+@dataclass
+class TTSSettings:
+    output_device_index: int = 0
+    mic_device_index: int = -1
+    output_volume: float = 0.8
+    mic_volume: float = 0.8
+    voice_id: Optional[str] = None
+    tts_engine: str = "google"
+    voicerss_language: str = "ru-ru"
+    voicerss_voice: Optional[str] = None
+    voicerss_api_key: Optional[str] = ""
+    voice_chat_key: Optional[str] = None
+    history_hotkey_modifier: str = "ctrl"
+    remove_queue: bool = False
+    queue_policy: str = "fifo"  # Политика очереди: fifo, interrupt или drop_oldest (remove_queue включает interrupt)
+    tts_workers: int = 1  # Число одновременно озвучиваемых фраз
+    tts_max_queue: int = 8  # Максимальная длина очереди фраз
+    toggle_visibility_key: str = "alt+t"  # Клавиша для открытия/закрытия меню (по умолчанию alt+t)
+    focus_window_key: Optional[str] = None  # Дополнительная клавиша для открытия окна (по умолчанию не задана)
+    hotkey_debounce_ms: int = 250  # Пауза, меньше которой повторные нажатия одной клавиши (автоповтор) отсеиваются
+    cache_max_mb: int = 100  # Лимит размера кэша на диске (проверяется при каждой записи)
+    cache_eviction: str = "lru"  # Что удалять при превышении лимита: lru (давно не использованные) или lfu (редко используемые)
+    pcm_memory_cache_mb: int = 64  # Лимит памяти для декодированных фраз (повтор без чтения с диска)
+    google_streaming: bool = True  # Воспроизведение Google TTS по мере синтеза, не дожидаясь всего файла
+    sentence_chunking: bool = True  # Синтез длинного текста по предложениям (следующее готовится, пока играет текущее)
+    max_segment_chars: int = 200  # Максимальная длина фрагмента при разбиении текста
+    mixer_frequency: int = 44100  # Формат микшера pygame (инициализируется один раз при запуске)
+    mixer_buffer: int = 512  # Размер буфера микшера в кадрах: меньше - ниже задержка, но выше риск щелчков
+    mic_offset_ms: float = 0.0  # Сдвиг звука в микрофоне относительно динамиков (мс, может быть отрицательным)
+    mic_sample_rate: int = 48000  # Формат постоянного потока микрофона (фразы приводятся к нему)
+    mic_channels: int = 2
+    mic_limiter: str = "soft"  # Ограничитель при громкости микрофона выше 100%: soft (плавное сжатие) или hard (обрезка)
+    control_api_enabled: bool = False  # Локальный HTTP API для отправки текста из других программ
+    control_api_port: int = 8765  # Порт API (слушает только 127.0.0.1)
+    control_api_token: str = ""  # Если задан, запросы к API должны содержать Authorization: Bearer <токен>
+    control_api_rate: float = 10.0  # Запросов в секунду к API (сверх запаса - ответ 429)
+    log_level: str = "DEBUG"  # Уровень журнала tts_overlay_debug.log: DEBUG, INFO, WARNING или ERROR
+    settings_path: str = field(default_factory=lambda: os.path.join(os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__)), "settings.json"), repr=False)
+
+    def load_settings(self):
+        if os.path.exists(self.settings_path):
+            try:
+                with open(self.settings_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                for key in asdict(self):
+                    if key in data:
+                        setattr(self, key, data[key] if data[key] is not None else None)
+            except Exception as e:
+                logging.error(f"Ошибка при загрузке настроек: {e}")
+
+    def save_settings(self):
+        try:
+            data = asdict(self)
+            data.pop('settings_path', None)
+            # Приводим все None к пустой строке для корректного сохранения в json
+            for k, v in data.items():
+                if v is None:
+                    data[k] = ""
+            with open(self.settings_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            logging.error(f"Ошибка при сохранении настроек: {e}")
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Потоковый синтез речи для TTS Overlay
+Фрагменты MP3 от gTTS декодируются по мере поступления и сразу передаются
+на динамики и в виртуальный микрофон, не дожидаясь окончания синтеза всей фразы
+"""
+
+import io
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Iterator, List, Optional
+
+from audio_pcm import DecodedAudio, decode_audio
+
+
+def iter_gtts_chunks(tts) -> Iterator[bytes]:
+    """Фрагменты MP3 от объекта gTTS (по одному на каждую часть текста)"""
+    if hasattr(tts, "stream"):
+        yield from tts.stream()
+    else:
+        # Старые версии gTTS умеют писать только в файловый объект целиком
+        fp = io.BytesIO()
+        tts.write_to_fp(fp)
+        yield fp.getvalue()
+
+
+def decode_mp3_bytes(data: bytes) -> DecodedAudio:
+    """Декодирование фрагмента MP3 в память через pydub/ffmpeg"""
+    return decode_audio(data, "mp3")
+
+
+class ChunkFeeder:
+    """Отдельный поток, передающий PCM-фрагменты в приемник (динамики или микрофон) по мере поступления"""
+
+    def __init__(self, name: str, sink: Callable[[DecodedAudio], None],
+                 on_finish: Optional[Callable[[], None]] = None,
+                 should_stop: Optional[Callable[[], bool]] = None):
+        self.name = name
+        self.sink = sink
+        self.on_finish = on_finish
+        self.should_stop = should_stop or (lambda: False)
+        # Момент передачи первого фрагмента в приемник (time.perf_counter)
+        self.first_sample_time: Optional[float] = None
+        self.error: Optional[Exception] = None
+        self._queue: "queue.Queue[Optional[DecodedAudio]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=f"feeder-{name}", daemon=True)
+        self._thread.start()
+
+    def push(self, chunk: DecodedAudio) -> None:
+        self._queue.put(chunk)
+
+    def finish(self) -> None:
+        """Конец потока: приемник доигрывает полученное и закрывается"""
+        self._queue.put(None)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    break
+                if self.should_stop() or self.error is not None:
+                    continue
+                if self.first_sample_time is None:
+                    self.first_sample_time = time.perf_counter()
+                try:
+                    self.sink(chunk)
+                except Exception as e:
+                    self.error = e
+                    logging.error(f"Ошибка потокового воспроизведения ({self.name}): {e}")
+        finally:
+            if self.on_finish:
+                try:
+                    self.on_finish()
+                except Exception as e:
+                    logging.error(f"Ошибка при завершении потокового воспроизведения ({self.name}): {e}")
+
+
+class GoogleStreamingSynthesis:
+    """Потоковый синтез через gTTS с инкрементальным декодированием"""
+
+    def __init__(self, text: str, lang: str = "ru", tts_factory: Optional[Callable] = None,
+                 decode: Callable[[bytes], DecodedAudio] = decode_mp3_bytes):
+        self.text = text
+        self.lang = lang
+        self.tts_factory = tts_factory
+        self.decode = decode
+        self.started_at: Optional[float] = None
+        self.feeders: List[ChunkFeeder] = []
+
+    def run(self, feeders: List[ChunkFeeder], should_stop: Optional[Callable[[], bool]] = None) -> Optional[bytes]:
+        """
+        Синтез с передачей фрагментов в приемники
+
+        Returns:
+            bytes: Полный MP3 (для записи в кэш) или None, если синтез прерван
+        """
+        self.feeders = feeders
+        should_stop = should_stop or (lambda: False)
+        self.started_at = time.perf_counter()
+        parts = []
+        try:
+            tts_factory = self.tts_factory
+            if tts_factory is None:
+                from gtts import gTTS as tts_factory
+            tts = tts_factory(text=self.text, lang=self.lang, slow=False)
+            for mp3_chunk in iter_gtts_chunks(tts):
+                if should_stop():
+                    return None
+                parts.append(mp3_chunk)
+                audio = self.decode(mp3_chunk)
+                for feeder in feeders:
+                    feeder.push(audio)
+        finally:
+            for feeder in feeders:
+                feeder.finish()
+        return b"".join(parts)
+
+    @property
+    def time_to_first_sample(self) -> Optional[float]:
+        """Время от начала синтеза до передачи первого фрагмента в приемник (секунды)"""
+        times = [f.first_sample_time for f in self.feeders if f.first_sample_time is not None]
+        if self.started_at is None or not times:
+            return None
+        return min(times) - self.started_at
@@ -7,26 +7,63 @@
 """
 
 import os
+import time
+import random
+import logging
+import threading
 import requests
-import json
-import hashlib
-import tempfile
-from urllib.parse import urlencode
-from typing import Dict, List, Optional, Any, Union, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Union, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from audio_cache import AudioCache
+from rate_limit import TokenBucket
 
 class VoiceRSSAPI:
     """Класс для работы с VoiceRSS API"""
     
-    def __init__(self, api_key: Optional[str] = None):
-        """Инициализация API ключа"""
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[AudioCache] = None,
+                 base_url: str = "https://api.voicerss.org/", session: Optional[requests.Session] = None,
+                 connect_timeout: float = 3.05, read_timeout: float = 15.0,
+                 retries: int = 2, backoff: float = 0.3, pool_size: int = 4, max_retry_after: float = 5.0):
+        """
+        Инициализация API ключа, общего кэша аудио и HTTP-сессии
+        
+        Args:
+            base_url (str): Адрес API (можно подменить локальным сервером)
+            session (requests.Session): Готовая сессия (по умолчанию создается своя)
+            connect_timeout (float): Таймаут установки соединения (секунды)
+            read_timeout (float): Таймаут ожидания ответа (секунды)
+            retries (int): Число повторов при ошибке сервера (5xx, 429) или сбое соединения
+            backoff (float): Базовая пауза перед повтором (удваивается, со случайным разбросом)
+            pool_size (int): Число соединений, которые держатся открытыми (keep-alive)
+            max_retry_after (float): Наибольшая пауза Retry-After (секунды); если сервер просит
+                ждать дольше, повтора нет
+        """
         # Если ключ не указан, используем бесплатный демо-ключ (ограниченное количество запросов)
         self.api_key = api_key or "c7497b03d1c8437c90d1f50d2a9698d0"
-        self.base_url = "https://api.voicerss.org/"
-        self.cache_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "voicerss")
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_retry_after = max_retry_after
+        
+        # Одна сессия на всё приложение: соединение и TLS переиспользуются между фразами
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
         
-        # Создаем папку для кэша, если её нет
-        if not os.path.exists(self.cache_folder):
-            os.makedirs(self.cache_folder)
+        # Время запросов (мс) и счетчики
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+        
+        # Используем общий кэш приложения, если он передан
+        self.cache = cache or AudioCache(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache"))
+        self.cache_folder = self.cache.partition("voicerss")
     
     def get_available_languages(self) -> Dict[str, str]:
         """Получение списка доступных языков"""
@@ -135,7 +172,8 @@ class VoiceRSSAPI:
         
         return voices
     
-    def text_to_speech(self, text: str, language: str = "ru-ru", voice: Optional[str] = None, speed: int = 0) -> Optional[str]:
+    def text_to_speech(self, text: str, language: str = "ru-ru", voice: Optional[str] = None, speed: int = 0,
+                       cancel_event: Optional[threading.Event] = None) -> Optional[str]:
         """
         Преобразование текста в речь с помощью VoiceRSS API
         
@@ -144,19 +182,82 @@ class VoiceRSSAPI:
             language (str): Код языка (например, "ru-ru")
             voice (str): Имя голоса (если None, будет использован стандартный)
             speed (int): Скорость речи (-10 до 10)
+            cancel_event (threading.Event): Отмена: прерывает паузу перед повтором запроса
             
         Returns:
             str: Путь к аудиофайлу или None в случае ошибки
         """
-        # Создаем хэш для кэширования
-        text_hash = hashlib.md5(f"{text}_{language}_{voice}_{speed}".encode()).hexdigest()
-        cache_path = os.path.join(self.cache_folder, f"{text_hash}.mp3")
+        return self._synthesize(text, language, voice, speed, cancel_event=cancel_event)
+    
+    def _synthesize(self, text: str, language: str, voice: Optional[str], speed: int,
+                    limiter: Optional[TokenBucket] = None,
+                    cancel_event: Optional[threading.Event] = None) -> Optional[str]:
+        """Синтез через кэш; limiter ограничивает каждую HTTP-попытку, включая повторы"""
+        return self.cache.get_or_create(
+            "voicerss", text,
+            lambda cache_path: self._download(text, language, voice, speed, cache_path, limiter, cancel_event),
+            language=language, voice=voice, speed=speed
+        )
+    
+    def synthesize_many(self, texts: Iterable[str], language: str = "ru-ru", voice: Optional[str] = None,
+                        speed: int = 0, max_workers: int = 4, rate: float = 2.0, burst: Optional[float] = None,
+                        cancel_event: Optional[threading.Event] = None) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Пакетный синтез списка фраз
+        
+        Фразы, уже лежащие в кэше, возвращаются сразу без запросов. Остальные
+        синтезируются параллельно (не больше max_workers одновременно, для
+        повторного использования соединений - не больше pool_size), а запросы
+        выдаются не чаще rate в секунду (повторы после 429 и 5xx тоже), чтобы
+        не исчерпать квоту ключа.
         
-        # Проверяем, есть ли файл в кэше
-        if os.path.exists(cache_path):
-            print(f"Используется кэшированный файл VoiceRSS: {cache_path}")
-            return cache_path
+        Args:
+            texts: Фразы (повторы синтезируются один раз)
+            language, voice, speed: Параметры синтеза, как в text_to_speech
+            max_workers (int): Число одновременных запросов
+            rate (float): Запросов в секунду
+            burst (float): Допустимая пачка запросов сверх средней частоты (по умолчанию max_workers)
+            cancel_event (threading.Event): Отмена: ожидающие фразы пропускаются
+            
+        Yields:
+            tuple: (текст, путь к аудиофайлу или None) в порядке готовности
+        """
+        limiter = TokenBucket(rate, burst if burst is not None else max_workers)
+        pending = []
+        for text in dict.fromkeys(t for t in texts if t and t.strip()):
+            cached = self.cache.find("voicerss", text, language=language, voice=voice, speed=speed)
+            if cached:
+                yield text, cached
+            else:
+                pending.append(text)
+        if not pending:
+            return
+        
+        def job(text: str) -> Optional[str]:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            return self._synthesize(text, language, voice, speed, limiter, cancel_event)
         
+        executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="voicerss")
+        futures = {}
+        try:
+            futures = {executor.submit(job, text): text for text in pending}
+            for future in as_completed(futures):
+                text = futures[future]
+                try:
+                    yield text, future.result()
+                except Exception as e:
+                    logging.error(f"VoiceRSS: ошибка синтеза фразы '{text[:40]}': {e}")
+                    yield text, None
+        finally:
+            # Если результаты больше не нужны, невыполненные задания отменяются
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+    
+    def _download(self, text: str, language: str, voice: Optional[str], speed: int, cache_path: str,
+                  limiter: Optional[TokenBucket] = None, cancel_event: Optional[threading.Event] = None) -> bool:
+        """Запрос к VoiceRSS API и сохранение ответа в указанный файл"""
         # Формируем параметры запроса
         params = {
             "key": self.api_key,
@@ -173,7 +274,10 @@ class VoiceRSSAPI:
         
         try:
             # Отправляем запрос к API
-            response = requests.get(self.base_url, params=params)
+            response = self._get(params, limiter, cancel_event)
+            if response is None:
+                logging.debug("VoiceRSS: запрос отменен")
+                return False
             
             # Проверяем успешность запроса
             if response.status_code == 200 and not response.content.startswith(b"ERROR"):
@@ -182,21 +286,92 @@ class VoiceRSSAPI:
                     try:
                         with open(cache_path, "wb") as f:
                             f.write(response.content)
-                        print(f"Аудио сохранено в кэш VoiceRSS: {cache_path}")
-                        return cache_path
+                        logging.debug(f"Аудио сохранено в кэш VoiceRSS: {cache_path}")
+                        return True
                     except Exception as e:
-                        print(f"Ошибка при сохранении аудио в файл: {e}")
-                        return None
+                        logging.error(f"Ошибка при сохранении аудио в файл: {e}")
+                        return False
                 else:
-                    print("Пустой ответ от VoiceRSS API")
-                    return None
+                    logging.error("Пустой ответ от VoiceRSS API")
+                    return False
             else:
                 error_message = response.content.decode("utf-8") if response.content.startswith(b"ERROR") else f"HTTP error {response.status_code}"
-                print(f"Ошибка VoiceRSS API: {error_message}")
-                return None
+                logging.error(f"Ошибка VoiceRSS API: {error_message}")
+                return False
         except Exception as e:
-            print(f"Ошибка при запросе к VoiceRSS API: {e}")
-            return None
+            logging.error(f"Ошибка при запросе к VoiceRSS API: {e}")
+            return False
+    
+    def _get(self, params: Dict[str, str], limiter: Optional[TokenBucket] = None,
+             cancel_event: Optional[threading.Event] = None) -> Optional[requests.Response]:
+        """
+        GET через общую сессию с таймаутами и повтором при ошибках сервера
+        
+        Returns:
+            requests.Response: Ответ или None, если ожидание токена или повтора прервано отменой
+        """
+        attempt = 0
+        while True:
+            # Токен берется на каждую попытку, чтобы повторы не превышали частоту
+            if limiter is not None and not limiter.acquire(cancel_event=cancel_event):
+                return None
+            started = time.perf_counter()
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                response, error = None, e
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            
+            # Повторяем при сбое соединения, ошибке сервера и превышении лимита запросов (429)
+            retryable = error is not None or response.status_code >= 500 or response.status_code == 429
+            self._record(elapsed_ms, failed=retryable)
+            status = error or response.status_code
+            logging.debug(f"VoiceRSS: {status} за {elapsed_ms:.0f} мс (попытка {attempt + 1})")
+            if not retryable:
+                return response
+            if attempt >= self.retries:
+                if error is not None:
+                    raise error
+                return response
+            
+            # Экспоненциальная пауза со случайным разбросом, чтобы повторы не шли синхронно
+            delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            retry_after = response.headers.get("Retry-After") if response is not None else None
+            if retry_after and retry_after.isdigit():
+                if float(retry_after) > self.max_retry_after:
+                    logging.warning(f"VoiceRSS: {status}, сервер просит подождать {retry_after} с - без повтора")
+                    return response
+                delay = max(delay, float(retry_after))
+            logging.warning(f"VoiceRSS: {status}, повтор через {delay:.2f} с")
+            with self._stats_lock:
+                self._stats["retries"] += 1
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    return None
+            else:
+                time.sleep(delay)
+            attempt += 1
+    
+    def _record(self, elapsed_ms: float, failed: bool) -> None:
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["failures"] += int(failed)
+            self._stats["total_ms"] += elapsed_ms
+            self._stats["max_ms"] = max(self._stats["max_ms"], elapsed_ms)
+            self._stats["last_ms"] = elapsed_ms
+    
+    def stats(self) -> Dict[str, float]:
+        """Число запросов, повторов и ошибок, время ответа (мс)"""
+        with self._stats_lock:
+            result = dict(self._stats)
+        total_ms = result.pop("total_ms")
+        result["avg_ms"] = total_ms / result["requests"] if result["requests"] else 0.0
+        return result
+    
+    def close(self) -> None:
+        """Закрытие соединений сессии"""
+        self.session.close()
     
     def get_demo_key(self) -> str:
         """Получение демо-ключа для VoiceRSS API"""